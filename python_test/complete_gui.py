@@ -1,73 +1,322 @@
+import time
+STARTUP_ORIGIN = time.perf_counter()  # Start of the startup breakdown (imports included)
 import tkinter as tk
 from tkinter import ttk, messagebox
+import tkinter.font as tkfont
+import argparse
+import concurrent.futures
+import functools
 import threading
-import hid
-import time
+import traceback
+import queue
 from datetime import datetime
 import os
 import sys
-import winsound  # For sound effects on Windows
-try:
-    from PIL import Image, ImageTk, ImageDraw
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-
-# Constants from main.py
-# Support both Raspberry Pi VID and Adafruit VID (for backward compatibility)
-USB_VID_RASPBERRY_PI = 0x2e8a  # Raspberry Pi VID (official)
-USB_VID_ADAFRUIT = 0x239a      # Adafruit VID (legacy/fallback)
-USB_VID = USB_VID_RASPBERRY_PI  # Default to Raspberry Pi VID
+from virc_capture import CaptureWriter
+from virc_debounce import HOLD, HOLD_MS, PRESS, REPEAT_MS, Debouncer
+from virc_history import DEFAULT_DB, PASS, HistoryWriter, station_name
+from virc_hotplug import USB_VID_ADAFRUIT, HotplugMonitor, device_key, device_label
+from virc_images import RemoteImageCache
+from virc_log import LazyMessage, LogBuffer, LogKind, LogView
+from virc_mux import DeviceInfoCache, QueryRouter, query_device_info
+from virc_profiles import default_registry
+from virc_qc import QCLane
+from virc_trace import StallWatchdog, StartupTimer, Tracer, format_stack_short, trace_ns
+from virc_protocol import (API_V2_REQUEST, CMD_RAW_TIMING, NUMPY_AVAILABLE as TIMING_AVAILABLE, RAW_TIMING_ON,
+                           REPORT_IR_BATCH, REPORT_IR_CODE, REPORT_RAW_TIMING, EventSequence, decode_ir_code,
+                           format_raw_bytes)
+from virc_timing import TimingAssembler, grade, signal_quality
+from virc_transport import HidTransport, add_transport_arguments, transport_from_args
+# NumPy (bulk decoding, signal quality) and Pillow (remote pictures) are imported on first use
+IMPORTED_AT = time.perf_counter()
+
+# Worker threads never touch Tk: decoded events go through a bounded queue that
+# the Tk main loop drains at a fixed frame rate
+UI_FRAME_MS = 33        # ~30 frames per second
+UI_QUEUE_SIZE = 2048    # Readers block (never drop) when the UI falls this far behind
+UI_MAX_BATCH = 512      # Events applied per frame at most, keeps each frame short
+
+IR_EVENT_SEPARATOR = "-" * 50
+
+QUALITY_COLORS = {'good': "green", 'weak': "orange", 'poor': "red"}
+
+# Batch mode: a finished remote is recorded and the lane re-armed without any click
+IDLE_TIMEOUT_S = 30.0   # A started checklist with no press for this long is finalized as FAIL
+IDLE_CHECK_MS = 500
+VERDICT_FLASH_MS = 2500
+
+
+def format_ir_header(event_time, lane_name):
+    return f"\n[{time.strftime('%H:%M:%S', time.localtime(event_time))}] [{lane_name}] Received IR signal:"
+
+
+class DeviceLane:
+    """One attached VIRC receiver: its HID handle, reader thread and QC test lane"""
+
+    def __init__(self, device_info, opener, debouncer=None, negotiate=False, timing=False):
+        self.path = device_info['path']
+        self.serial = device_info.get('serial_number') or ''
+        self.manufacturer = device_info.get('manufacturer_string') or 'Unknown'
+        self.product = device_info.get('product_string') or 'Unknown'
+        # Stable identity: the serial survives re-plugging into another port, the path does not
+        self.key = self.serial or self.path
+        self.opener = opener  # Transport.open: path -> opened device
+        self.negotiate = negotiate  # Ask the receiver for batched, sequence-numbered reports (format 2)
+        self.sequence = EventSequence()  # Lost events / device time of format 2 reports
+        self.timing = TimingAssembler() if timing else None  # Raw mark/space timing of every press (report 11)
+        self.device = None
+        self.clock = time.time  # Event time shown in the log
+        self.capture_id = None  # Device id in the capture file, when capturing
+
+        # One reader thread per receiver, from open to close. It routes query replies to
+        # self.queries and forwards IR reports while is_listening is set.
+        self.is_listening = False
+        self.reading = False
+        self.listen_thread = None
+        self.wakeup = threading.Event()  # Wakes an idle reader (listening started / query sent)
+        self.queries = QueryRouter(self.name, on_add=self.wakeup.set)
+
+        # Press / repeat / hold state per IR code of this receiver (see virc_debounce.py)
+        self.debouncer = debouncer or Debouncer()
+        self.signal_count = 0
+        self.read_timeouts = 0  # Reads that returned nothing (reader thread only)
+
+        # Device info query results
+        self.device_type = "N/A"
+        self.api_version = "N/A"
+        self.fw_version = "N/A"
+
+        # QC test lane: the checklist itself is a virc_qc.QCLane, the widgets only show it
+        # (they are created when test mode starts)
+        self.qc = None
+        self.quality = {}  # Code -> SignalQuality of its last press (raw timing diagnostics)
+        self.button_status_labels = {}
+        self.quality_labels = {}
+        self.progress_frame = None
+        self.progress_label = None
+
+    @property
+    def name(self):
+        """Short label carried by every log line and result of this lane"""
+        if self.serial:
+            return f"SN {self.serial}"
+        return self.path_text
+
+    @property
+    def path_text(self):
+        if isinstance(self.path, bytes):
+            return self.path.decode(errors="replace")
+        return str(self.path)
+
+    def matches(self, device_info):
+        """True if an enumerated HID device is this receiver"""
+        if device_info['path'] == self.path:
+            return True
+        return bool(self.serial) and (device_info.get('serial_number') or '') == self.serial
+
+    def open(self):
+        self.attach(self.opener(self.path))
+
+    def attach(self, device):
+        """Use an opened handle of this receiver (from open(), or reopened by the hotplug monitor)"""
+        self.device = device
+        # Replayed reports carry their recorded time, so debouncing sees the original gaps
+        self.clock = getattr(self.device, 'event_time', time.time)
+        self.debouncer.clock_ns = getattr(self.device, 'event_time_ns', time.monotonic_ns)
+        self.sequence = EventSequence()  # A re-plugged receiver starts counting from 0 again
+        if self.negotiate:
+            # The reply (report 4) is consumed by the reader; firmware without format 2 keeps sending report 7
+            self.device.write(API_V2_REQUEST)
+            if self.timing:
+                self.timing = TimingAssembler()
+                # Firmware before API 2.1 answers report 0, nothing else changes. Registered like any query
+                # (nobody waits for the answer), so that report 0 can never fail another query.
+                self.queries.add(CMD_RAW_TIMING, concurrent.futures.Future())
+                self.device.write(RAW_TIMING_ON)
+
+    def close(self):
+        """Stop the reader (it returns within one read timeout) and close the device"""
+        self.reading = False
+        self.wakeup.set()
+        if self.listen_thread and self.listen_thread.is_alive() and self.listen_thread is not threading.current_thread():
+            self.listen_thread.join(timeout=0.5)
+        self.queries.fail_all(ConnectionError(f"{self.name}: device closed"))
+        if self.device:
+            try:
+                self.device.close()
+            except Exception:
+                pass
+            self.device = None
+
+    def reset_session(self):
+        """Forget the remote under test, keep the lane's test widgets (next remote of a batch)"""
+        if self.qc:
+            self.qc.clear()
+        self.quality = {}
+        self.button_status_labels = {}
+        self.quality_labels = {}
+
+    def reset_test(self):
+        self.reset_session()
+        self.progress_frame = None
+        self.progress_label = None
+
 
 class VIRCCompleteGUI:
-    def __init__(self, root):
+    def __init__(self, root, transport=None, capture_path=None, tracer=None, stall_ms=None, trace_path=None,
+                 heartbeat_s=0.0, repeat_ms=REPEAT_MS, hold_ms=HOLD_MS, timing=False, history_path=None,
+                 station=None, batch=False, idle_timeout_s=IDLE_TIMEOUT_S, collector_url=None, metrics_port=None,
+                 metrics_host="127.0.0.1"):
+        # Startup breakdown, logged once the window is up; receivers are found and opened after that
+        self.startup = StartupTimer(STARTUP_ORIGIN)
+        self.startup.step("imports", IMPORTED_AT)
+        self.startup.step("Tk")
         self.root = root
         self.root.title("VIRC IR Controller - QC Testing Station")
         self.root.geometry("1100x750")
-        self.device = None
+        self.lanes = {}  # DeviceLane per attached receiver, keyed by serial (or HID path)
+        self.available_devices = []  # Enumerated devices, same order as device_combo
+        self.discovering = False     # Enumeration pass running in the background
+        self.connecting = set()      # Keys of receivers being opened in the background
         self.is_listening = False
-        self.listen_thread = None
 
-        # Performance: IR debouncing to prevent duplicates
-        self.last_ir_code = None
-        self.last_ir_time = 0
-        self.debounce_delay = 0.3  # 300ms debounce
-
-        # IR code mappings from main.py
-        self.code_map = {
-            0xFE017F80: "Short Pause",
-            0xFC037F80: "Long Pause",
-            0xFB047F80: "Bed Mode",
-            0xF9067F80: "Chair Mode",
-            0xF8077F80: "Square Button",
-            0xF6097F80: "Triangle Button",
-            0xFE01FF00: "Short Pause",
-            0xFC03FF00: "Long Pause",
-            0xFB04FF00: "Bed Mode",
-            0xF906FF00: "Chair Mode",
-            0xF807FF00: "Square Button",
-            0xF609FF00: "Triangle Button"
-        }
-        
-        self.white_remote_codes = {
-            0xFE017F80, 0xFC037F80, 0xFB047F80, 0xF9067F80, 0xF8077F80, 0xF6097F80
-        }
-        self.black_remote_codes = {
-            0xFE01FF00, 0xFC03FF00, 0xFB04FF00, 0xF906FF00, 0xF807FF00, 0xF609FF00
+        # IR debouncing: reports of the same code closer than repeat_ms are one press, held for hold_ms a hold
+        self.repeat_ms = repeat_ms
+        self.hold_ms = hold_ms
+
+        # Raw timing diagnostics: a signal quality score per press, next to PASS/FAIL (needs NumPy)
+        self.timing_requested = timing
+        self.timing = timing and TIMING_AVAILABLE
+
+        # Event pipeline from reader threads to the Tk main loop
+        self.ui_thread = threading.current_thread()
+        self.ui_queue = queue.Queue(maxsize=UI_QUEUE_SIZE)
+        self.ui_stats = {
+            'frames': 0,           # Frames that applied at least one event
+            'events': 0,           # Events applied in total
+            'last_batch': 0,       # Events coalesced into the last frame
+            'max_batch': 0,
+            'queue_depth': 0,      # Events still queued after the last frame
+            'max_queue_depth': 0,
         }
-        
+        self.display_state = {}    # Remote display values applied at the end of a frame
+        self.shown_display = {}    # Remote display values currently on screen
+
+        # Remote pictures and button highlights are decoded/rendered once, then swapped in
+        self.image_cache = RemoteImageCache(os.path.dirname(os.path.abspath(__file__)))
+        self.display_stats = {'updates': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+        # Session log: every line is kept in a ring buffer, the Text widget only shows the visible rows
+        self.log_buffer = LogBuffer()
+        self.log_view = LogView(self.log_buffer)
+        self.log_top = 0           # View row shown at the top of the Text widget
+        self.log_follow = True     # Stick to the newest line until the operator scrolls up
+        self.log_dirty = False
+        self.log_linespace = None
+
+        # Remote profiles (profiles/*.json) compiled into one code -> (profile, button, bit) index
+        self.registry = default_registry()
+        self.info_cache = DeviceInfoCache()  # Device type / versions per receiver serial
+
+        # Where receivers come from (HID, emulator or capture replay) and the raw report capture
+        self.transport = transport or HidTransport()
+        self.capture = CaptureWriter(capture_path) if capture_path else None
+
+        # Batch mode: finished remotes are finalized and the next one armed automatically
+        self.batch_mode = tk.BooleanVar(value=batch)
+        self.idle_timeout_s = idle_timeout_s
+        self.batch_stats = {'units': 0, 'passed': 0, 'failed': 0, 'started': time.monotonic()}
+        self.idle_check = None
+        self.verdict_flash = None
+        self.run_first_session = None  # History id of the first session of this test run ("Export Results")
+        self.run_records = []  # Sessions of this test run when there is no history to export them from
+
+        # Every finished checklist goes into the SQLite QC history, written on a background thread
+        self.station = station or station_name()
+        self.history = None
+        self.uploader = None   # Sends the history to the central collector (--collector)
+        self.dashboard = None  # Statistics window while open
+        history_error = upload_error = None
+        if history_path:
+            try:
+                self.history = HistoryWriter(history_path, on_error=self.history_failed,
+                                             on_commit=self.history_committed).start()
+            except Exception as e:
+                history_error = e
+        if self.history and collector_url:
+            try:
+                from virc_upload import ResultUploader  # No HTTP modules unless a collector is configured
+                self.uploader = ResultUploader(history_path, collector_url, on_status=self.upload_status).start()
+            except Exception as e:
+                upload_error = e
+
+        # Receivers plugged in / pulled out, and reattach of lost lanes (one enumeration pass per tick)
+        self.hotplug = HotplugMonitor(self.transport, reopen=self.reopen_lane, on_change=self.devices_changed,
+                                      on_recovered=self.lane_recovered, on_stale=self.lane_stale,
+                                      on_missing=self.lane_missing, heartbeat_targets=self.heartbeat_targets,
+                                      heartbeat_s=heartbeat_s)
+
+        # Optional Prometheus endpoint (--metrics-port): reads the counters above when scraped
+        self.metrics = None
+        self.metrics_server = None
+        self.applying_event_ns = None  # Read time of the IR event being applied, for event -> verdict latency
+        metrics_error = None
+        if metrics_port is not None:
+            try:
+                self.serve_metrics(metrics_host, metrics_port)
+            except Exception as e:
+                metrics_error = e
+
+        # Optional per-stage latency tracing (--trace) and Tk main-loop stall watchdog
+        self.tracer = tracer
+        self.trace_path = trace_path  # Chrome trace written on exit
+        self.trace_text = ""          # Latency shown in the status bar, refreshed every 30 frames
+        self.watchdog = StallWatchdog(root, stall_ms, on_stall=self.report_stall, tracer=tracer) if stall_ms else None
+
         # Keyboard shortcuts
         self.root.bind('<Control-l>', lambda e: self.clear_log())
         self.root.bind('<Control-t>', lambda e: self.start_test_mode() if not self.test_mode_active else None)
         self.root.bind('<Control-s>', lambda e: self.start_listening() if not self.is_listening else self.stop_listening())
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        self.startup.step("setup")
         self.create_widgets()
-        self.refresh_devices()
+        self.startup.step("widgets")
+        self.root.after(UI_FRAME_MS, self.process_ui_queue)
+        self.root.after(1000, self.image_cache.preload)
+        if self.watchdog:
+            self.watchdog.start()
+        # Device discovery starts once the window is drawn and takes clicks
+        self.root.after_idle(self.window_ready)
 
         # Welcome message with styling demonstration
-        self.log_message("🚀 VIRC QC Testing Station - Ready", "header")
-        self.log_message("Enhanced with colorful logging and improved layout!", "instruction")
-        self.log_message("💡 Keyboard Shortcuts: Ctrl+S (Start/Stop), Ctrl+L (Clear Log), Ctrl+T (Start Test)", "instruction")
+        self.log_message("🚀 VIRC QC Testing Station - Ready", LogKind.HEADER)
+        self.log_message("Enhanced with colorful logging and improved layout!", LogKind.INSTRUCTION)
+        self.log_message("💡 Keyboard Shortcuts: Ctrl+S (Start/Stop), Ctrl+L (Clear Log), Ctrl+T (Start Test)", LogKind.INSTRUCTION)
+        if not isinstance(self.transport, HidTransport):
+            self.log_message(f"🔌 Device source: {self.transport.description}", LogKind.INSTRUCTION)
+        if self.capture:
+            self.log_message(f"⏺ Capturing raw HID reports to {self.capture.path}", LogKind.INSTRUCTION)
+        if self.history:
+            self.log_message(f"🗄 Recording test sessions of station {self.station} to {self.history.path}",
+                             LogKind.INSTRUCTION)
+        elif history_error:
+            self.log_message(f"⚠️ QC history disabled, cannot open {history_path}: {history_error}", LogKind.WARNING)
+        if self.uploader:
+            self.log_message(f"📡 Uploading test sessions to {self.uploader.url}", LogKind.INSTRUCTION)
+        elif upload_error:
+            self.log_message(f"⚠️ Uploads to {collector_url} disabled: {upload_error}", LogKind.WARNING)
+        elif collector_url:
+            self.log_message("⚠️ Uploads to the collector need the QC history (--no-history given)", LogKind.WARNING)
+        if self.metrics_server:
+            self.log_message(f"📊 Metrics on {self.metrics_server.url}", LogKind.INSTRUCTION)
+        elif metrics_error:
+            self.log_message(f"⚠️ Metrics endpoint disabled, cannot listen on port {metrics_port}: {metrics_error}",
+                             LogKind.WARNING)
+        if self.timing:
+            self.log_message("📶 Signal quality scoring on (raw IR timing diagnostics)", LogKind.INSTRUCTION)
+        elif self.timing_requested:
+            self.log_message("⚠️ Signal quality scoring needs NumPy: pip install numpy", LogKind.WARNING)
 
     def create_tooltip(self, widget, text):
         """Create a tooltip for a widget"""
@@ -132,6 +381,7 @@ class VIRCCompleteGUI:
         ttk.Label(device_select_frame, text="Available Devices:").pack(side=tk.LEFT, padx=5)
         self.device_combo = ttk.Combobox(device_select_frame, state="readonly", width=50)
         self.device_combo.pack(side=tk.LEFT, padx=5)
+        self.device_combo.bind('<<ComboboxSelected>>', lambda e: self.show_lane_info(self.selected_lane()))
         
         button_frame = ttk.Frame(device_frame)
         button_frame.pack(fill=tk.X, pady=5)
@@ -180,7 +430,7 @@ class VIRCCompleteGUI:
         self.remote_type_var = tk.StringVar(value="Unknown")
         self.last_button_var = tk.StringVar(value="None")
         self.signal_count_var = tk.StringVar(value="0")
-        self.signal_count = 0
+        self.signal_count = 0  # Total over all lanes
 
         # Create main content area with left and right columns
         content_container = ttk.Frame(main_frame)
@@ -270,12 +520,31 @@ class VIRCCompleteGUI:
         self.export_btn.pack(pady=(8, 0))
         self.create_tooltip(self.export_btn, "Export test results to a file")
 
-        # Initialize test mode variables
+        # Batch mode: no reset / dialog between remotes
+        batch_check = tk.Checkbutton(test_controls, text="⚡ Batch mode (auto-finish, next remote right away)",
+                                     variable=self.batch_mode, bg="#e8f5e9", activebackground="#e8f5e9",
+                                     font=("Arial", 8))
+        batch_check.pack(pady=(8, 0), anchor=tk.W)
+        self.create_tooltip(batch_check, f"Finish a remote when all buttons passed or after "
+                                         f"{self.idle_timeout_s:g} s without a press, record it and wait for the next one")
+        self.batch_var = tk.StringVar(value="")
+        tk.Label(test_controls, textvariable=self.batch_var, bg="#e8f5e9", fg="#2c3e50",
+                 font=("Arial", 8, "bold")).pack(anchor=tk.W)
+
+        # Statistics dashboard over the QC history
+        self.stats_btn = ttk.Button(test_controls, text="📈 Statistics", command=self.open_dashboard,
+                                    state=tk.NORMAL if self.history else tk.DISABLED, width=38)
+        self.stats_btn.pack(pady=(8, 0))
+        self.create_tooltip(self.stats_btn, "Pass rate by shift, button failure rates, units per hour")
+        self.history_export_btn = ttk.Button(test_controls, text="📤 Export History", command=self.open_history_export,
+                                             state=tk.NORMAL if self.history else tk.DISABLED, width=38)
+        self.history_export_btn.pack(pady=(4, 0))
+        self.create_tooltip(self.history_export_btn,
+                            "Export a date range or one session of the history as CSV, JSON Lines or JUnit XML")
+
+        # Initialize test mode variables (per-receiver session state lives in DeviceLane,
+        # expected buttons come from the remote profiles)
         self.test_mode_active = False
-        self.current_remote_type = None
-        self.test_results = {}
-        self.expected_buttons = {}
-        self.setup_test_definitions()
 
         # Test Progress frame (in left column, below monitor controls)
         self.test_frame = ttk.LabelFrame(left_column, text="📋 Remote QC Test Progress", padding="5")
@@ -332,6 +601,44 @@ class VIRCCompleteGUI:
         log_container = ttk.LabelFrame(log_container_frame, text="📄 IR Signal Log", padding="5")
         log_container.pack(fill=tk.BOTH, expand=True)
 
+        # Log filter bar: kind, remote, receiver and code/text search over the whole session
+        filter_frame = ttk.Frame(log_container)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+
+        ttk.Label(filter_frame, text="Kind:", font=("Arial", 8)).pack(side=tk.LEFT)
+        self.log_kind_combo = ttk.Combobox(filter_frame, state="readonly", width=10,
+                                           values=["All"] + [kind.value for kind in LogKind])
+        self.log_kind_combo.set("All")
+        self.log_kind_combo.pack(side=tk.LEFT, padx=(2, 6))
+
+        ttk.Label(filter_frame, text="Remote:", font=("Arial", 8)).pack(side=tk.LEFT)
+        self.log_remote_combo = ttk.Combobox(filter_frame, state="readonly", width=18,
+                                             postcommand=lambda: self.log_remote_combo.configure(
+                                                 values=["All"] + sorted(self.log_buffer.keys('remote'))))
+        self.log_remote_combo.set("All")
+        self.log_remote_combo.pack(side=tk.LEFT, padx=(2, 6))
+
+        ttk.Label(filter_frame, text="Receiver:", font=("Arial", 8)).pack(side=tk.LEFT)
+        self.log_lane_combo = ttk.Combobox(filter_frame, state="readonly", width=12,
+                                           postcommand=lambda: self.log_lane_combo.configure(
+                                               values=["All"] + sorted(self.log_buffer.keys('lane'))))
+        self.log_lane_combo.set("All")
+        self.log_lane_combo.pack(side=tk.LEFT, padx=(2, 6))
+
+        self.log_search_var = tk.StringVar()
+        search_entry = ttk.Entry(filter_frame, textvariable=self.log_search_var, width=14)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 4))
+        search_entry.bind('<Return>', lambda e: self.apply_log_filter())
+        self.create_tooltip(search_entry, "Search text, or an IR code like 0xFE017F80")
+
+        for combo in (self.log_kind_combo, self.log_remote_combo, self.log_lane_combo):
+            combo.bind('<<ComboboxSelected>>', lambda e: self.apply_log_filter())
+
+        ttk.Button(filter_frame, text="Filter", width=6,
+                   command=self.apply_log_filter).pack(side=tk.LEFT)
+        ttk.Button(filter_frame, text="Show All", width=8,
+                   command=self.reset_log_filter).pack(side=tk.LEFT, padx=(4, 0))
+
         self.log_frame = ttk.Frame(log_container)
         self.log_frame.pack(fill=tk.BOTH, expand=True)
 
@@ -342,14 +649,18 @@ class VIRCCompleteGUI:
                               wrap=tk.WORD, padx=12, pady=12,
                               relief=tk.SOLID, borderwidth=2,
                               highlightthickness=1, highlightbackground="#3498db")
-        scrollbar = ttk.Scrollbar(self.log_frame, orient="vertical", command=self.ir_text.yview)
-        self.ir_text.configure(yscrollcommand=scrollbar.set)
+        # The scrollbar pages through the session log, not through the Text contents
+        self.log_scrollbar = ttk.Scrollbar(self.log_frame, orient="vertical", command=self.scroll_log)
+        self.ir_text.bind('<MouseWheel>', lambda e: self.scroll_log(tk.SCROLL, -3 if e.delta > 0 else 3, "units"))
+        self.ir_text.bind('<Button-4>', lambda e: self.scroll_log(tk.SCROLL, -3, "units"))
+        self.ir_text.bind('<Button-5>', lambda e: self.scroll_log(tk.SCROLL, 3, "units"))
+        self.ir_text.bind('<Configure>', lambda e: self.mark_log_dirty())
 
         # Configure text tags for fancy formatting
         self.setup_text_styles()
 
         self.ir_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Status bar with color-coded indicators
         status_frame = tk.Frame(main_frame, bg="#34495e", relief=tk.FLAT, height=30)
@@ -364,295 +675,746 @@ class VIRCCompleteGUI:
         status_label = tk.Label(status_frame, textvariable=self.status_var,
                                bg="#34495e", fg="white", font=("Arial", 9), anchor=tk.W)
         status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        # Event pipeline health: queue depth and events coalesced per frame
+        self.pipeline_var = tk.StringVar(value="Queue: 0 | Batch: 0")
+        pipeline_label = tk.Label(status_frame, textvariable=self.pipeline_var,
+                                  bg="#34495e", fg="#bdc3c7", font=("Arial", 8), anchor=tk.E)
+        pipeline_label.pack(side=tk.RIGHT, padx=5)
         
+    def window_ready(self):
+        """First idle pass of the main loop: the window is up, now look for receivers"""
+        self.startup.step("window")
+        self.log_message(f"⏱ Startup: {self.startup.format_summary()}", LogKind.INSTRUCTION)
+        self.refresh_devices()
+
     def refresh_devices(self):
-        """List all devices like main.py"""
-        # Try Raspberry Pi VID first, then fallback to Adafruit VID
-        devices = list(hid.enumerate(USB_VID_RASPBERRY_PI))
-        if not devices:
-            self.log_message("No devices found with Raspberry Pi VID, trying Adafruit VID...", "warning")
-            devices = list(hid.enumerate(USB_VID_ADAFRUIT))
-            if devices:
-                # Update USB_VID to use Adafruit for this session
-                global USB_VID
-                USB_VID = USB_VID_ADAFRUIT
-                self.log_message(f"Found device with Adafruit VID (0x{USB_VID_ADAFRUIT:04x})", "success")
-
-        device_list = []
-        for device in devices:
-            name = f"{device.get('manufacturer_string', 'Unknown')} - {device.get('product_string', 'Unknown')} (VID: 0x{device['vendor_id']:04x}, PID: 0x{device['product_id']:04x})"
-            device_list.append(name)
-
-        self.device_combo['values'] = device_list
-        if device_list:
-            self.device_combo.current(0)
-            self.status_var.set(f"Found {len(device_list)} device(s)")
-            # Auto-connect to the first VIRC device found
+        """List all devices like main.py (one enumeration pass, both VIRC vendor IDs), in the background"""
+        if self.discovering:
+            return
+        self.discovering = True
+        self.status_var.set("Searching for devices...")
+        threading.Thread(target=self.discover_devices, daemon=True, name="VIRC discovery").start()
+
+    def discover_devices(self):
+        """Worker thread: one enumeration pass, handed to the Tk thread"""
+        try:
+            self.hotplug.registry.scan(self.transport)
+            error = None
+        except Exception as e:
+            error = e
+        self.post_ui_event("discovered", error)
+
+    def apply_discovered(self, error):
+        """Show the enumeration pass and connect every receiver found (Tk thread)"""
+        self.discovering = False
+        if error is not None:
+            self.log_message(f"Device enumeration failed: {error}", LogKind.ERROR)
+        first = "receivers found" not in self.startup.milestones
+        found_ms = self.startup.mark("receivers found")
+        self.update_device_list()
+        for device in self.available_devices:
+            if device['vendor_id'] == USB_VID_ADAFRUIT:
+                self.log_message(f"Found device with Adafruit VID (0x{USB_VID_ADAFRUIT:04x})", LogKind.SUCCESS)
+
+        if first:
+            self.log_message(f"⏱ {len(self.available_devices)} receiver(s) found {found_ms:.0f} ms after launch",
+                             LogKind.INSTRUCTION)
+            keys = [device_key(device) for device in self.available_devices]
+            self.startup.expect("connected", keys)
+            if self.transport.answers_queries:
+                self.startup.expect("device info", keys)
+
+        if self.available_devices:
+            self.status_var.set(f"Found {len(self.available_devices)} device(s)")
+            # Auto-connect to every VIRC device found, one lane per receiver
             self.auto_connect()
         else:
-            self.device_combo.set('')
             self.status_var.set("No devices found")
 
         # Also log all devices like main.py
         self.log_message("All HID devices:")
-        for device in hid.enumerate():
+        for device in self.hotplug.registry.all_devices:
             self.log_message(f"VID: 0x{device['vendor_id']:04x}, PID: 0x{device['product_id']:04x}, Manufacturer: {device.get('manufacturer_string', 'N/A')}")
         self.log_message("")
-        
+
+        # Presence polling and reattach take over from the first pass
+        if not self.hotplug.running:
+            self.hotplug.start()
+
+    def update_device_list(self):
+        """Fill the device combo from the last enumeration, keeping the selected receiver selected"""
+        index = self.device_combo.current()
+        selected = device_key(self.available_devices[index]) if 0 <= index < len(self.available_devices) else None
+        self.available_devices = list(self.hotplug.registry)
+        keys = [device_key(device) for device in self.available_devices]
+        self.device_combo['values'] = [device_label(device) for device in self.available_devices]
+        if selected in keys:
+            self.device_combo.current(keys.index(selected))
+        elif keys:
+            self.device_combo.current(0)
+        else:
+            self.device_combo.set('')
+
+    def devices_changed(self, added, removed):
+        """Hotplug monitor thread: receivers were plugged in or pulled out (applied on the Tk thread)"""
+        self.post_ui_event("devices", added, removed)
+
+    def apply_devices_changed(self, added, removed):
+        """Update the device list after a hotplug change (Tk thread); new receivers join the session"""
+        for device_info in removed:
+            lane = self.lanes.get(device_key(device_info))
+            if lane:
+                # Also catches idle lanes, whose reader is not reading and would not notice
+                self.apply_lane_lost(lane, "Receiver unplugged, waiting for it to come back...")
+        self.update_device_list()
+        for device_info in added:
+            if not self.find_lane(device_info):
+                self.log_message(f"🔌 Receiver plugged in: {device_label(device_info)}", LogKind.SUCCESS)
+        if any(not self.find_lane(device_info) for device_info in added):
+            self.auto_connect()
+        self.status_var.set(f"Found {len(self.available_devices)} device(s), {len(self.lanes)} connected")
+
+    def find_lane(self, device_info):
+        """Return the lane already attached to an enumerated device, if any"""
+        for lane in self.lanes.values():
+            if lane.matches(device_info):
+                return lane
+        return None
+
+    def selected_lane(self):
+        """Lane of the device picked in the device combo box"""
+        selected_index = self.device_combo.current()
+        if selected_index == -1 or selected_index >= len(self.available_devices):
+            return None
+        return self.find_lane(self.available_devices[selected_index])
+
+    def show_lane_info(self, lane):
+        """Show a lane in the Device Information panel"""
+        if lane is None:
+            for var in self.device_info.values():
+                var.set("N/A")
+            return
+        self.device_info['manufacturer'].set(lane.manufacturer)
+        self.device_info['product'].set(lane.product)
+        self.device_info['serial'].set(lane.serial or 'N/A')
+        self.device_info['device_type'].set(lane.device_type)
+        self.device_info['api_version'].set(lane.api_version)
+        self.device_info['fw_version'].set(lane.fw_version)
+
+    def new_lane(self, device_info):
+        """Lane of a receiver, not opened yet (any thread)"""
+        lane = DeviceLane(device_info, self.transport.open, Debouncer(self.repeat_ms, self.hold_ms),
+                          negotiate=self.transport.answers_queries, timing=self.timing)
+        # A finished checklist stays on screen until the next remote (or batch mode) clears it
+        lane.qc = QCLane(lane.name, lane.serial, self.station, functools.partial(self.qc_event, lane),
+                         self.idle_timeout_s, rearm=False)
+        return lane
+
+    def open_lane(self, device_info):
+        """Open one receiver and register its lane"""
+        lane = self.new_lane(device_info)
+        lane.open()
+        return self.add_lane(lane)
+
+    def add_lane(self, lane):
+        """Register an opened lane and start its reader (Tk thread)"""
+        if self.capture:
+            lane.capture_id = self.capture.device_id(lane.serial or lane.path_text)
+        self.lanes[lane.key] = lane
+        lane.is_listening = self.is_listening
+        self.start_lane_reader(lane)
+        self.log_message(f"[{lane.name}] Successfully opened device", lane=lane.name)
+        self.log_message(f"[{lane.name}] Manufacturer: {lane.manufacturer}", lane=lane.name)
+        self.log_message(f"[{lane.name}] Product: {lane.product}", lane=lane.name)
+
+        # A receiver plugged in mid-session joins the running listen/test session
+        if self.test_mode_active:
+            self.setup_lane_test_ui(lane)
+        return lane
+
+    def update_connection_ui(self):
+        """Enable/disable device controls after lanes were opened or closed"""
+        if self.lanes:
+            self.disconnect_btn.config(state=tk.NORMAL)
+            self.get_info_btn.config(state=tk.NORMAL)
+            if not self.is_listening:
+                self.start_btn.config(state=tk.NORMAL)
+            self.status_indicator.config(fg="#27ae60")  # Green indicator
+        else:
+            self.disconnect_btn.config(state=tk.DISABLED)
+            self.get_info_btn.config(state=tk.DISABLED)
+            self.start_btn.config(state=tk.DISABLED)
+            self.stop_btn.config(state=tk.DISABLED)
+            self.status_indicator.config(fg="#95a5a6")  # Gray indicator
+        self.show_lane_info(self.selected_lane())
+
     def connect_device(self):
-        """Connect to device like main.py"""
+        """Connect to the selected device like main.py"""
         selected_index = self.device_combo.current()
-        if selected_index == -1:
+        if selected_index == -1 or selected_index >= len(self.available_devices):
             messagebox.showwarning("Warning", "No device selected")
             return
-            
-        devices = list(hid.enumerate(USB_VID))
-        if not devices:
-            messagebox.showerror("Error", "No devices found")
+
+        device_info = self.available_devices[selected_index]
+        if self.find_lane(device_info):
             return
-            
-        try:
-            self.device = hid.device()
-            self.device.open(USB_VID, devices[selected_index]['product_id'])
-            self.log_message("Successfully opened device")
-            self.log_message(f"Manufacturer: {devices[selected_index]['manufacturer_string']}")
-            self.log_message(f"Product: {devices[selected_index]['product_string']}")
-            
-            # Update UI
-            self.disconnect_btn.config(state=tk.NORMAL)
-            self.get_info_btn.config(state=tk.NORMAL)
-            self.start_btn.config(state=tk.NORMAL)
-            
-            self.device_info['manufacturer'].set(devices[selected_index]['manufacturer_string'] or 'Unknown')
-            self.device_info['product'].set(devices[selected_index]['product_string'] or 'Unknown')
-            self.device_info['serial'].set(devices[selected_index]['serial_number'] or 'N/A')
 
-            self.status_var.set("Connected")
-            self.status_indicator.config(fg="#27ae60")  # Green indicator
-            
+        try:
+            self.open_lane(device_info)
+            self.update_connection_ui()
+            self.status_var.set(f"Connected ({len(self.lanes)} receiver(s))")
         except Exception as e:
             messagebox.showerror("Connection Error", str(e))
             self.status_var.set("Connection failed")
-    
+
     def auto_connect(self):
-        """Automatically connect to the first VIRC device found"""
-        if self.device:  # Already connected
-            return
-            
-        selected_index = self.device_combo.current()
-        if selected_index == -1:
-            return
-            
-        devices = list(hid.enumerate(USB_VID))
+        """Automatically connect to every VIRC device found; they are opened in the background"""
+        devices = [device_info for device_info in self.available_devices
+                   if not self.find_lane(device_info) and device_key(device_info) not in self.connecting]
         if not devices:
             return
-            
-        try:
-            self.device = hid.device()
-            self.device.open(USB_VID, devices[selected_index]['product_id'])
-            self.log_message("✓ Automatically connected to VIRC device", "success")
-            self.log_message(f"Manufacturer: {devices[selected_index]['manufacturer_string']}")
-            self.log_message(f"Product: {devices[selected_index]['product_string']}")
-            
-            # Update UI - remove connect_btn reference, keep start_btn enabled
-            self.disconnect_btn.config(state=tk.NORMAL)
-            self.get_info_btn.config(state=tk.NORMAL)
-            self.start_btn.config(state=tk.NORMAL)
-            
-            # Update device info
-            self.device_info['manufacturer'].set(devices[selected_index]['manufacturer_string'] or 'Unknown')
-            self.device_info['product'].set(devices[selected_index]['product_string'] or 'Unknown')
-            self.device_info['serial'].set(devices[selected_index]['serial_number'] or 'N/A')
+        self.connecting.update(device_key(device_info) for device_info in devices)
+        threading.Thread(target=self.open_devices, args=(devices,), daemon=True, name="VIRC connect").start()
 
-            self.status_var.set("Auto-connected")
-            self.status_indicator.config(fg="#27ae60")  # Green indicator
+    def open_devices(self, devices):
+        """Worker thread: open receivers one by one, each handed to the Tk thread as soon as it is open"""
+        for device_info in devices:
+            lane = self.new_lane(device_info)
+            try:
+                lane.open()
+            except Exception as e:
+                self.post_ui_event("opened", device_info, None, e)
+            else:
+                self.post_ui_event("opened", device_info, lane, None)
+
+    def apply_lane_opened(self, device_info, lane, error):
+        """A receiver opened by auto_connect: register its lane (Tk thread)"""
+        key = device_key(device_info)
+        wanted = key in self.connecting  # Not after "Disconnect" was clicked meanwhile
+        self.connecting.discard(key)
+        if error is not None:
+            self.log_message(f"Auto-connection failed for {device_info['path']!r}: {error}")
+            self.startup.done("device info", key)
+            if not self.lanes and not self.connecting:
+                self.status_var.set("Auto-connection failed")
+        elif not wanted or self.find_lane(device_info):
+            lane.close()
+            self.startup.done("device info", key)
+        else:
+            self.add_lane(lane)
+            self.log_message(f"✓ [{lane.name}] Automatically connected to VIRC device", LogKind.SUCCESS, lane=lane.name)
+            self.update_connection_ui()
+            self.status_var.set(f"Auto-connected ({len(self.lanes)} receiver(s))")
+            # Automatically get device info (with small delay to ensure device is ready), cached per serial.
+            # A capture answers no queries; start listening to play it back
+            if self.transport.answers_queries:
+                self.root.after(500, lambda: self.get_device_info(lane, refresh=False))
+        if self.startup.done("connected", key):
+            self.log_message(f"⏱ {len(self.lanes)} receiver(s) connected {self.startup.milestones['connected']:.0f} ms "
+                             f"after launch", LogKind.INSTRUCTION)
 
-            # Automatically get device info (with small delay to ensure device is ready)
-            self.root.after(500, self.get_device_info)
-            
-        except Exception as e:
-            self.log_message(f"Auto-connection failed: {e}")
-            self.status_var.set("Auto-connection failed")
-        
     def disconnect_device(self):
-        """Disconnect from device"""
-        if self.device:
+        """Disconnect from all devices"""
+        self.connecting.clear()  # Receivers still being opened are closed as they come in
+        if self.lanes:
             self.stop_listening()
-            self.device.close()
-            self.device = None
+            for lane in self.lanes.values():
+                lane.reading = False  # Let every reader wind down at once
+            for lane in self.lanes.values():
+                self.hotplug.forget(lane.key)
+                lane.close()
+            self.lanes = {}
 
             # Update UI
-            self.status_indicator.config(fg="#95a5a6")  # Gray indicator
-            self.disconnect_btn.config(state=tk.DISABLED)
-            self.get_info_btn.config(state=tk.DISABLED)
-            self.start_btn.config(state=tk.DISABLED)
-            self.stop_btn.config(state=tk.DISABLED)
-            
-            # Reset device info
-            for var in self.device_info.values():
-                var.set("N/A")
-                
+            self.update_connection_ui()
             self.status_var.set("Disconnected")
-            self.log_message("Disconnected from device")
-        
-    def get_device_info(self):
-        """Get device info like main.py"""
-        if not self.device:
+            self.log_message("Disconnected from all devices")
+
+    def get_device_info(self, lane=None, refresh=True):
+        """Get device info like main.py (selected receiver unless a lane is given), without blocking the UI"""
+        if lane is None:
+            lane = self.selected_lane()
+        if lane is None or not lane.device:
             return
-            
-        commands = [
-            (b'\x00\x01', "Device Type"),
-            (b'\x00\x03', "API Version"),
-            (b'\x00\x05', "Firmware Version")
-        ]
-        
-        for cmd, desc in commands:
-            try:
-                self.log_message(f"Getting {desc}...")
-                self.device.write(cmd)
-                response = self.device.read(64, 1000)
-                self.log_message(f"{desc} response: {list(response)}")
-                
-                if desc == "Device Type" and len(response) >= 3:
-                    self.device_info['device_type'].set(str(response[2]))
-                elif desc == "API Version" and len(response) >= 4:
-                    self.device_info['api_version'].set(f"{response[2]}.{response[3]}")
-                elif desc == "Firmware Version" and len(response) >= 4:
-                    self.device_info['fw_version'].set(f"{response[2]}.{response[3]}")
-                    
-            except Exception as e:
-                self.log_message(f"Error getting {desc}: {e}")
-        
+
+        cached = None if refresh else self.info_cache.get(lane.serial)
+        if cached:
+            self.log_message(f"[{lane.name}] Device info (cached): {cached}", lane=lane.name)
+            self.apply_device_info(lane, cached)
+            return
+
+        # Replies come in through the lane's reader, so IR presses keep flowing meanwhile
+        threading.Thread(target=self.query_lane_info, args=(lane,), daemon=True,
+                         name=f"VIRC info {lane.name}").start()
+
+    def query_lane_info(self, lane):
+        """Worker thread: pipeline the info queries of one lane and hand the result to the UI"""
+        def on_reply(desc, result):
+            if isinstance(result, Exception):
+                self.log_message(f"[{lane.name}] Error getting {desc}: {result}", lane=lane.name)
+            else:
+                self.log_message(f"[{lane.name}] {desc} response: {list(result)}", lane=lane.name)
+
+        self.log_message(f"[{lane.name}] Getting Device Type, API Version and Firmware Version...", lane=lane.name)
+        try:
+            info = query_device_info(lane.device, lane.queries, on_reply=on_reply)
+        except Exception as e:  # Device closed or lost while writing
+            self.log_message(f"[{lane.name}] Error getting device info: {e}", lane=lane.name)
+            return
+        self.info_cache.put(lane.serial, info)
+        self.post_ui_event("info", lane, info)
+
+    def apply_device_info(self, lane, info):
+        """Show query results (Tk thread)"""
+        lane.device_type, lane.api_version, lane.fw_version = info.device_type, info.api_version, info.fw_version
+        if self.startup.done("device info", lane.key):
+            self.log_message(f"⏱ Device info of every receiver {self.startup.milestones['device info']:.0f} ms "
+                             f"after launch", LogKind.INSTRUCTION)
+        if lane is self.selected_lane():
+            self.show_lane_info(lane)
+
     def start_listening(self):
-        """Start listening for IR signals like main.py"""
-        if not self.device:
+        """Start listening for IR signals like main.py, one reader thread per receiver"""
+        if not self.lanes:
             messagebox.showwarning("Warning", "No device connected")
             return
-            
+
         self.is_listening = True
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
-        self.status_var.set("Listening for IR signals...")
-        
-        self.log_message("Waiting for IR signals... (Press Stop to exit)", "instruction")
-        self.log_message("Press any button on your remote to detect remote type...", "instruction")
-        
-        self.listen_thread = threading.Thread(target=self.listen_for_ir, daemon=True)
-        self.listen_thread.start()
-        
+        self.status_var.set(f"Listening for IR signals on {len(self.lanes)} receiver(s)...")
+
+        self.log_message("Waiting for IR signals... (Press Stop to exit)", LogKind.INSTRUCTION)
+        self.log_message("Press any button on your remote to detect remote type...", LogKind.INSTRUCTION)
+
+        for lane in self.lanes.values():
+            lane.is_listening = True
+            lane.wakeup.set()
+
+    def start_lane_reader(self, lane):
+        """Start the reader thread of one lane (runs until the lane is closed)"""
+        current = threading.current_thread()
+        if lane.listen_thread and lane.listen_thread.is_alive() and lane.listen_thread is not current:
+            lane.listen_thread.join(timeout=0.5)  # Reader of the lost handle, ends right after reporting it
+        lane.reading = True
+        lane.listen_thread = threading.Thread(target=self.listen_for_ir, args=(lane,), daemon=True,
+                                             name=f"VIRC reader {lane.name}")
+        lane.listen_thread.start()
+
     def stop_listening(self):
         """Stop listening for IR signals"""
         self.is_listening = False
+        for lane in self.lanes.values():
+            lane.is_listening = False  # Readers keep running for queries; IR reports are no longer forwarded
 
-        # Wait a moment for thread to finish reading
-        if self.listen_thread and self.listen_thread.is_alive():
-            self.listen_thread.join(timeout=0.5)
-
-        self.start_btn.config(state=tk.NORMAL)
+        if self.lanes:
+            self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_var.set("Stopped listening")
         self.log_message("Stopped listening for IR signals")
-        
-    def listen_for_ir(self):
-        """Listen for IR signals like main.py"""
-        while self.is_listening and self.device:
+        for lane in self.lanes.values():
+            d = lane.debouncer
+            if d.suppressed:
+                self.log_message(f"[{lane.name}] {d.presses} presses, {d.repeats} repeats and {d.holds} holds suppressed",
+                                 LogKind.INSTRUCTION, lane=lane.name)
+            if lane.sequence.lost:
+                self.log_message(f"[{lane.name}] {lane.sequence.lost} of {lane.sequence.events + lane.sequence.lost} "
+                                 f"IR events lost by the receiver", LogKind.WARNING, lane=lane.name)
+        if self.tracer:
+            self.log_message("⏱ Latency per stage (rolling window):", LogKind.HEADER)
+            for line in self.tracer.format_summary():
+                self.log_message(line, LogKind.INSTRUCTION)
+
+    def listen_for_ir(self, lane):
+        """Listen for IR signals on one receiver like main.py"""
+        tracer = self.tracer
+        read_start = 0
+        while lane.reading and lane.device:
             try:
-                # Check if still listening before reading (prevents error on stop)
-                if not self.is_listening:
-                    break
+                # Nothing to read for: leave reports in the device until listening starts or a query is sent
+                if not lane.is_listening and not lane.queries.pending:
+                    lane.wakeup.wait(0.1)
+                    lane.wakeup.clear()
+                    continue
 
                 try:
-                    response = self.device.read(64, 100)
-                except OSError as e:
-                    # Device was closed while reading (happens on stop)
-                    if not self.is_listening:
+                    if tracer:
+                        read_start = trace_ns()
+                    response = lane.device.read(64, 100)
+                except OSError:
+                    # Device was closed while reading (happens on disconnect)
+                    if not lane.reading:
                         break  # Expected, just exit quietly
                     raise  # Unexpected, re-raise
 
-                if response and response[0] == 7:
-                    ir_code = 0
-                    for i in range(4):
-                        ir_code |= response[2+i] << (8*i)
-
-                    # Debouncing: Ignore duplicate IR codes within debounce_delay
-                    current_time = time.time()
-                    if ir_code == self.last_ir_code and (current_time - self.last_ir_time) < self.debounce_delay:
-                        continue  # Skip duplicate signal
-
-                    self.last_ir_code = ir_code
-                    self.last_ir_time = current_time
-
-                    name = self.code_map.get(ir_code, "Unknown Button")
-                    remote_type = self.detect_remote_type(ir_code)
-
-                    # Update remote display
-                    self.update_remote_display(remote_type, name)
-
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-
-                    self.log_message(f"\n[{timestamp}] Received IR signal:", "ir_signal")
-                    self.log_message(f"Raw bytes: {[hex(x) for x in response[:6]]}")
-                    self.log_message(f"IR Code: 0x{ir_code:08X} : {name}", "ir_signal")
-                    self.log_message(f"Detected remote type: {remote_type}", "test")
-                    self.log_message("-" * 50)
+                if not response:
+                    if getattr(lane.device, 'finished', False):
+                        self.log_message(f"[{lane.name}] Replay finished", LogKind.SUCCESS, lane=lane.name)
+                        break
+                    lane.read_timeouts += 1
+                    continue
+                if self.capture:
+                    self.capture.write(lane.capture_id, response)
+
+                # Query replies (IDs 0/2/4/6) go to the waiting get_device_info, never into the IR stream
+                if lane.queries.route(response):
+                    continue
+
+                if response[0] == REPORT_RAW_TIMING:
+                    # Durations of a press just sent: scored once its last chunk is in
+                    frame = lane.timing.feed(response) if lane.timing and lane.is_listening else None
+                    quality = signal_quality(frame[1]) if frame else None
+                    if quality:
+                        self.post_ui_event("quality", lane, quality)
+                    continue
+                if not lane.is_listening or response[0] not in (REPORT_IR_CODE, REPORT_IR_BATCH):
+                    continue
+                read_end = trace_ns()  # Also where the event -> verdict latency starts
+                if tracer:
+                    tracer.span("read", read_start, read_end, lane=lane.name)
+                if response[0] == REPORT_IR_CODE:
+                    events = ((decode_ir_code(response), None, False),)  # Timed by the host clock
+                else:
+                    # Format 2: several events per report, timed by the receiver, gaps in the sequence are lost events.
+                    # The receiver flags the frames of a held button itself: the debouncer counts those as repeats
+                    # (and holds) however late they arrive, so they never make a new press.
+                    lost = lane.sequence.lost
+                    events = [(event.code, device_ns, event.repeat) for event, device_ns in lane.sequence.feed(response)]
+                    if lane.sequence.lost != lost:
+                        self.log_message(f"[{lane.name}] {lane.sequence.lost - lost} IR event(s) lost by the receiver",
+                                         LogKind.WARNING, lane=lane.name)
+
+                for ir_code, device_ns, repeat in events:
+                    entry = self.registry.lookup(ir_code)
+                    if tracer:
+                        decoded = trace_ns()
+                        tracer.span("decode", read_end, decoded, lane=lane.name)
+
+                    # Debouncing: only the first report of a press goes on, repeats of a held button are counted
+                    press = lane.debouncer.feed(ir_code, device_ns, repeat)
+                    if tracer:
+                        enqueued = trace_ns()
+                        tracer.span("debounce", decoded, enqueued, lane=lane.name, press=press)
+                    if press != PRESS:
+                        if press == HOLD:
+                            name = entry.button if entry else f"0x{ir_code:08X}"
+                            self.log_message(f"[{lane.name}] Button held: {name}", LogKind.INSTRUCTION,
+                                             code=ir_code, lane=lane.name)
+                        continue
+                    current_time = lane.clock()
+
+                    # Hand the event to the Tk thread (blocks rather than drops when the UI lags).
+                    # hidapi returns a fresh list per read, so the report is passed on as is.
+                    trace = (read_end, enqueued) if tracer else None
+                    self.post_ui_event("ir", lane, ir_code, entry, response, current_time, read_end, trace)
+                    if tracer:
+                        tracer.span("enqueue", enqueued, lane=lane.name)
 
             except Exception as e:
-                # Only log error if we're still supposed to be listening
-                if self.is_listening:
-                    self.log_message(f"HID error: {e}", "error")
-                    self.log_message("Device may have been disconnected. Attempting to reconnect...")
-                    self.handle_reconnection()
+                # Only log error if the lane was not closed on purpose
+                if lane.reading:
+                    self.log_message(f"[{lane.name}] HID error: {e}", LogKind.ERROR, lane=lane.name)
+                    self.log_message(f"[{lane.name}] Device may have been disconnected. Attempting to reconnect...", lane=lane.name)
+                    self.handle_reconnection(lane)
                 break
-                
+
     def detect_remote_type(self, ir_code):
         """Detect remote type like main.py"""
-        if ir_code in self.white_remote_codes:
-            return "White Remote (Scanmode 1)"
-        elif ir_code in self.black_remote_codes:
-            return "Black Remote (Scanmode 2)"
-        else:
-            return "Unknown Remote"
-            
-    def handle_reconnection(self):
-        """Handle reconnection like main.py"""
-        was_listening = self.is_listening
-        self.is_listening = False  # Stop current listening
+        entry = self.registry.lookup(ir_code)
+        return entry.profile.name if entry else "Unknown Remote"
+
+    def handle_reconnection(self, lane):
+        """A receiver's handle failed (any thread): the Tk thread closes it, the hotplug monitor reopens it"""
+        self.post_ui_event("lost", lane)
+
+    def apply_lane_lost(self, lane, message=None):
+        """Close a lost receiver and have the hotplug monitor look for it (Tk thread)"""
+        if self.lanes.get(lane.key) is not lane or not lane.device:
+            return  # Disconnected, or already closed by another report of the same loss
+        if message:
+            self.log_message(f"[{lane.name}] {message}", LogKind.WARNING, lane=lane.name)
+        lane.close()  # Also fails queries still waiting for a reply
+        self.hotplug.lost(lane.key)
+
+    def reopen_lane(self, key, device_info):
+        """Hotplug monitor thread: open a lost lane's receiver on its (possibly new) path
+
+        Only the handle is opened here; the Tk thread attaches it and starts the reader,
+        so the lane table and the lanes themselves are only ever changed on the Tk thread.
+        """
+        lane = self.lanes.get(key)
+        if lane is None:
+            return False  # Lane was disconnected meanwhile
+        if lane.device:
+            return None  # Loss not applied by the Tk thread yet (heartbeat): retry at the next scan
+        self.post_ui_event("reopened", key, device_info, self.transport.open(device_info['path']))
+        return True
+
+    def apply_lane_reopened(self, key, device_info, device):
+        """Attach a reopened handle to its lane and restart the reader (Tk thread)"""
+        lane = self.lanes.get(key)
+        if lane is None or lane.device:
+            device.close()  # Disconnected meanwhile
+            return
+        lane.path = device_info['path']
+        try:
+            lane.attach(device)
+        except Exception as e:
+            lane.close()
+            self.log_message(f"[{lane.name}] Reopened device failed: {e}", LogKind.ERROR, lane=lane.name)
+            self.hotplug.lost(key)
+            return
+        lane.is_listening = self.is_listening
+        self.start_lane_reader(lane)
+
+    def lane_recovered(self, key, seconds):
+        if self.metrics:
+            self.metrics.recovery.observe(seconds)
+        lane = self.lanes.get(key)
+        if lane is None:
+            return
+        self.log_message(f"[{lane.name}] Reconnected to device in {seconds * 1000:.0f} ms.", LogKind.SUCCESS, lane=lane.name)
+        # Resume listening if we were listening before
+        if lane.is_listening:
+            self.log_message(f"[{lane.name}] Resumed listening for IR signals", LogKind.SUCCESS, lane=lane.name)
+
+    def lane_stale(self, key):
+        lane = self.lanes.get(key)
+        if lane is not None:
+            self.post_ui_event("lost", lane, "No heartbeat reply, reopening the device...")
+
+    def lane_missing(self, key, seconds):
+        lane = self.lanes.get(key)
+        if lane is not None:
+            self.log_message(f"[{lane.name}] Device not found for {seconds:.0f} s, it reconnects as soon as it is plugged back in.",
+                             LogKind.WARNING, lane=lane.name)
+
+    def heartbeat_targets(self):
+        """(key, device, query router) of every open lane, for the hotplug monitor's heartbeat"""
+        return [(lane.key, lane.device, lane.queries) for lane in list(self.lanes.values())
+                if lane.device and lane.reading]
+
+    def post_ui_event(self, kind, *args):
+        """Queue an event for the Tk thread (safe to call from any thread)"""
+        self.ui_queue.put((kind, args))
+
+    def process_ui_queue(self):
+        """Drain queued events once per frame and apply them as one batch"""
+        try:
+            self.apply_ui_frame()
+        finally:
+            # Whatever went wrong in this frame, the next one still runs
+            self.root.after(UI_FRAME_MS, self.process_ui_queue)
 
-        if self.device:
+    def apply_ui_frame(self):
+        batch = []
+        try:
+            while len(batch) < UI_MAX_BATCH:
+                batch.append(self.ui_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        history_committed = False
+        if batch:
+            frame_start = trace_ns() if self.tracer else 0
             try:
-                self.device.close()
-            except:
-                pass
+                for kind, args in batch:
+                    if kind == "history":
+                        history_committed = True
+                    try:
+                        self.apply_ui_event(kind, args)
+                    except Exception as e:
+                        # One failing handler must not take the rest of the batch (or the window) with it
+                        self.log_message(f"❌ Error handling {kind} event: {type(e).__name__}: {e}", LogKind.ERROR)
+                        traceback.print_exc()
+            finally:
+                self.flush_remote_display()
+            if history_committed and self.dashboard:
+                self.dashboard.refresh()  # Summary tables only, one refresh per frame at most
+
+        # New log lines (from this frame or from button handlers) are rendered once per frame
+        if self.log_dirty:
+            self.render_log()
+        if batch and self.tracer:
+            self.tracer.span("frame", frame_start, events=len(batch))
+
+        stats = self.ui_stats
+        depth = self.ui_queue.qsize()
+        stats['queue_depth'] = depth
+        if self.metrics:
+            self.metrics.queue_depth.observe(depth + len(batch))  # Backlog at the start of the frame
+        stats['max_queue_depth'] = max(stats['max_queue_depth'], depth + len(batch))
+        stats['last_batch'] = len(batch)
+        if batch:
+            stats['frames'] += 1
+            stats['events'] += len(batch)
+            stats['max_batch'] = max(stats['max_batch'], len(batch))
+            pipeline_text = f"Queue: {depth} | Batch: {len(batch)}"
+            if self.tracer and stats['frames'] % 30 == 1:
+                latency = self.tracer.percentiles("event")
+                self.trace_text = f" | Event p95: {latency[1]:.1f} ms" if latency else ""
+            self.pipeline_var.set(pipeline_text + self.trace_text)
+
+    def apply_ui_event(self, kind, args):
+        """Apply one queued event (Tk thread)"""
+        if kind == "ir":
+            self.apply_ir_event(*args)
+        elif kind == "log":
+            self.log_message(*args)
+        elif kind == "info":
+            self.apply_device_info(*args)
+        elif kind == "devices":
+            self.apply_devices_changed(*args)
+        elif kind == "lost":
+            self.apply_lane_lost(*args)
+        elif kind == "reopened":
+            self.apply_lane_reopened(*args)
+        elif kind == "discovered":
+            self.apply_discovered(*args)
+        elif kind == "opened":
+            self.apply_lane_opened(*args)
+        elif kind == "quality":
+            self.apply_signal_quality(*args)
+        elif kind == "upload":
+            self.apply_upload_status(*args)
+        elif kind == "history":
+            self.apply_history_committed(*args)
+
+    def apply_history_committed(self, sessions):
+        """Log the history id of every recorded session (for exporting just that one) and allow exporting the run"""
+        for session_id, record in sessions:
+            self.log_message(f"🗄 [{record.receiver}] {record.remote} {record.verdict} saved as session #{session_id}",
+                             LogKind.TEST, remote=record.remote, lane=record.receiver)
+            if self.test_mode_active and self.run_first_session is None:
+                self.run_first_session = session_id
+        if self.test_mode_active and self.run_first_session is not None:
+            self.export_btn.config(state=tk.NORMAL)
+
+    def apply_ir_event(self, lane, ir_code, entry, report, event_time, received_ns=None, trace=None):
+        """Apply one decoded IR event on the Tk thread"""
+        if trace:
+            applying = trace_ns()
+            self.tracer.span("queue", trace[1], applying, lane=lane.name)
+        name = entry.button if entry else "Unknown Button"
+        remote_type = entry.profile.name if entry else "Unknown Remote"
+        self.applying_event_ns = received_ns
+        self.update_remote_display(lane, ir_code, entry, event_time)
+        self.applying_event_ns = None
+
+        # Log lines are formatted only if they are ever rendered
+        tags = {'code': ir_code, 'remote': remote_type, 'lane': lane.name}
+        self.log_message(LazyMessage(format_ir_header, event_time, lane.name), LogKind.IR_SIGNAL, **tags)
+        self.log_message(LazyMessage(format_raw_bytes, report), **tags)
+        self.log_message(LazyMessage("IR Code: 0x{:08X} : {}".format, ir_code, name), LogKind.IR_SIGNAL, **tags)
+        self.log_message(LazyMessage("Detected remote type: {}".format, remote_type), LogKind.TEST, **tags)
+        self.log_message(IR_EVENT_SEPARATOR, LogKind.SEPARATOR, **tags)
+        if trace:
+            applied = trace_ns()
+            self.tracer.span("apply", applying, applied, lane=lane.name)
+            self.tracer.span("event", trace[0], applied, lane=lane.name, code=f"0x{ir_code:08X}")
+
+    def apply_signal_quality(self, lane, quality):
+        """Store and show the signal quality of a press (Tk thread)"""
+        lane.quality[quality.code] = quality
+        if lane.qc:
+            lane.qc.scores[quality.code] = quality.score
+        entry = self.registry.lookup(quality.code)
+        name = entry.button if entry else f"0x{quality.code:08X}"
+        rating = grade(quality.score)
+        label = lane.quality_labels.get(quality.code)
+        if label is not None:
+            label.config(text=f"q {quality.score:.0f}", foreground=QUALITY_COLORS[rating])
+        kind = LogKind.INSTRUCTION if rating == "good" else LogKind.WARNING
+        self.log_message(f"📶 [{lane.name}] Signal quality {name}: {quality}", kind, code=quality.code, lane=lane.name)
+
+    def mark_log_dirty(self):
+        self.log_dirty = True
+
+    def log_visible_rows(self):
+        """Number of log lines that fit in the Text widget"""
+        if self.log_linespace is None:
+            self.log_linespace = tkfont.Font(font=self.ir_text.cget("font")).metrics("linespace")
+        height = self.ir_text.winfo_height()
+        if height <= 1:  # Not mapped yet
+            return 40
+        return max(1, (height - 24) // self.log_linespace)
+
+    def render_log(self):
+        """Render only the visible window of the log view into the Text widget"""
+        self.log_dirty = False
+        total = len(self.log_view)
+        visible = self.log_visible_rows()
+        last_top = max(0, total - visible)
+        if self.log_follow:
+            self.log_top = last_top
+        self.log_top = max(0, min(self.log_top, last_top))
+
+        chunks = []
+        for entry in self.log_view.rows(self.log_top, visible):
+            chunks.extend((f"[{entry.time_text}] ", "timestamp", f"{entry.message}\n", entry.kind.value))
 
-        for attempt in range(10):
-            time.sleep(1)
-            devices = list(hid.enumerate(USB_VID))
-            if devices:
-                try:
-                    self.device = hid.device()
-                    self.device.open(USB_VID, devices[0]['product_id'])
-                    self.log_message("Reconnected to device.", "success")
-
-                    # Restart listening if we were listening before
-                    if was_listening:
-                        self.is_listening = True
-                        self.listen_thread = threading.Thread(target=self.listen_for_ir, daemon=True)
-                        self.listen_thread.start()
-                        self.log_message("Resumed listening for IR signals", "success")
-
-                    return
-                except Exception as reconnect_ex:
-                    self.log_message(f"Reconnect attempt {attempt+1} failed: {reconnect_ex}", "warning")
-            else:
-                self.log_message(f"Reconnect attempt {attempt+1}: Device not found.", "warning")
+        self.ir_text.delete(1.0, tk.END)
+        if chunks:
+            self.ir_text.insert(tk.END, *chunks)
+        if self.log_follow:
+            self.ir_text.see(tk.END)
+
+        if total:
+            self.log_scrollbar.set(self.log_top / total, min(1.0, (self.log_top + visible) / total))
+        else:
+            self.log_scrollbar.set(0.0, 1.0)
+
+    def scroll_log(self, action, amount, unit=None):
+        """Scrollbar/mouse wheel handler: move the visible window over the log view"""
+        total = len(self.log_view)
+        visible = self.log_visible_rows()
+        if action == tk.MOVETO:
+            top = int(float(amount) * total)
+        else:
+            step = int(amount) * (visible if unit == tk.PAGES else 1)
+            top = self.log_top + step
+        last_top = max(0, total - visible)
+        self.log_top = max(0, min(top, last_top))
+        self.log_follow = self.log_top >= last_top
+        self.render_log()
+        return "break"
+
+    def apply_log_filter(self):
+        """Filter the log view by kind, remote, receiver and IR code or text"""
+        kind = self.log_kind_combo.get()
+        remote = self.log_remote_combo.get()
+        lane = self.log_lane_combo.get()
+        search = self.log_search_var.get().strip()
+
+        # An IR code ("0xFE017F80", "FE017F80") also finds its events' lines; "Bed" is just text
+        self.log_view.set_filter(
+            kind=LogKind(kind) if kind not in ("", "All") else None,
+            remote=remote if remote not in ("", "All") else None,
+            lane=lane if lane not in ("", "All") else None,
+            search=search,
+        )
+        self.log_follow = True
+        self.render_log()
+
+    def reset_log_filter(self):
+        for combo in (self.log_kind_combo, self.log_remote_combo, self.log_lane_combo):
+            combo.set("All")
+        self.log_search_var.set("")
+        self.log_view.set_filter()
+        self.log_follow = True
+        self.render_log()
 
-        self.log_message("Failed to reconnect after multiple attempts.", "error")
-        self.stop_listening()
-        
     def clear_log(self):
-        """Clear the IR log"""
-        self.ir_text.delete(1.0, tk.END)
-        
+        """Clear the IR log view (the session history stays available to filters)"""
+        self.log_view.clear()
+        for combo in (self.log_kind_combo, self.log_remote_combo, self.log_lane_combo):
+            combo.set("All")
+        self.log_search_var.set("")
+        self.log_top = 0
+        self.log_follow = True
+        self.render_log()
+
     def setup_text_styles(self):
         """Setup fancy text styles for different message types"""
         # Header styles
@@ -684,174 +1446,122 @@ class VIRCCompleteGUI:
         # Separator lines
         self.ir_text.tag_configure("separator", foreground="#444444", font=("Consolas", 10))
     
-    def log_message(self, message, style="normal"):
-        """Add a fancy formatted message to the IR log with timestamp"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # Insert timestamp with special formatting
-        self.ir_text.insert(tk.END, f"[{timestamp}] ", "timestamp")
-        
-        # Determine style based on message content if not specified
-        if style == "normal":
-            if "🧪 QC TEST MODE" in message or "🏁 QC TEST RESULTS" in message:
-                style = "header"
-            elif "✅" in message or "PASS" in message:
-                style = "success"
-            elif "❌" in message or "FAIL" in message:
-                style = "error"
-            elif "❓" in message or "WARNING" in message:
-                style = "warning"
-            elif "🎯" in message or "📝" in message or "📊" in message:
-                style = "test"
-            elif "Received IR signal" in message or "IR Code:" in message:
-                style = "ir_signal"
-            elif "Instructions:" in message or message.startswith(("1.", "2.", "3.", "4.")):
-                style = "instruction"
-            elif message.startswith("-" * 10) or message.startswith("=" * 10):
-                style = "separator"
-        
-        # Insert message with appropriate style
-        self.ir_text.insert(tk.END, f"{message}\n", style)
-        self.ir_text.see(tk.END)
-
-        # Performance: Limit log size to prevent slowdown
-        line_count = int(self.ir_text.index('end-1c').split('.')[0])
-        if line_count > 500:
-            self.ir_text.delete(1.0, "100.0")  # Delete first 100 lines
-    
-    def load_remote_image(self, image_path, size=(100, 160)):
-        """Load and resize remote image"""
-        if not PIL_AVAILABLE:
-            return None
-        try:
-            image = Image.open(image_path)
-            image = image.resize(size, Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(image)
-        except Exception as e:
-            self.log_message(f"Error loading image {image_path}: {e}")
-            return None
-    
-    def update_remote_display(self, remote_type, button_name):
+    def log_message(self, message, kind=LogKind.NORMAL, code=None, remote=None, lane=None):
+        """Add a typed message to the session log (rendered on the next frame)"""
+        if threading.current_thread() is not self.ui_thread:
+            # Called from a reader thread: let the Tk thread append it
+            self.post_ui_event("log", message, kind, code, remote, lane)
+            return
+
+        self.log_buffer.append(kind, message, code, remote, lane)
+        self.log_dirty = True
+
+    def update_remote_display(self, lane, ir_code, entry, event_time=None):
         """Update the remote display with current remote type and button"""
-        # Update remote type
-        self.remote_type_var.set(remote_type)
-        
-        # Update last button
-        self.last_button_var.set(button_name)
-        
-        # Update signal count
+        button_name = entry.button if entry else "Unknown Button"
+        # Remote type, last button and signal count are applied once per frame
         self.signal_count += 1
-        self.signal_count_var.set(str(self.signal_count))
-        
-        # Update remote image based on type
-        if "White Remote" in remote_type:
-            self.show_white_remote_image()
-        elif "Black Remote" in remote_type:
-            self.show_black_remote_image()
-        else:
-            self.show_unknown_remote()
-        
+        lane.signal_count += 1
+        self.display_state = {
+            'profile': entry.profile if entry else None,
+            'remote_type': entry.profile.name if entry else "Unknown Remote",
+            'button': button_name,
+            'last_button': f"{button_name} ({lane.name})",
+            'signal_count': f"{self.signal_count} ({lane.name}: {lane.signal_count})",
+        }
+
         # Test mode logic
         if self.test_mode_active:
-            self.handle_test_button_press(remote_type, button_name)
-    
-    def show_white_remote_image(self):
-        """Display white remote image"""
-        if PIL_AVAILABLE:
-            try:
-                # Try to load white remote image
-                white_image = self.load_remote_image("white_remote.png")
-                if white_image:
-                    self.remote_image_label.configure(image=white_image, text="")
-                    self.remote_image_label.image = white_image  # Keep a reference
-                    return
-            except:
-                pass
-        
-        # Fallback to text display
-        self.remote_image_label.configure(image="", text="White Remote\n📱", 
-                                        font=("Arial", 12), background="white")
-    
-    def show_black_remote_image(self):
-        """Display black remote image"""
-        if PIL_AVAILABLE:
-            try:
-                # Try to load actual black remote image (JPEG)
-                black_image = self.load_remote_image("black_remote.jpeg")
-                if black_image:
-                    self.remote_image_label.configure(image=black_image, text="")
-                    self.remote_image_label.image = black_image  # Keep a reference
-                    return
-                # Fallback to PNG version
-                black_image = self.load_remote_image("black_remote.png")
-                if black_image:
-                    self.remote_image_label.configure(image=black_image, text="")
-                    self.remote_image_label.image = black_image  # Keep a reference
-                    return
-            except:
-                pass
-        
+            verdict_start = trace_ns() if self.tracer else 0
+            self.handle_test_button_press(lane, ir_code, entry, event_time)
+            if self.tracer:
+                self.tracer.span("verdict", verdict_start, lane=lane.name)
+
+    def flush_remote_display(self):
+        """Apply the latest remote display values, touching only widgets that changed"""
+        state, shown = self.display_state, self.shown_display
+        if state.get('last_button') != shown.get('last_button'):
+            self.last_button_var.set(state['last_button'])
+        if state.get('signal_count') != shown.get('signal_count'):
+            self.signal_count_var.set(state['signal_count'])
+
+        remote_type = state.get('remote_type')
+        if remote_type is not None and remote_type != shown.get('remote_type'):
+            self.remote_type_var.set(remote_type)
+
+        button = state.get('button')
+        if remote_type is not None and (remote_type, button) != (shown.get('remote_type'), shown.get('button')):
+            start = time.perf_counter()
+            # Update remote image based on the profile, highlighting the pressed button
+            profile = state.get('profile')
+            if profile is not None:
+                self.show_remote_image(profile, button)
+            else:
+                self.show_unknown_remote()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats = self.display_stats
+            stats['updates'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        self.shown_display = dict(state)
+
+    def show_remote_image(self, profile, button=None):
+        """Display the remote image of a profile (from the image cache)"""
+        remote_image = self.image_cache.photo(profile.image, button=button) if profile.image else None
+        if remote_image:
+            self.remote_image_label.configure(image=remote_image, text="")
+            self.remote_image_label.image = remote_image  # Keep a reference (the cache may evict it)
+            return
+
         # Fallback to text display
-        self.remote_image_label.configure(image="", text="Black Remote\n📱", 
-                                        font=("Arial", 12), background="black", foreground="white")
+        self.remote_image_label.configure(image="", text=f"{profile.name.split(' (')[0]}\n📱",
+                                        font=("Arial", 12),
+                                        background=profile.display.get("background", "lightgray"),
+                                        foreground=profile.display.get("foreground", "black"))
     
     def show_unknown_remote(self):
         """Display unknown remote placeholder"""
         self.remote_image_label.configure(image="", text="Unknown Remote\n❓", 
                                         font=("Arial", 12), background="lightgray")
     
-    def setup_test_definitions(self):
-        """Define expected buttons for each remote type"""
-        self.expected_buttons = {
-            "White Remote (Scanmode 1)": {
-                0xFE017F80: "Short Pause",
-                0xFC037F80: "Long Pause", 
-                0xFB047F80: "Bed Mode",
-                0xF9067F80: "Chair Mode",
-                0xF8077F80: "Square Button",
-                0xF6097F80: "Triangle Button"
-            },
-            "Black Remote (Scanmode 2)": {
-                0xFE01FF00: "Short Pause",
-                0xFC03FF00: "Long Pause",
-                0xFB04FF00: "Bed Mode", 
-                0xF906FF00: "Chair Mode",
-                0xF807FF00: "Square Button",
-                0xF609FF00: "Triangle Button"
-            }
-        }
-    
     def start_test_mode(self):
-        """Start the QC test mode"""
-        if not self.device:
+        """Start the QC test mode on every connected receiver"""
+        if not self.lanes:
             messagebox.showwarning("Warning", "Please connect a device first")
             return
-            
+
         self.test_mode_active = True
-        self.current_remote_type = None
-        self.test_results = {}
-                
+        for lane in self.lanes.values():
+            lane.reset_test()
+        self.batch_stats = {'units': 0, 'passed': 0, 'failed': 0, 'started': time.monotonic()}
+        self.run_first_session = None
+        self.run_records = []
+        self.update_batch_display()
+        if self.idle_check is None:
+            self.idle_check = self.root.after(IDLE_CHECK_MS, self.check_idle_lanes)
+
         # Enable/disable appropriate buttons
         self.test_mode_btn.config(state=tk.DISABLED)
         self.reset_test_btn.config(state=tk.NORMAL)
         self.export_btn.config(state=tk.DISABLED)
-        
+
         # Show test frame (in LEFT column, below monitor controls)
         self.test_frame.pack(fill=tk.X, pady=(10, 0))
         self.setup_test_ui()
-        
+
         # Start listening automatically
         if not self.is_listening:
             self.start_listening()
-        
-        self.log_message("🧪 QC TEST MODE STARTED", "header")
-        self.log_message("📋 Instructions:", "instruction")
-        self.log_message("1. Point remote at VIRC receiver", "instruction")
-        self.log_message("2. Press each button listed in the test checklist", "instruction")
-        self.log_message("3. Watch for ✅ (PASS) or ❌ (FAIL) indicators", "instruction")
-        self.log_message("4. Test will auto-detect remote type on first button press", "instruction")
-        self.log_message("-" * 60, "separator")
-    
+
+        self.log_message("🧪 QC TEST MODE STARTED", LogKind.HEADER)
+        self.log_message(f"Test lanes: {', '.join(lane.name for lane in self.lanes.values())}", LogKind.TEST)
+        self.log_message("📋 Instructions:", LogKind.INSTRUCTION)
+        self.log_message("1. Point remote at VIRC receiver", LogKind.INSTRUCTION)
+        self.log_message("2. Press each button listed in the test checklist", LogKind.INSTRUCTION)
+        self.log_message("3. Watch for ✅ (PASS) or ❌ (FAIL) indicators", LogKind.INSTRUCTION)
+        self.log_message("4. Test will auto-detect remote type on first button press", LogKind.INSTRUCTION)
+        self.log_message("-" * 60, LogKind.SEPARATOR)
+
     def setup_test_ui(self):
         """Create the test progress UI"""
         # Clear any existing content
@@ -865,37 +1575,50 @@ class VIRCCompleteGUI:
                                wraplength=600)
         instructions.pack(pady=(2, 5))
 
+        # Verdict of the last finished remote, flashed without a dialog in batch mode
+        self.verdict_label = tk.Label(self.test_frame, text="", font=("Arial", 12, "bold"))
+        self.verdict_label.pack(fill=tk.X, pady=(0, 3))
+
+        for lane in self.lanes.values():
+            self.setup_lane_test_ui(lane)
+
+    def setup_lane_test_ui(self, lane):
+        """Create the test progress UI of one receiver lane"""
+        lane_frame = ttk.LabelFrame(self.test_frame, text=f"🔌 {lane.name}", padding="3")
+        lane_frame.pack(fill=tk.X, padx=5, pady=3)
+
         # Create frame for test progress - compact
-        self.progress_frame = ttk.Frame(self.test_frame)
-        self.progress_frame.pack(fill=tk.X, padx=5, pady=3)
+        lane.progress_frame = ttk.Frame(lane_frame)
+        lane.progress_frame.pack(fill=tk.X, padx=5, pady=3)
 
         # Test status labels will be created when remote type is detected
-        self.button_status_labels = {}
+        lane.button_status_labels = {}
 
         # Overall progress - compact
-        self.progress_label = ttk.Label(self.test_frame,
+        lane.progress_label = ttk.Label(lane_frame,
                                       text="🟡 Waiting for first button press to detect remote type...",
                                       font=("Arial", 8, "bold"))
-        self.progress_label.pack(pady=(5, 2))
-    
-    def create_button_checklist(self, remote_type):
+        lane.progress_label.pack(pady=(5, 2))
+
+    def create_button_checklist(self, lane, profile):
         """Create checklist for detected remote type"""
         # Clear existing checklist
-        for widget in self.progress_frame.winfo_children():
+        for widget in lane.progress_frame.winfo_children():
             widget.destroy()
 
-        self.button_status_labels = {}
-        expected_buttons = self.expected_buttons.get(remote_type, {})
+        lane.button_status_labels = {}
+        lane.quality_labels = {}
+        lane.quality = {}
 
         # Create two columns for button checklist - compact
-        left_frame = ttk.Frame(self.progress_frame)
+        left_frame = ttk.Frame(lane.progress_frame)
         left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
 
-        right_frame = ttk.Frame(self.progress_frame)
+        right_frame = ttk.Frame(lane.progress_frame)
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(10, 0))
 
         # Split buttons into two columns
-        button_list = list(expected_buttons.items())
+        button_list = profile.buttons
         mid_point = len(button_list) // 2
 
         for i, (code, name) in enumerate(button_list):
@@ -913,180 +1636,378 @@ class VIRCCompleteGUI:
             name_label = ttk.Label(frame, text=name, font=("Arial", 9))
             name_label.pack(side=tk.LEFT)
 
-            self.button_status_labels[code] = status_label
-            self.test_results[code] = "pending"
-    
+            # Signal quality score, filled in by raw timing diagnostics
+            if self.timing:
+                quality_label = ttk.Label(frame, text="", font=("Arial", 8))
+                quality_label.pack(side=tk.RIGHT)
+                lane.quality_labels[code] = quality_label
 
-    
-    def handle_test_button_press(self, remote_type, button_name):
+            lane.button_status_labels[code] = status_label
+
+    def handle_test_button_press(self, lane, ir_code, entry, event_time=None):
         """Handle button press in test mode"""
-        # Set up test UI for this remote type if not already done
-        if self.current_remote_type != remote_type:
-            self.current_remote_type = remote_type
-            self.create_button_checklist(remote_type)
-            self.log_message(f"🎯 Detected: {remote_type}", "test")
-            self.log_message(f"📝 Testing {len(self.expected_buttons.get(remote_type, {}))} buttons...", "test")
-        
-        # Find the button code that was pressed
-        expected_buttons = self.expected_buttons.get(remote_type, {})
-        pressed_code = None
-        
-        for code, name in expected_buttons.items():
-            if name == button_name:
-                pressed_code = code
-                break
-        
-        if pressed_code and pressed_code in self.button_status_labels:
-            if self.test_results[pressed_code] == "pending":
-                # Mark as passed
-                self.test_results[pressed_code] = "pass"
-                self.button_status_labels[pressed_code].config(text="✅", foreground="green")
-                self.log_message(f"✅ PASS: {button_name}", "success")
-                
-                # Check if all tests are complete
-                self.check_test_completion()
-            else:
-                # Already tested
-                self.log_message(f"🔄 REPEAT: {button_name} (already tested)", "warning")
-        else:
-            # Unexpected button or remote type
-            self.log_message(f"❓ UNEXPECTED: {button_name} - Not in expected test list", "warning")
-    
-    def check_test_completion(self):
-        """Check if all buttons have been tested"""
-        if not self.test_results:
-            return
-            
-        pending_count = sum(1 for status in self.test_results.values() if status == "pending")
-        total_count = len(self.test_results)
-        passed_count = sum(1 for status in self.test_results.values() if status == "pass")
-        
+        # Receiver attached after the test started gets its lane on first press
+        if lane.progress_frame is None:
+            self.setup_lane_test_ui(lane)
+        lane.qc.press(ir_code, entry, event_time)
+
+    def qc_event(self, lane, kind, qc, **fields):
+        """QCLane callback (Tk thread): show the checklist's progress and verdicts"""
+        remote = qc.profile.name if qc.profile else None
+        if kind == "detected":
+            self.create_button_checklist(lane, qc.profile)
+            self.log_message(f"🎯 [{lane.name}] Detected: {remote}", LogKind.TEST, remote=remote, lane=lane.name)
+            self.log_message(f"📝 [{lane.name}] Testing {fields['buttons']} buttons...", LogKind.TEST,
+                             remote=remote, lane=lane.name)
+        elif kind == "pass":
+            lane.button_status_labels[fields['code']].config(text="✅", foreground="green")
+            self.log_message(f"✅ [{lane.name}] PASS: {fields['button']}", LogKind.SUCCESS,
+                             code=fields['code'], remote=remote, lane=lane.name)
+            self.update_test_progress(lane, fields['passed'], fields['buttons'])
+        elif kind == "repeat":
+            self.log_message(f"🔄 [{lane.name}] REPEAT: {fields['button']} (already tested)", LogKind.WARNING, lane=lane.name)
+        elif kind == "unexpected":
+            # Code no remote profile knows
+            self.log_message(f"❓ [{lane.name}] UNEXPECTED: 0x{fields['code']:08X} - Not in expected test list",
+                             LogKind.WARNING, code=fields['code'], lane=lane.name)
+        elif kind == "verdict":
+            record, reason = fields['record'], fields['reason']
+            if reason == "idle":
+                self.log_message(f"⏱ [{lane.name}] No press for {self.idle_timeout_s:g} s, finishing this remote",
+                                 LogKind.WARNING, lane=lane.name)
+            elif reason == "switched":
+                self.log_message(f"🔀 [{lane.name}] Another remote showed up, finishing {remote}",
+                                 LogKind.WARNING, lane=lane.name)
+            self.show_test_results(lane, record)
+
+    def update_test_progress(self, lane, passed_count, total_count):
+        """Progress line of a lane's checklist"""
         progress_text = f"📊 Progress: {passed_count}/{total_count} buttons tested"
-
-        if pending_count == 0:
+        if passed_count == total_count:
             # All tests complete!
             progress_text += " - 🎉 ALL TESTS COMPLETE!"
-            self.progress_label.config(text=progress_text, foreground="green", font=("Arial", 9, "bold"))
-            self.show_test_results()
+            lane.progress_label.config(text=progress_text, foreground="green", font=("Arial", 9, "bold"))
         else:
-            self.progress_label.config(text=progress_text, foreground="blue", font=("Arial", 8, "bold"))
-    
-    def show_test_results(self):
-        """Show final test results"""
-        if not self.test_results:
+            lane.progress_label.config(text=progress_text, foreground="blue", font=("Arial", 8, "bold"))
+
+    def show_test_results(self, lane, record):
+        """Show final test results of a lane (record: the finished virc_history.SessionRecord)"""
+        total_tests = len(record.buttons)
+        passed_tests = record.passed
+        if self.metrics and self.applying_event_ns:
+            # Decided by a press (not the idle timeout), measured before any dialog
+            self.metrics.verdict_latency.observe((trace_ns() - self.applying_event_ns) / 1e9)
+
+        tags = {'remote': record.remote, 'lane': lane.name}
+        self.log_message("=" * 60, LogKind.SEPARATOR, **tags)
+        self.log_message(f"🏁 QC TEST RESULTS [{lane.name}]", LogKind.HEADER, **tags)
+        self.log_message(f"Device: {lane.name} ({lane.path_text})", LogKind.TEST, **tags)
+        self.log_message(f"Remote Type: {record.remote}", LogKind.TEST, **tags)
+        self.log_message(f"Tests Passed: {passed_tests}/{total_tests}", LogKind.TEST, **tags)
+        weakest = self.weakest_signal(lane, record)
+        if weakest:
+            self.log_message(f"Signal Quality: weakest {weakest[0]} {weakest[1].score:.0f}/100 ({grade(weakest[1].score)})",
+                             LogKind.TEST, **tags)
+
+        batch = self.batch_mode.get()
+        if record.verdict == PASS:
+            self.log_message(f"✅ [{lane.name}] RESULT: PASS - All buttons working correctly", LogKind.SUCCESS, **tags)
+            result_msg = f"QC Test PASSED!\n\nReceiver: {lane.name}\nRemote: {record.remote}\nAll {total_tests} buttons working correctly."
+            if not batch:
+                self.render_log()  # Show the verdict before the modal dialog blocks the frame
+                messagebox.showinfo("QC Test Complete", result_msg)
+        else:
+            failed_buttons = [button.button for button in record.buttons if button.outcome != "pass"]
+            self.log_message(f"❌ [{lane.name}] RESULT: FAIL - Some buttons not working", LogKind.ERROR, **tags)
+            self.log_message(f"Failed buttons: {', '.join(failed_buttons)}", LogKind.ERROR, **tags)
+            result_msg = f"QC Test FAILED!\n\nReceiver: {lane.name}\nRemote: {record.remote}\nFailed: {', '.join(failed_buttons)}"
+            if not batch:
+                self.render_log()
+                messagebox.showerror("QC Test Failed", result_msg)
+
+        self.log_message("=" * 60, LogKind.SEPARATOR, **tags)
+        self.record_session(lane, record)
+        if batch:
+            self.finish_batch_unit(lane, record)
+
+    def finish_batch_unit(self, lane, record):
+        """Batch mode: count the remote, flash its verdict and arm the lane for the next one"""
+        stats = self.batch_stats
+        stats['units'] += 1
+        passed = record.verdict == PASS
+        stats['passed' if passed else 'failed'] += 1
+        self.update_batch_display()
+
+        self.verdict_label.config(text=f"{'✅ PASS' if passed else '❌ FAIL'}  {lane.name}  {record.remote}",
+                                  bg="#2e7d32" if passed else "#c62828", fg="white")
+        if self.verdict_flash:
+            self.root.after_cancel(self.verdict_flash)
+        self.verdict_flash = self.root.after(VERDICT_FLASH_MS, self.clear_verdict_flash)
+
+        # Same lane widgets, empty checklist: the next remote's first press starts its session
+        lane.reset_session()
+        for widget in lane.progress_frame.winfo_children():
+            widget.destroy()
+        lane.progress_label.config(text="🟡 Ready for the next remote...", foreground="black", font=("Arial", 8, "bold"))
+
+    def clear_verdict_flash(self):
+        self.verdict_flash = None
+        self.verdict_label.config(text="", bg=self.test_frame.winfo_toplevel().cget("bg"))
+
+    def update_batch_display(self):
+        stats = self.batch_stats
+        if not stats['units']:
+            self.batch_var.set("")
             return
-            
-        total_tests = len(self.test_results)
-        passed_tests = sum(1 for status in self.test_results.values() if status == "pass")
-        
-        self.log_message("=" * 60, "separator")
-        self.log_message("🏁 QC TEST RESULTS", "header")
-        self.log_message(f"Remote Type: {self.current_remote_type}", "test")
-        self.log_message(f"Tests Passed: {passed_tests}/{total_tests}", "test")
-        
-        if passed_tests == total_tests:
-            self.log_message("✅ RESULT: PASS - All buttons working correctly", "success")
-            result_msg = f"QC Test PASSED!\n\nRemote: {self.current_remote_type}\nAll {total_tests} buttons working correctly."
-            messagebox.showinfo("QC Test Complete", result_msg)
+        hours = max(time.monotonic() - stats['started'], 60.0) / 3600
+        self.batch_var.set(f"Batch: {stats['units']} remotes | ✅ {stats['passed']} | ❌ {stats['failed']} | "
+                           f"{stats['units'] / hours:.0f}/hour")
+
+    def check_idle_lanes(self):
+        """Batch mode: finalize checklists nobody pressed a button for within the idle timeout"""
+        self.idle_check = None
+        if not self.test_mode_active:
+            return
+        if self.batch_mode.get():
+            now = time.monotonic()
+            for lane in list(self.lanes.values()):
+                lane.qc.check_idle(now)  # Finished as FAIL through qc_event
+        self.idle_check = self.root.after(IDLE_CHECK_MS, self.check_idle_lanes)
+
+    def record_session(self, lane, record):
+        """Queue a finished checklist for the QC history (written in the background)"""
+        if self.metrics:
+            self.metrics.verdict(record.remote, record.verdict)
+        if self.history:
+            self.history.record(record)
+        elif self.test_mode_active:
+            self.run_records.append(record)
+            self.export_btn.config(state=tk.NORMAL)
+
+    def open_dashboard(self):
+        """Open (or raise) the statistics window"""
+        if self.dashboard:
+            self.dashboard.lift()
+            self.dashboard.refresh()
+            return
+        try:
+            from virc_dashboard import StatsDashboard  # Only loaded when the window is first opened
+            self.dashboard = StatsDashboard(self.root, self.history.path, on_close=self.dashboard_closed)
+        except Exception as e:
+            messagebox.showerror("Statistics", f"Cannot read the QC history:\n{e}")
+
+    def dashboard_closed(self):
+        self.dashboard = None
+
+    def open_history_export(self):
+        """Export dialog over the QC history; the export itself runs in the background"""
+        try:
+            from virc_dashboard import ExportDialog
+            ExportDialog(self.root, self.history.path)
+        except Exception as e:
+            messagebox.showerror("Export History", f"Cannot read the QC history:\n{e}")
+
+    def serve_metrics(self, host, port):
+        """Start the metrics endpoint over the lanes' own counters"""
+        from virc_metrics import MetricsServer, StationMetrics  # Not loaded unless --metrics-port is given
+        metrics = StationMetrics(self.station, "gui")
+
+        def per_lane(value):
+            return lambda: [({'receiver': lane.name}, value(lane)) for lane in list(self.lanes.values())]
+
+        metrics.register_receivers(receivers=lambda: sum(1 for lane in list(self.lanes.values()) if lane.device),
+                                   ir_events=per_lane(lambda lane: lane.debouncer.totals()[0]),
+                                   suppressed=per_lane(lambda lane: lane.debouncer.totals()[1]),
+                                   read_timeouts=per_lane(lambda lane: lane.read_timeouts),
+                                   recovery_stats=self.hotplug.stats)
+        metrics.register_ui_queue()
+        self.metrics_server = MetricsServer(metrics.registry, port, host).start()
+        self.metrics = metrics
+
+    def history_failed(self, error):
+        """History writer thread: a batch of sessions could not be written"""
+        self.log_message(f"❌ Could not write the QC history: {error}", LogKind.ERROR)
+
+    def history_committed(self, sessions):
+        """History writer thread: sessions are on disk, refresh the dashboard and upload them"""
+        self.post_ui_event("history", sessions)
+        if self.uploader:
+            self.uploader.wake()
+
+    def upload_status(self, online, queued, error):
+        """Uploader thread: the collector became reachable / unreachable or rejected a batch"""
+        self.post_ui_event("upload", online, queued, error)
+
+    def apply_upload_status(self, online, queued, error):
+        if online and error:
+            self.log_message(f"⚠️ {error} (kept in the local history)", LogKind.WARNING)
+        elif online:
+            self.log_message(f"📡 Collector online, {queued} session(s) still to upload", LogKind.SUCCESS)
         else:
-            failed_buttons = [name for code, name in self.expected_buttons.get(self.current_remote_type, {}).items() 
-                            if self.test_results.get(code) != "pass"]
-            self.log_message("❌ RESULT: FAIL - Some buttons not working", "error")
-            self.log_message(f"Failed buttons: {', '.join(failed_buttons)}", "error")
-            result_msg = f"QC Test FAILED!\n\nRemote: {self.current_remote_type}\nFailed: {', '.join(failed_buttons)}"
-            messagebox.showerror("QC Test Failed", result_msg)
-        
-        self.log_message("=" * 60, "separator")
-        
-        # Enable export button after test completion
-        self.export_btn.config(state=tk.NORMAL)
-    
+            self.log_message(f"📴 Collector unreachable ({error}), {queued} session(s) queued locally", LogKind.WARNING)
+
+    def weakest_signal(self, lane, record=None):
+        """(button name, SignalQuality) of the lane's lowest scoring button, None without scores"""
+        buttons = [(b.code, b.button) for b in record.buttons] if record else lane.qc.profile.buttons
+        scored = [(name, lane.quality[code]) for code, name in buttons if code in lane.quality]
+        return min(scored, key=lambda item: item[1].score) if scored else None
+
     def reset_test_mode(self):
-        """Reset the test mode for testing another remote"""
+        """Reset the test mode for testing the next remotes"""
         self.test_mode_active = False
-        self.current_remote_type = None
-        self.test_results = {}
         self.signal_count = 0
         self.signal_count_var.set("0")
-        
+        self.display_state['signal_count'] = self.shown_display['signal_count'] = "0"
+        abandoned = 0
+        for lane in self.lanes.values():
+            # A remote reset before every button passed was never completed: nothing is recorded
+            abandoned += lane.qc.running
+            lane.reset_test()
+            lane.signal_count = 0
+            lane.debouncer.reset_counts()
+
         # Reset UI
         self.test_mode_btn.config(state=tk.NORMAL)
         self.reset_test_btn.config(state=tk.DISABLED)
         self.export_btn.config(state=tk.DISABLED)
         self.test_frame.pack_forget()
-        
+
         # Clear log
         self.clear_log()
-        
+
         self.log_message("🔄 Test mode reset - Ready for next remote")
-    
+        if abandoned:
+            self.log_message(f"⏹ {abandoned} unfinished remote(s) abandoned, not recorded", LogKind.WARNING)
+        stats = self.batch_stats
+        if stats['units']:
+            self.log_message(f"📦 Batch: {stats['units']} remotes, {stats['passed']} passed, {stats['failed']} failed",
+                             LogKind.HEADER)
+
     def export_test_results(self):
-        """Export test results to a file"""
-        if not self.test_results or not self.current_remote_type:
+        """Export this test run's sessions from the history as a text report (written in the background)"""
+        if not self.history:
+            self.export_run_records()
+            return
+        if self.run_first_session is None:
             messagebox.showwarning("Warning", "No test results to export")
             return
-        
-        from datetime import datetime
-        import os
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"QC_Test_Results_{timestamp}.txt"
-        
+        from virc_export import ExportFilter, ExportJob  # Loaded on first export
+
+        filename = os.path.abspath(f"QC_Test_Results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        filters = ExportFilter(station=self.station, first_id=self.run_first_session)
+        job = ExportJob(self.history.path, filename, "report", filters).start()
+        self.export_btn.config(state=tk.DISABLED)
+        self.log_message(f"📁 Exporting results to {os.path.basename(filename)}...")
+        self.poll_results_export(job)
+
+    def export_run_records(self):
+        """Without a history (--no-history): write the sessions this run kept in memory, a few at most"""
+        if not self.run_records:
+            messagebox.showwarning("Warning", "No test results to export")
+            return
+        from virc_export import export_records
+
+        filename = os.path.abspath(f"QC_Test_Results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
         try:
-            total_tests = len(self.test_results)
-            passed_tests = sum(1 for status in self.test_results.values() if status == "pass")
-            failed_tests = total_tests - passed_tests
-            
-            # Generate report content
-            report_content = f"""
-VIRC REMOTE QUALITY CONTROL TEST REPORT
-{'=' * 50}
-
-Test Date/Time: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-Remote Type: {self.current_remote_type}
-Test Status: {"PASSED" if failed_tests == 0 else "FAILED"}
-
-SUMMARY:
---------
-Total Buttons Tested: {total_tests}
-Buttons Passed: {passed_tests}
-Buttons Failed: {failed_tests}
-Success Rate: {(passed_tests/total_tests*100):.1f}%
-
-DETAILED RESULTS:
------------------
-"""
-            
-            # Add detailed button results
-            expected_buttons = self.expected_buttons.get(self.current_remote_type, {})
-            for code, name in expected_buttons.items():
-                status = self.test_results.get(code, "not_tested")
-                status_symbol = "✅ PASS" if status == "pass" else "❌ FAIL" if status == "fail" else "⏳ NOT TESTED"
-                report_content += f"{name:20} : {status_symbol}\n"
-            
-            report_content += f"""
-{'=' * 50}
-Generated by VIRC QC Testing Station
-"""
-            
-            # Write to file
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(report_content)
-            
-            # Show success message
-            success_msg = f"Test results exported successfully!\n\nFile: {filename}\nLocation: {os.path.abspath(filename)}"
-            messagebox.showinfo("Export Complete", success_msg)
-            self.log_message(f"📁 Results exported to: {filename}")
-            
+            with open(filename, "w", encoding="utf-8") as out:
+                count = export_records(out, self.run_records, "report")
         except Exception as e:
-            error_msg = f"Failed to export test results:\n{str(e)}"
-            messagebox.showerror("Export Error", error_msg)
-            self.log_message(f"❌ Export failed: {str(e)}")
+            messagebox.showerror("Export Error", f"Failed to export test results:\n{e}")
+            self.log_message(f"❌ Export failed: {e}", LogKind.ERROR)
+            return
+        messagebox.showinfo("Export Complete", f"Test results exported successfully!\n\n"
+                                               f"File: {os.path.basename(filename)}\nLocation: {filename}\n"
+                                               f"Sessions: {count}")
+        self.log_message(f"📁 Results exported to: {os.path.basename(filename)} ({count} session(s))")
+
+    def poll_results_export(self, job):
+        if not job.finished.is_set():
+            self.root.after(100, self.poll_results_export, job)
+            return
+        self.export_btn.config(state=tk.NORMAL)
+        if job.error:
+            messagebox.showerror("Export Error", f"Failed to export test results:\n{job.error}")
+            self.log_message(f"❌ Export failed: {job.error}", LogKind.ERROR)
+            return
+        messagebox.showinfo("Export Complete", f"Test results exported successfully!\n\n"
+                                               f"File: {os.path.basename(job.path)}\nLocation: {job.path}\n"
+                                               f"Sessions: {job.done}")
+        self.log_message(f"📁 Results exported to: {os.path.basename(job.path)} ({job.done} session(s))")
+
+    def report_stall(self, duration, stack):
+        """Watchdog callback (watchdog thread): the Tk loop was blocked for `duration` seconds"""
+        print(f"UI stalled for {duration * 1000:.0f} ms, Tk thread was in:\n{stack}", file=sys.stderr)
+        self.log_message(f"🐢 UI stalled for {duration * 1000:.0f} ms in {format_stack_short(stack)}", LogKind.WARNING)
+
+    def on_close(self):
+        """Stop the readers and flush the capture file before the window goes away"""
+        self.hotplug.stop()
+        for lane in self.lanes.values():
+            lane.reading = False
+        for lane in self.lanes.values():
+            lane.close()
+        if self.capture:
+            self.capture.close()
+        if self.dashboard:
+            self.dashboard.close()
+        if self.uploader:
+            self.uploader.close()
+        if self.history:
+            self.history.close()
+        if self.watchdog:
+            self.watchdog.stop()
+        if self.metrics_server:
+            self.metrics_server.close()
+        if self.tracer:
+            for line in self.tracer.format_summary():
+                print(line, file=sys.stderr)
+            if self.trace_path:
+                self.tracer.write_chrome_trace(self.trace_path)
+                print(f"Chrome trace written to {self.trace_path}", file=sys.stderr)
+        if self.hotplug.stats.losses:
+            print(f"Reconnects: {self.hotplug.stats.format_summary()}", file=sys.stderr)
+        self.root.destroy()
 
 def main():
+    parser = argparse.ArgumentParser(description="VIRC IR Controller - QC Testing Station")
+    parser.add_argument("--capture", metavar="FILE", help="append every raw HID report to a capture file (.vcap)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="trace per-stage latency and write a Chrome trace (chrome://tracing) on exit")
+    parser.add_argument("--stall-ms", type=float, default=250,
+                        help="with --trace, report UI stalls longer than this (default: 250)")
+    parser.add_argument("--repeat-ms", type=float, default=REPEAT_MS,
+                        help=f"reports of the same code closer than this are one press (default: {REPEAT_MS})")
+    parser.add_argument("--hold-ms", type=float, default=HOLD_MS,
+                        help=f"a press repeating for this long is logged as held (default: {HOLD_MS})")
+    parser.add_argument("--heartbeat", type=float, default=0, metavar="SECONDS",
+                        help="query every receiver this often and reopen it if it stops answering (default: off)")
+    parser.add_argument("--history", metavar="FILE", default=DEFAULT_DB,
+                        help=f"SQLite database every finished test session is recorded to (default: {DEFAULT_DB})")
+    parser.add_argument("--no-history", action="store_true", help="do not record test sessions")
+    parser.add_argument("--station", help="station name stored with every session (default: VIRC_STATION or host name)")
+    parser.add_argument("--collector", metavar="URL",
+                        help="upload every recorded session to a central collector, e.g. http://qc-server:8750")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on http://HOST:PORT/metrics (default: off)")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="address of the metrics endpoint (default: 127.0.0.1, 0.0.0.0 for a remote Prometheus)")
+    parser.add_argument("--batch", action="store_true",
+                        help="batch mode: finish each remote automatically and arm the next one (no dialogs)")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT_S, metavar="SECONDS",
+                        help=f"batch mode: finish a remote as FAIL after this long without a press (default: {IDLE_TIMEOUT_S:g})")
+    parser.add_argument("--timing", action="store_true",
+                        help="score the signal quality of every press from raw IR timing (firmware API 2.1, NumPy)")
+    add_transport_arguments(parser)
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = VIRCCompleteGUI(root)
+    app = VIRCCompleteGUI(root, transport=transport_from_args(args), capture_path=args.capture,
+                          tracer=Tracer() if args.trace else None, stall_ms=args.stall_ms if args.trace else None,
+                          trace_path=args.trace, heartbeat_s=args.heartbeat, repeat_ms=args.repeat_ms,
+                          hold_ms=args.hold_ms, timing=args.timing,
+                          history_path=None if args.no_history else args.history, station=args.station,
+                          batch=args.batch, idle_timeout_s=args.idle_timeout, collector_url=args.collector,
+                          metrics_port=args.metrics_port, metrics_host=args.metrics_host)
     root.mainloop()
 
 if __name__ == "__main__":
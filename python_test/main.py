@@ -1,58 +1,80 @@
-import hid  # Changed back from hidapi
+import argparse
 import sys
 import time
+from virc_capture import CaptureWriter
+from virc_hotplug import USB_VID_RASPBERRY_PI, DeviceRegistry, device_key, wait_for_device
+from virc_profiles import default_registry
+from virc_mux import INFO_QUERIES
+from virc_protocol import (API_V2_REQUEST, CMD_API_VERSION, QUERY_COMMANDS, QUERY_REPLIES, REPORT_IR_BATCH,
+                           REPORT_IR_CODE, REPORT_UNKNOWN_COMMAND, EventSequence, decode_ir_code, format_raw_bytes)
+from virc_transport import add_transport_arguments, transport_from_args
 
-# Raspberry Pi VID (0x2e8a)
-USB_VID = 0x2e8a
 USB_PID = 0x000a  # Raspberry Pi Pico PID
+RECONNECT_TIMEOUT_S = 10
 
-def list_all_devices():
+def list_all_devices(devices):
     print("\nAll HID devices:")
-    for device in hid.enumerate():
+    for device in devices:
         print(f"VID: 0x{device['vendor_id']:04x}, PID: 0x{device['product_id']:04x}, Manufacturer: {device.get('manufacturer_string', 'N/A')}")
     print()
 
 def ir_code_name(ir_code):
-    code_map = {
-        0xFE017F80: "Short Pause",
-        0xFC037F80: "Long Pause",
-        0xFB047F80: "Bed Mode",
-        0xF9067F80: "Chair Mode",
-        0xF8077F80: "Square Button",
-        0xF6097F80: "Triangle Button",
-        0xFE01FF00: "Short Pause",
-        0xFC03FF00: "Long Pause",
-        0xFB04FF00: "Bed Mode",
-        0xF906FF00: "Chair Mode",
-        0xF807FF00: "Square Button",
-        0xF609FF00: "Triangle Button"
-    }
-    return code_map.get(ir_code, "Unknown Button")
+    entry = default_registry().lookup(ir_code)
+    return entry.button if entry else "Unknown Button"
 
 def detect_remote_type(ir_code):
-    # Example: IR_Scanmode mapping for white remote is 1, black remote is 2
-    # You can adjust the ranges or codes as needed
-    white_remote_codes = {
-        0xFE017F80, 0xFC037F80, 0xFB047F80, 0xF9067F80, 0xF8077F80, 0xF6097F80
-    }
-    black_remote_codes = {
-        0xFE01FF00, 0xFC03FF00, 0xFB04FF00, 0xF906FF00, 0xF807FF00, 0xF609FF00
-        # Add more black remote codes here as needed
-    }
-    if ir_code in white_remote_codes:
-        return "White Remote (Scanmode 1)"
-    elif ir_code in black_remote_codes:
-        return "Black Remote (Scanmode 2)"
-    else:
-        return "Unknown Remote"
+    # Remote families come from the profiles/ data files (see virc_profiles.py)
+    entry = default_registry().lookup(ir_code)
+    return entry.profile.name if entry else "Unknown Remote"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="VIRC IR receiver console")
+    parser.add_argument("--capture", metavar="FILE", help="append every raw HID report to a capture file (.vcap)")
+    add_transport_arguments(parser)
+    return parser.parse_args()
+
+def print_ir_report(registry, response):
+    ir_code = decode_ir_code(response)
+    entry = registry.lookup(ir_code)
+    name = entry.button if entry else "Unknown Button"
+    remote_type = entry.profile.name if entry else "Unknown Remote"
+    print("\nReceived IR signal:")
+    print(format_raw_bytes(response))
+    print(f"IR Code: 0x{ir_code:08X} : {name}")
+    print(f"Detected remote type: {remote_type}")
+
+def print_ir_batch(registry, sequence, response):
+    # Format 2: several events per report, each with the receiver's sequence number and clock
+    lost = sequence.lost
+    for event, device_ns in sequence.feed(response):
+        entry = registry.lookup(event.code)
+        name = entry.button if entry else "Unknown Button"
+        remote_type = entry.profile.name if entry else "Unknown Remote"
+        kind = "repeat (button held)" if event.repeat else "signal"
+        print(f"\nReceived IR {kind} #{event.seq} at {device_ns / 1e9:.6f} s (receiver clock):")
+        print(f"IR Code: 0x{event.code:08X} : {name}")
+        print(f"Detected remote type: {remote_type}")
+    if sequence.lost != lost:
+        print(f"\n{sequence.lost - lost} IR event(s) lost by the receiver ({sequence.lost} in total)")
 
 def main():
-    list_all_devices()
+    args = parse_args()
+    registry = default_registry()
+    try:
+        transport = transport_from_args(args)
+    except (RuntimeError, OSError, ValueError) as ex:
+        print(ex)
+        sys.exit(1)
+    capture = CaptureWriter(args.capture) if args.capture else None
+    # One enumeration pass lists every device and picks the VIRC receivers (Raspberry Pi or Adafruit VID)
+    device_registry = DeviceRegistry()
+    device_registry.scan(transport)
+    list_all_devices(device_registry.all_devices)
     print("Searching for VIRC device...")
-    devices = list(hid.enumerate(USB_VID))
+    devices = list(device_registry)
     
     if not devices:
-        print(f"No devices found with VID 0x{USB_VID:04x}")
+        print(f"No devices found with VID 0x{USB_VID_RASPBERRY_PI:04x}")
         print("Please check:")
         print("1. Device is connected")
         print("2. Firmware is uploaded correctly")
@@ -65,65 +87,72 @@ def main():
         print(f"VID: 0x{device['vendor_id']:04x}, PID: 0x{device['product_id']:04x}")
 
     try:
-        dev = hid.device()
-        dev.open(USB_VID, devices[0]['product_id'])
+        dev = transport.open(devices[0]['path'])
         print(f"\nSuccessfully opened device")
         print(f"Manufacturer: {devices[0]['manufacturer_string']}")
         print(f"Product: {devices[0]['product_string']}")
+        if capture:
+            capture_id = capture.device_id(devices[0].get('serial_number') or devices[0]['path'].decode(errors='replace'))
+            print(f"Capturing raw HID reports to {capture.path}")
         
-        # Initialize device
-        commands = [
-            (b'\x00\x01', "Device Type"),
-            (b'\x00\x03', "API Version"),
-            (b'\x00\x05', "Firmware Version")
-        ]
-
-        for cmd, desc in commands:
-            print(f"\nGetting {desc}...")
-            dev.write(cmd)
-            response = dev.read(64, 1000)  # timeout as positional argument
-            print(f"{desc} response:", response)
+        # Initialize device: all queries go out at once, the replies are picked out of the
+        # report stream by report ID, so an IR press arriving in between is not mistaken for one.
+        # The API version query also asks for batched, sequence-numbered reports (format 2).
+        reply_names = {QUERY_REPLIES[cmd]: desc for cmd, desc in INFO_QUERIES}
+        sequence = EventSequence()
+        if transport.answers_queries:  # A capture only holds what the receiver sent
+            for cmd, desc in INFO_QUERIES:
+                print(f"\nGetting {desc}...")
+                dev.write(API_V2_REQUEST if cmd == CMD_API_VERSION else QUERY_COMMANDS[cmd])
 
         print("\nWaiting for IR signals... (Press Ctrl+C to exit)")
         print("Press any button on your remote to detect remote type...")
         while True:
             try:
                 response = dev.read(64, 100)
+                if not response and getattr(dev, 'finished', False):
+                    print("\nReplay finished")
+                    break
                 if response:
-                    if response[0] == 7:
-                        ir_code = 0
-                        for i in range(4):
-                            ir_code |= response[2+i] << (8*i)
-                        name = ir_code_name(ir_code)
-                        remote_type = detect_remote_type(ir_code)
-                        print("\nReceived IR signal:")
-                        print(f"Raw bytes: {[hex(x) for x in response[:6]]}")
-                        print(f"IR Code: 0x{ir_code:08X} : {name}")
-                        print(f"Detected remote type: {remote_type}")
+                    if capture:
+                        capture.write(capture_id, response)
+                    if response[0] == REPORT_IR_CODE:
+                        print_ir_report(registry, response)
+                    elif response[0] == REPORT_IR_BATCH:
+                        print_ir_batch(registry, sequence, response)
+                    elif response[0] in reply_names:
+                        print(f"{reply_names[response[0]]} response:", response)
+                    elif response[0] == REPORT_UNKNOWN_COMMAND:
+                        print("Unknown command response:", response)
             except Exception as e:
                 print(f"HID error: {e}")
                 print("Device may have been disconnected. Attempting to reconnect...")
                 dev.close()
-                # Try to reconnect
-                for attempt in range(10):
-                    time.sleep(1)
-                    devices = list(hid.enumerate(USB_VID))
-                    if devices:
-                        try:
-                            dev = hid.device()
-                            dev.open(USB_VID, devices[0]['product_id'])
-                            print("Reconnected to device.")
-                            break
-                        except Exception as reconnect_ex:
-                            print(f"Reconnect attempt {attempt+1} failed: {reconnect_ex}")
-                    else:
-                        print(f"Reconnect attempt {attempt+1}: Device not found.")
-                else:
-                    print("Failed to reconnect after multiple attempts. Exiting.")
-                    sys.exit(1)
+                # Reopen the same receiver (by serial) as soon as it is listed again
+                lost_at = time.monotonic()
+                key = device_key(devices[0])
+                while True:
+                    remaining = RECONNECT_TIMEOUT_S - (time.monotonic() - lost_at)
+                    match = wait_for_device(transport, key, remaining, device_registry) if remaining > 0 else None
+                    if match is None:
+                        print("Failed to reconnect after multiple attempts. Exiting.")
+                        sys.exit(1)
+                    try:
+                        dev = transport.open(match['path'])
+                        print(f"Reconnected to device in {(time.monotonic() - lost_at) * 1000:.0f} ms.")
+                        sequence = EventSequence()  # The receiver restarted in format 1
+                        if transport.answers_queries:
+                            dev.write(API_V2_REQUEST)
+                        break
+                    except Exception as reconnect_ex:
+                        print(f"Reconnect attempt failed: {reconnect_ex}")
+                        time.sleep(0.05)  # Listed, but the driver is not ready yet
             except Exception as e:
                 print(f"Unexpected error: {e}")
                 time.sleep(1)
+        dev.close()
+        if capture:
+            capture.close()
     except IOError as ex:
         print(ex)
         print("Error accessing device. Please check connection and permissions.")
@@ -134,6 +163,8 @@ def main():
             dev.close()
         except Exception:
             pass
+        if capture:
+            capture.close()
         sys.exit(0)
 
 if __name__ == "__main__":
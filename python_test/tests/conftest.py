@@ -0,0 +1,38 @@
+"""Shared fixtures: the virc_* modules sit one directory up, flat, like the station runs them"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from virc_history import FAIL, PASS, ButtonResult, SessionRecord, connect  # noqa: E402
+from virc_profiles import Profile, ProfileRegistry  # noqa: E402
+
+# A made-up remote: NEC address 0x80, three buttons
+CODES = (0xFE017F80, 0xFD027F80, 0xFC037F80)
+BUTTONS = ("Power", "Up", "Down")
+# Another remote, on another address
+OTHER_CODES = (0xFE01BF40, 0xFD02BF40)
+
+
+@pytest.fixture
+def registry():
+    return ProfileRegistry([Profile("Test Remote", zip(CODES, BUTTONS)),
+                            Profile("Other Remote", zip(OTHER_CODES, ("A", "B")))])
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = connect(str(tmp_path / "history.db"))
+    yield db
+    db.close()
+
+
+def make_record(finished=1_700_000_000.0, outcomes=("pass", "pass", "pass"), remote="Test Remote", station="st1",
+                receiver="SN R1", duration_s=6.0):
+    """SessionRecord of the test remote; the verdict follows the outcomes"""
+    buttons = tuple(ButtonResult(code, name, outcome, float(i) if outcome == "pass" else None, None)
+                    for i, (code, name, outcome) in enumerate(zip(CODES, BUTTONS, outcomes)))
+    verdict = PASS if all(outcome == "pass" for outcome in outcomes) else FAIL
+    return SessionRecord(finished - duration_s, finished, station, receiver, "R1", remote, verdict, buttons)
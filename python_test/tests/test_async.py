@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from virc_async import VIRCClient
+from virc_emulator import EmulatedReceiver, EmulatorTransport
+
+from conftest import CODES
+
+
+async def open_client(receiver, **options):
+    transport = EmulatorTransport([receiver])
+    return await VIRCClient(transport, transport.enumerate()[0], **options).open()
+
+
+def press_all(receiver, count, spacing_s=0.01):
+    start = time.monotonic()
+    for i in range(count):
+        receiver.press(CODES[i % len(CODES)], start + i * spacing_s)
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_close_with_a_full_queue_and_no_consumer(batched):
+    async def run():
+        receiver = EmulatedReceiver(api_version=(2, 1) if batched else (1, 0))
+        client = await open_client(receiver, queue_size=4, read_slice_ms=20)
+        press_all(receiver, 10)
+        await asyncio.sleep(0.3)  # The pump fills the queue and waits for space
+        assert client._events.full()
+        await asyncio.wait_for(client.close(), 2)
+        assert client._pump is None and client.device is None
+        return client.events_received
+
+    assert asyncio.run(run()) == 4
+
+
+def test_events_keep_their_order_through_backpressure():
+    async def run():
+        receiver = EmulatedReceiver()
+        client = await open_client(receiver, queue_size=2, read_slice_ms=20)
+        press_all(receiver, 9)
+        codes = []
+        async for event in client.events():
+            codes.append(event.code)
+            await asyncio.sleep(0.02)  # Slower than the presses
+            if len(codes) == 9:
+                break
+        await client.close()
+        return codes
+
+    assert asyncio.run(run()) == [CODES[i % len(CODES)] for i in range(9)]
+
+
+def test_queries_while_events_flow():
+    async def run():
+        receiver = EmulatedReceiver()
+        client = await open_client(receiver, read_slice_ms=20)
+        try:
+            return await asyncio.gather(client.device_type(), client.api_version(), client.firmware_version())
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == [1, (2, 1), (1, 3)]
@@ -0,0 +1,75 @@
+from virc_debounce import HOLD, MAX_CODES, PRESS, REPEAT, Debouncer
+
+MS = 1_000_000
+CODE = 0xFE017F80
+
+
+def test_held_button_is_one_press_and_one_hold():
+    debouncer = Debouncer(repeat_ms=150, hold_ms=500)
+    kinds = [debouncer.feed(CODE, i * 108 * MS) for i in range(10)]  # NEC repeats every ~108 ms
+    assert kinds[0] == PRESS
+    assert kinds.count(PRESS) == 1
+    assert kinds.count(HOLD) == 1
+    assert kinds.index(HOLD) == 5  # First report >= 500 ms after the press
+    assert debouncer.stats() == {'presses': 1, 'repeats': 8, 'holds': 1, 'suppressed': 9}
+
+
+def test_release_gap_longer_than_the_window_is_a_new_press():
+    debouncer = Debouncer(repeat_ms=150)
+    assert debouncer.feed(CODE, 0) == PRESS
+    assert debouncer.feed(CODE, 100 * MS) == REPEAT
+    assert debouncer.feed(CODE, 240 * MS) == REPEAT  # Window runs from the previous report, not the press
+    assert debouncer.feed(CODE, 390 * MS) == PRESS   # Exactly the window: released and pressed again
+
+
+def test_codes_are_independent():
+    debouncer = Debouncer(repeat_ms=150)
+    assert debouncer.feed(CODE, 0) == PRESS
+    assert debouncer.feed(CODE + 1, 10 * MS) == PRESS
+    assert debouncer.feed(CODE, 20 * MS) == REPEAT
+
+
+def test_flagged_repeats_continue_the_press_however_late():
+    debouncer = Debouncer(repeat_ms=50, hold_ms=500)
+    assert debouncer.feed(CODE, 0) == PRESS
+    kinds = [debouncer.feed(CODE, t * MS, repeat=True) for t in range(108, 1000, 108)]
+    assert kinds.count(HOLD) == 1 and PRESS not in kinds
+    assert debouncer.feed(CODE, 1100 * MS) == PRESS  # Unflagged after the window: a new press
+
+
+def test_flagged_repeat_without_its_press_is_not_a_press():
+    debouncer = Debouncer(repeat_ms=150)
+    assert debouncer.feed(CODE, 0, repeat=True) == REPEAT
+    assert debouncer.presses == 0
+
+
+def test_time_going_back_starts_over():
+    debouncer = Debouncer(repeat_ms=150)
+    debouncer.feed(CODE, 1000 * MS)
+    assert debouncer.feed(CODE, 10 * MS) == PRESS  # Replay of an earlier session
+
+
+def test_idle_codes_are_pruned_beyond_max_codes():
+    debouncer = Debouncer(repeat_ms=150)
+    for code in range(MAX_CODES):
+        debouncer.feed(code, 0)
+    debouncer.feed(MAX_CODES, 200 * MS)
+    assert len(debouncer._codes) == 1
+
+
+def test_totals_survive_reset_counts():
+    debouncer = Debouncer(repeat_ms=150)
+    debouncer.feed(CODE, 0)
+    debouncer.feed(CODE, 50 * MS)
+    debouncer.reset_counts()
+    debouncer.feed(CODE, 100 * MS)
+    assert debouncer.stats()['repeats'] == 1 and debouncer.presses == 0
+    assert debouncer.totals() == (3, 2)
+
+
+def test_clock_is_used_without_a_time():
+    now = [0]
+    debouncer = Debouncer(repeat_ms=150, clock_ns=lambda: now[0])
+    assert debouncer.feed(CODE) == PRESS
+    now[0] = 100 * MS
+    assert debouncer.feed(CODE) == REPEAT
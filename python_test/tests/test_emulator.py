@@ -0,0 +1,29 @@
+from virc_emulator import EmulatedReceiver
+from virc_protocol import (API_V2_REQUEST, CMD_API_VERSION, CMD_RAW_TIMING, FORMAT_V1, FORMAT_V2, QUERY_COMMANDS,
+                           RAW_TIMING_OFF, RAW_TIMING_ON, REPORT_RAW_TIMING_STATE, REPORT_SIZE, reply_format)
+
+
+def padded(report):
+    """Output report as a host sends it: zero-padded to the full report size"""
+    return bytes(report).ljust(REPORT_SIZE + 1, b"\0")
+
+
+def reply(receiver, report):
+    receiver.handle_output(report)
+    return receiver.read(REPORT_SIZE, 1000)
+
+
+def test_padded_timing_query_only_asks():
+    receiver = EmulatedReceiver(latency_s=0)
+    assert reply(receiver, padded(RAW_TIMING_ON))[:3] == [REPORT_RAW_TIMING_STATE, 0, 1]
+    assert reply(receiver, padded(QUERY_COMMANDS[CMD_RAW_TIMING]))[:3] == [REPORT_RAW_TIMING_STATE, 0, 1]
+    assert reply(receiver, QUERY_COMMANDS[CMD_RAW_TIMING])[:3] == [REPORT_RAW_TIMING_STATE, 0, 1]
+    assert reply(receiver, padded(RAW_TIMING_OFF))[:3] == [REPORT_RAW_TIMING_STATE, 0, 0]
+    assert not receiver.raw_timing
+
+
+def test_padded_api_query_keeps_the_format():
+    receiver = EmulatedReceiver(latency_s=0)
+    assert reply_format(reply(receiver, padded(QUERY_COMMANDS[CMD_API_VERSION]))) == FORMAT_V1
+    assert reply_format(reply(receiver, padded(API_V2_REQUEST))) == FORMAT_V2
+    assert reply_format(reply(receiver, padded(QUERY_COMMANDS[CMD_API_VERSION]))) == FORMAT_V2
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from virc_export import (EXPORTERS, ExportFilter, ExportJob, JsonLinesExport, case_times, count_sessions,
+                         export_records, export_sessions, format_for_path, iter_sessions)
+from virc_history import ButtonResult, insert_sessions
+
+from conftest import make_record
+
+
+@pytest.fixture
+def history(db):
+    with db:
+        insert_sessions(db, [make_record(finished=1_700_000_000.0 + i * 60, station="st1" if i < 4 else "st2",
+                                         outcomes=("pass", "fail", "pass") if i % 2 else ("pass",) * 3)
+                             for i in range(6)])
+    return db
+
+
+def history_path(db):
+    return db.execute("PRAGMA database_list").fetchone()[2]
+
+
+def export(db, fmt, filters=ExportFilter()):
+    out = io.StringIO()
+    count = export_sessions(db, out, fmt, filters)
+    return count, out.getvalue()
+
+
+def test_format_for_path():
+    assert [format_for_path(p) for p in ("a.CSV", "a.jsonl", "a.xml", "a.txt", "a.db")] == \
+        ["csv", "jsonl", "junit", "report", None]
+
+
+def test_filters(history):
+    assert count_sessions(history) == 6
+    assert count_sessions(history, ExportFilter(station="st2")) == 2
+    assert count_sessions(history, ExportFilter(verdict="FAIL")) == 3
+    assert [sid for sid, _ in iter_sessions(history, ExportFilter(first_id=4))] == [4, 5, 6]
+    assert [sid for sid, _ in iter_sessions(history, ExportFilter(session_id=2))] == [2]
+    assert [sid for sid, _ in iter_sessions(history, ExportFilter(since=1_700_000_060.0, until=1_700_000_180.0))] \
+        == [2, 3]
+
+
+def test_iter_sessions_reads_in_chunks(history):
+    sessions = list(iter_sessions(history, chunk=4))
+    assert [sid for sid, _ in sessions] == list(range(1, 7))
+    assert all(len(record.buttons) == 3 for _, record in sessions)
+
+
+def test_csv_has_a_row_per_button(history):
+    count, text = export(history, "csv", ExportFilter(session_id=2))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert count == 1 and len(rows) == 3
+    assert [(row['button'], row['outcome']) for row in rows] == [("Power", "pass"), ("Up", "fail"), ("Down", "pass")]
+    assert rows[0]['code'] == "0xFE017F80" and rows[1]['press_s'] == ""
+
+
+def test_jsonl_has_a_line_per_session(history):
+    count, text = export(history, "jsonl")
+    sessions = [json.loads(line) for line in text.splitlines()]
+    assert count == len(sessions) == 6
+    assert sessions[1]['verdict'] == "FAIL" and sessions[1]['buttons'][1]['outcome'] == "fail"
+
+
+def test_junit(history):
+    _, text = export(history, "junit", ExportFilter(session_id=2))
+    (suite,) = ElementTree.fromstring(text)
+    assert suite.get("failures") == "1" and suite.get("tests") == "3" and suite.get("skipped") is None
+    cases = suite.findall("testcase")
+    assert [case.find("failure") is not None for case in cases] == [False, True, False]
+    assert [float(case.get("time")) for case in cases] == [0.0, 0.0, 2.0]
+
+
+def test_case_times_are_the_gaps_between_passes():
+    buttons = [ButtonResult(1, "A", "pass", 2.5), ButtonResult(2, "B", "fail"), ButtonResult(3, "C", "pass", 0.0),
+               ButtonResult(4, "D", "pass", 4.0)]
+    assert case_times(buttons) == [2.5, 0.0, 0.0, 1.5]
+
+
+def test_text_report(history):
+    count, text = export(history, "report", ExportFilter(first_id=5))
+    assert count == 2
+    assert "Session: #5" in text and "Session: #6" in text
+    assert "Up                   : ❌ FAIL" in text
+    assert text.rstrip().endswith("Generated by VIRC QC Testing Station")
+
+
+def test_job_writes_the_file_in_the_background(history, tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    job = ExportJob(history_path(history), path).start()
+    assert job.finished.wait(5)
+    assert job.error is None and (job.done, job.total) == (6, 6)
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 6
+
+
+def test_job_reports_any_error_and_leaves_no_file(history, tmp_path, monkeypatch):
+    class Broken(JsonLinesExport):
+        def session(self, session_id, record):
+            raise ValueError("bad record")
+
+    monkeypatch.setitem(EXPORTERS, "jsonl", Broken)
+    path = tmp_path / "out.jsonl"
+    job = ExportJob(history_path(history), str(path)).start()
+    assert job.finished.wait(5)
+    assert isinstance(job.error, ValueError)
+    assert not path.exists() and not (tmp_path / "out.jsonl.part").exists()
+
+
+def test_export_records_numbers_the_sessions():
+    out = io.StringIO()
+    assert export_records(out, [make_record(), make_record()], "report") == 2
+    assert "Session: #2" in out.getvalue() and "Sessions: 2" in out.getvalue()
+
+
+def test_job_rejects_an_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ExportJob(str(tmp_path / "history.db"), str(tmp_path / "out.pdf"))
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from virc_history import (HistoryWriter, button_results, connect, dashboard_stats, insert_sessions, query_sessions,
+                          rebuild_summaries, shift_of)
+
+from conftest import make_record
+
+
+def at(day, hour, minute=0):
+    """Unix time of a local wall clock time in May 2024"""
+    return datetime(2024, 5, day, hour, minute).timestamp()
+
+
+def summaries(db):
+    return {table: db.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+            for table in ("shift_stats", "hour_stats", "remote_stats", "button_stats")}
+
+
+def test_shift_of():
+    assert shift_of(at(6, 10))[:2] == ("2024-05-06", 0)
+    assert shift_of(at(6, 14))[:2] == ("2024-05-06", 1)
+    assert shift_of(at(6, 23))[:2] == ("2024-05-06", 2)
+    day, index, start = shift_of(at(7, 3))  # After midnight: still the night shift that started the day before
+    assert (day, index, start) == ("2024-05-06", 2, at(6, 22))
+
+
+def test_sessions_and_buttons_round_trip(db):
+    record = make_record(finished=at(6, 10), outcomes=("pass", "fail", "pass"))
+    with db:
+        (session_id,) = insert_sessions(db, [record])
+    (row,) = query_sessions(db)
+    assert row['id'] == session_id and row['verdict'] == "FAIL"
+    assert (row['buttons'], row['passed'], row['duration_s']) == (3, 2, record.duration_s)
+    assert tuple(button_results(db, session_id)) == record.buttons
+
+
+def test_summary_tables_count_every_session(db):
+    with db:
+        insert_sessions(db, [make_record(finished=at(6, 10)),
+                             make_record(finished=at(6, 11), outcomes=("pass", "fail", "fail"), duration_s=30.0),
+                             make_record(finished=at(6, 15), remote="Other Remote")])
+    tables = summaries(db)
+    assert [row[:5] for row in tables['shift_stats']] == [("2024-05-06", 0, 2, 1, 36.0), ("2024-05-06", 1, 1, 1, 6.0)]
+    assert tables['remote_stats'] == [("Other Remote", 1, 1, 6.0), ("Test Remote", 2, 1, 36.0)]
+    failed = {(remote, button): (tested, failed) for remote, _, button, tested, failed in tables['button_stats']}
+    assert failed[("Test Remote", "Up")] == (2, 1) and failed[("Test Remote", "Power")] == (2, 0)
+    assert sum(sessions for _, sessions, _ in tables['hour_stats']) == 3
+
+
+def test_rebuild_gives_the_same_tables(db):
+    with db:
+        insert_sessions(db, [make_record(finished=at(6, 10 + i), outcomes=("pass", "fail" if i % 3 else "pass", "pass"))
+                             for i in range(8)])
+    before = summaries(db)
+    with db:
+        rebuild_summaries(db)
+    assert summaries(db) == before
+
+
+def test_dashboard_stats(db):
+    with db:
+        insert_sessions(db, [make_record(finished=at(6, 10, 30)),
+                             make_record(finished=at(6, 11, 30), outcomes=("pass", "fail", "pass"))])
+    stats = dashboard_stats(db, now=at(6, 12))
+    assert stats['sessions'] == 2 and stats['pass_rate'] == 0.5
+    (shift,) = stats['shifts']
+    assert shift['current'] and shift['shift'] == "Early" and shift['units_per_hour'] == 2 / 6
+    assert stats['last_hour'] == 0 and stats['units_per_hour'] == 2 / 8
+    assert [(b['button'], b['fail_rate']) for b in stats['buttons']] == [("Up", 0.5)]
+
+
+def test_existing_database_gets_its_summary_tables(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = connect(path)
+    with db:
+        insert_sessions(db, [make_record(finished=at(6, 10))])
+        db.execute("DELETE FROM shift_stats")
+        db.execute("PRAGMA user_version = 1")  # A history written before the summary tables
+    db.close()
+    db = connect(path)
+    assert db.execute("SELECT sessions FROM shift_stats").fetchall() == [(1,)]
+    db.close()
+
+
+def test_writer_commits_in_the_background(tmp_path):
+    committed = []
+    writer = HistoryWriter(str(tmp_path / "history.db"), on_commit=committed.extend).start()
+    records = [make_record(finished=at(6, 10, i)) for i in range(3)]
+    for record in records:
+        writer.record(record)
+    writer.close()
+    assert writer.written == 3 and writer.failed == 0
+    assert [record for _, record in committed] == records
+    assert [session_id for session_id, _ in committed] == [1, 2, 3]
@@ -0,0 +1,95 @@
+from virc_log import LazyMessage, LogBuffer, LogKind, LogView, search_code
+
+
+def fill(buffer, count, **tags):
+    for i in range(count):
+        buffer.append(LogKind.IR_SIGNAL if i % 2 else LogKind.NORMAL, f"line {i}", timestamp=float(i), **tags)
+
+
+def test_ring_keeps_the_newest_entries():
+    buffer = LogBuffer(capacity=4)
+    fill(buffer, 10)
+    assert len(buffer) == 4
+    assert buffer.first_seq == 6 and buffer.next_seq == 10
+    assert buffer.get(5) is None
+    assert [buffer.get(seq).message for seq in range(6, 10)] == ["line 6", "line 7", "line 8", "line 9"]
+
+
+def test_indexes_forget_evicted_entries():
+    buffer = LogBuffer(capacity=4)
+    buffer.append(LogKind.ERROR, "old error", lane="SN R1")
+    fill(buffer, 4)
+    assert LogKind.ERROR not in buffer.keys('kind')
+    assert buffer.keys('lane') == []
+    assert buffer.select(kind=LogKind.ERROR) == []
+
+
+def test_select_combines_criteria_and_text():
+    buffer = LogBuffer()
+    buffer.append(LogKind.IR_SIGNAL, "IR Code: 0xFE017F80 : Power", code=0xFE017F80, lane="SN R1")
+    buffer.append(LogKind.IR_SIGNAL, "IR Code: 0xFE017F80 : Power", code=0xFE017F80, lane="SN R2")
+    buffer.append(LogKind.NORMAL, "Power supply ok", lane="SN R1")
+    assert buffer.select(code=0xFE017F80) == [0, 1]
+    assert buffer.select(code=0xFE017F80, lane="SN R2") == [1]
+    assert buffer.select(text="power", lane="SN R1") == [0, 2]
+    assert buffer.select(kind=LogKind.NORMAL, after_seq=1) == [2]
+
+
+def test_lazy_messages_are_built_when_read():
+    calls = []
+
+    def build(value):
+        calls.append(value)
+        return f"value {value}"
+
+    buffer = LogBuffer()
+    buffer.append(LogKind.NORMAL, LazyMessage(build, 7))
+    assert calls == []
+    assert buffer.select(text="VALUE 7") == [0]
+    assert f"{buffer.get(0).message:>8}" == " value 7"
+
+
+def test_view_rows_clear_and_filter():
+    buffer = LogBuffer(capacity=8)
+    view = LogView(buffer)
+    fill(buffer, 5)
+    assert len(view) == 5
+    assert [entry.message for entry in view.rows(3, 10)] == ["line 3", "line 4"]
+    view.clear()
+    assert len(view) == 0
+    fill(buffer, 2)
+    assert [entry.seq for entry in view.rows(0, 10)] == [5, 6]
+
+    view.set_filter(kind=LogKind.IR_SIGNAL, text="")
+    assert [entry.message for entry in view.rows(0, 10)] == ["line 1", "line 3", "line 1"]
+
+
+def test_filtered_view_follows_new_and_evicted_entries():
+    buffer = LogBuffer(capacity=4)
+    view = LogView(buffer)
+    view.set_filter(kind=LogKind.ERROR)
+    buffer.append(LogKind.ERROR, "first")
+    assert len(view) == 1
+    fill(buffer, 3)
+    buffer.append(LogKind.ERROR, "second")  # Evicts "first"
+    assert [entry.message for entry in view.rows(0, 10)] == ["second"]
+
+
+def test_search_code():
+    assert search_code("0xFE017F80") == 0xFE017F80
+    assert search_code(" fe017f80 ") == 0xFE017F80
+    assert search_code("0xbed") == 0xBED
+    assert search_code("Face") == 0xFACE  # Could be either: the search also matches it as text
+    assert [search_code(word) for word in ("Bed", "add", "0x", "ab_cd", "Power", "")] == [None] * 6
+
+
+def test_search_finds_a_code_or_its_text():
+    buffer = LogBuffer()
+    buffer.append(LogKind.IR_SIGNAL, "[12:00:00] IR event", code=0xFE017F80)
+    buffer.append(LogKind.IR_SIGNAL, "IR Code: 0xFE017F80 : Bed light", code=0xFE017F80)
+    buffer.append(LogKind.NORMAL, "Pressed Bed")
+    buffer.append(LogKind.NORMAL, "Face plate ok")
+    assert buffer.select(search="Bed") == [1, 2]
+    assert buffer.select(search="face") == [3]
+    assert buffer.select(search="0xFE017F80") == [0, 1]
+    assert buffer.select(search="FE017F80", kind=LogKind.IR_SIGNAL) == [0, 1]
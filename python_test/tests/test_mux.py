@@ -0,0 +1,94 @@
+import concurrent.futures
+
+import pytest
+
+from virc_mux import DeviceInfo, DeviceInfoCache, QueryRouter, UnknownCommandError, format_reply, query_device_info
+from virc_protocol import CMD_API_VERSION, CMD_DEVICE_TYPE, CMD_FW_VERSION, REPORT_IR_CODE
+
+
+def query(router, command):
+    return router.add(command, concurrent.futures.Future())
+
+
+def test_replies_go_to_their_query_ir_reports_stay():
+    router = QueryRouter("SN R1")
+    api, device_type = query(router, CMD_API_VERSION), query(router, CMD_DEVICE_TYPE)
+    assert router.pending == 2
+    assert not router.route([REPORT_IR_CODE, 0, 0x80, 0x7F, 0x01, 0xFE])
+    assert router.route([2, 0, 1])
+    assert router.route([4, 0, 2, 1, 2])
+    assert device_type.result(0) == [2, 0, 1]
+    assert api.result(0) == [4, 0, 2, 1, 2]
+    assert router.pending == 0
+
+
+def test_same_command_queries_are_answered_in_order():
+    router = QueryRouter()
+    first, second = query(router, CMD_FW_VERSION), query(router, CMD_FW_VERSION)
+    router.route([6, 0, 1, 3])
+    assert first.done() and not second.done()
+
+
+def test_unknown_command_fails_the_oldest_query():
+    router = QueryRouter("SN R1")
+    future = query(router, CMD_DEVICE_TYPE)
+    assert router.route([0, 0, 3])
+    with pytest.raises(UnknownCommandError):
+        future.result(0)
+
+
+def test_unknown_command_fails_the_oldest_query_of_any_command():
+    router = QueryRouter()
+    query(router, CMD_FW_VERSION)
+    device_type = query(router, CMD_DEVICE_TYPE)
+    router.route([6, 0, 1, 3])
+    fw_version = query(router, CMD_FW_VERSION)  # Sent after device_type
+    router.route([0, 0, 3])
+    assert device_type.exception(0) is not None and not fw_version.done()
+
+
+def test_discarded_query_leaves_the_reply_to_the_next_one():
+    router = QueryRouter()
+    timed_out, waiting = query(router, CMD_DEVICE_TYPE), query(router, CMD_DEVICE_TYPE)
+    router.discard(CMD_DEVICE_TYPE, timed_out)
+    router.route([2, 0, 1])
+    assert waiting.done() and not timed_out.done()
+
+
+def test_fail_all_and_on_add():
+    added = []
+    router = QueryRouter(on_add=lambda: added.append(1))
+    future = query(router, CMD_API_VERSION)
+    router.fail_all(ConnectionError("closed"))
+    assert added == [1] and router.pending == 0
+    with pytest.raises(ConnectionError):
+        future.result(0)
+
+
+def test_query_device_info_pipelines_the_three_queries():
+    router = QueryRouter()
+
+    class Device:
+        def write(self, data):
+            reply = {CMD_DEVICE_TYPE: [2, 0, 1], CMD_API_VERSION: [4, 0, 2, 1, 2], CMD_FW_VERSION: None}[data[1]]
+            if reply:
+                router.route(reply)  # What the reader thread does
+
+    info = query_device_info(Device(), router, timeout=0.05)
+    assert info[:3] == ("1", "2.1", "N/A")  # No firmware version reply: times out, N/A
+    assert router.pending == 0
+
+
+def test_format_reply():
+    assert format_reply(CMD_DEVICE_TYPE, [2, 0, 1]) == "1"
+    assert format_reply(CMD_FW_VERSION, [6, 0, 1, 3]) == "1.3"
+    assert format_reply(CMD_FW_VERSION, [6, 0]) == "N/A"
+
+
+def test_cache_keeps_complete_answers_only():
+    cache = DeviceInfoCache()
+    cache.put("R1", DeviceInfo("1", "2.1", "1.3", 0.0))
+    cache.put("R2", DeviceInfo("1", "N/A", "1.3", 0.0))
+    cache.put("", DeviceInfo("1", "2.1", "1.3", 0.0))
+    assert cache.get("R1").fw_version == "1.3"
+    assert cache.get("R2") is None and len(cache) == 1
@@ -0,0 +1,69 @@
+from virc_protocol import (BATCH_EVENTS, FLAG_REPEAT, REPORT_IR_BATCH, REPORT_SIZE, EventSequence, IREvent,
+                           decode_ir_batch, decode_ir_code, decode_timing_chunk, encode_ir_batch,
+                           encode_timing_chunks)
+
+
+def batch(*seqs, time_us=None, flags=0):
+    """Report 8 of events with these sequence numbers, 1 ms apart unless times are given"""
+    times = time_us or [seq * 1000 for seq in seqs]
+    return encode_ir_batch([IREvent(seq, flags, t, 0xFE017F80) for seq, t in zip(seqs, times)])
+
+
+def test_batch_round_trip():
+    events = [IREvent(i, FLAG_REPEAT if i % 2 else 0, 1000 * i, 0xFE017F80 + i) for i in range(BATCH_EVENTS)]
+    report = encode_ir_batch(events)
+    assert len(report) == REPORT_SIZE and report[0] == REPORT_IR_BATCH
+    assert decode_ir_batch(report) == events
+    assert decode_ir_batch(list(report)) == events  # hidapi hands out lists
+    assert [event.repeat for event in events] == [False, True, False, True, False]
+
+
+def test_ir_code_is_little_endian():
+    assert decode_ir_code([7, 0, 0x80, 0x7F, 0x01, 0xFE]) == 0xFE017F80
+
+
+def test_consecutive_sequence_loses_nothing():
+    sequence = EventSequence()
+    sequence.feed(batch(0, 1, 2))
+    sequence.feed(batch(3, 4))
+    assert sequence.lost == 0 and sequence.events == 5
+
+
+def test_gaps_count_as_lost_events():
+    sequence = EventSequence()
+    sequence.feed(batch(0, 1))
+    sequence.feed(batch(5))        # 2, 3, 4 dropped by the receiver
+    sequence.feed(batch(6, 8))     # 7 dropped inside a report
+    assert sequence.lost == 4 and sequence.events == 5
+
+
+def test_sequence_wraps_at_16_bits():
+    sequence = EventSequence()
+    sequence.feed(batch(0xFFFE, 0xFFFF))
+    sequence.feed(batch(0, 2))
+    assert sequence.lost == 1
+
+
+def test_sequence_going_back_is_a_restart_not_a_loss():
+    sequence = EventSequence()
+    sequence.feed(batch(500, 501))
+    ((_, device_ns),) = sequence.feed(batch(0, time_us=[50]))
+    assert sequence.lost == 0
+    assert device_ns == 50_000  # Device clock starts over too
+
+
+def test_device_time_unwraps_at_32_bits():
+    sequence = EventSequence()
+    ((_, first),) = sequence.feed(batch(0, time_us=[0xFFFFFF00]))
+    ((_, second),) = sequence.feed(batch(1, time_us=[0x100]))
+    assert second - first == 0x200 * 1000
+
+
+def test_timing_chunks_round_trip():
+    durations = list(range(100, 100 + 67 * 50, 50))  # One NEC frame: 67 marks and spaces
+    chunks = encode_timing_chunks(0x1234, durations)
+    decoded = [decode_timing_chunk(chunk) for chunk in chunks]
+    assert {seq for seq, _, _, _ in decoded} == {0x1234}
+    assert [index for _, index, _, _ in decoded] == list(range(len(chunks)))
+    assert all(count == len(chunks) for _, _, count, _ in decoded)
+    assert [d for _, _, _, values in decoded for d in values] == durations
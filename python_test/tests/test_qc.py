@@ -0,0 +1,86 @@
+from virc_history import FAIL, PASS
+from virc_qc import FAILED, PASSED, PENDING, QCLane
+
+from conftest import CODES, OTHER_CODES
+
+
+def make_lane(registry, **options):
+    events = []
+    lane = QCLane("SN R1", "R1", "st1", lambda kind, lane, **fields: events.append((kind, fields)), **options)
+    return lane, events, lambda code, at=0.0: lane.press(code, registry.lookup(code), at)
+
+
+def verdicts(events):
+    return [(fields['record'].verdict, fields['reason']) for kind, fields in events if kind == "verdict"]
+
+
+def test_every_button_passes_the_remote(registry):
+    lane, events, press = make_lane(registry)
+    for i, code in enumerate(CODES):
+        press(code, 10.0 + i)
+    assert [kind for kind, _ in events] == ["detected", "pass", "pass", "pass", "verdict"]
+    assert verdicts(events) == [(PASS, "complete")]
+    record = events[-1][1]['record']
+    assert [b.outcome for b in record.buttons] == ["pass"] * 3
+    assert [b.press_s for b in record.buttons] == [0.0, 1.0, 2.0]
+    assert record.started == 10.0 and record.finished == 12.0
+    assert not lane.running and lane.profile is None  # Rearmed for the next remote
+
+
+def test_mask_and_count_follow_the_presses(registry):
+    lane, events, press = make_lane(registry)
+    press(CODES[2])
+    press(CODES[0])
+    assert lane.passed_mask == 0b101
+    assert lane.passed == 2
+    assert [outcome for _, _, outcome in lane.results()] == [PASSED, PENDING, PASSED]
+
+
+def test_repeat_and_unknown_codes_change_nothing(registry):
+    lane, events, press = make_lane(registry)
+    press(CODES[0])
+    press(CODES[0])
+    press(0x12345678)
+    assert [kind for kind, _ in events] == ["detected", "pass", "repeat", "unexpected"]
+    assert lane.passed == 1 and lane.passed_mask == 0b001
+
+
+def test_another_remote_fails_the_unfinished_one(registry):
+    lane, events, press = make_lane(registry)
+    press(CODES[0])
+    press(OTHER_CODES[0])
+    assert verdicts(events) == [(FAIL, "switched")]
+    record = [fields['record'] for kind, fields in events if kind == "verdict"][0]
+    assert [b.outcome for b in record.buttons] == ["pass", "fail", "fail"]
+    assert lane.profile.name == "Other Remote" and lane.passed == 1
+
+
+def test_idle_timeout(registry):
+    lane, events, press = make_lane(registry, idle_timeout_s=30.0)
+    press(CODES[0])
+    last = lane.last_press
+    assert not lane.check_idle(last + 29.0)
+    assert lane.check_idle(last + 30.0)
+    assert verdicts(events) == [(FAIL, "idle")]
+    assert not lane.check_idle(last + 60.0)  # Finished already
+
+
+def test_without_rearm_the_checklist_stays_until_cleared(registry):
+    lane, events, press = make_lane(registry, rearm=False)
+    for code in CODES[:2]:
+        press(code)
+    lane.finish(FAIL, "idle")
+    assert lane.verdict == FAIL and lane.record is not None
+    assert [outcome for _, _, outcome in lane.results()] == [PASSED, PASSED, FAILED]
+    press(CODES[2])  # Same remote: a repeat, not a new session
+    assert events[-1][0] == "repeat"
+    lane.clear()
+    assert lane.profile is None and lane.passed_mask == 0
+
+
+def test_clearing_an_unfinished_remote_records_nothing(registry):
+    lane, events, press = make_lane(registry)
+    press(CODES[0])
+    lane.clear()
+    lane.finish(FAIL, "idle")
+    assert verdicts(events) == []
@@ -0,0 +1,126 @@
+import gzip
+import http.server
+import json
+import threading
+import urllib.error
+
+import pytest
+
+from virc_history import insert_sessions
+from virc_upload import (ResultUploader, collector_url, decode_batch, encode_batch, pending_sessions,
+                         record_from_payload, session_payload)
+
+from conftest import make_record
+
+
+def test_batch_round_trip():
+    sessions = [(f"db-{i}", make_record(finished=1_700_000_000.0 + i, outcomes=("pass", "fail", "pass")))
+                for i in range(3)]
+    body = encode_batch(sessions)
+    assert body[:2] == b"\x1f\x8b"  # gzip
+    assert decode_batch(body, "gzip") == sessions
+    assert decode_batch(gzip.decompress(body)) == sessions
+
+
+def test_payload_is_plain_json():
+    record = make_record()
+    payload = json.loads(json.dumps(session_payload("db-1", record)))
+    assert record_from_payload(payload) == ("db-1", record)
+
+
+@pytest.mark.parametrize("body, encoding", [
+    (b"{}", None),                                   # No sessions
+    (b'{"sessions": [{"uid": "x"}]}', None),         # Session without its fields
+    (b"not gzip", "gzip"),
+    (b"{}", "br"),
+])
+def test_bad_batches_are_value_errors(body, encoding):
+    with pytest.raises(ValueError):
+        decode_batch(body, encoding)
+
+
+def test_oversized_batch_is_refused(monkeypatch):
+    monkeypatch.setattr("virc_upload.MAX_BATCH_BYTES", 100)
+    with pytest.raises(ValueError, match="too large"):
+        decode_batch(encode_batch([("db-1", make_record())] * 5), "gzip")
+
+
+def test_collector_url():
+    assert collector_url("http://host:8090/") == "http://host:8090/api/v1/sessions"
+    assert collector_url("http://host:8090/api/v1/sessions") == "http://host:8090/api/v1/sessions"
+
+
+def test_pending_sessions(db):
+    records = [make_record(finished=1_700_000_000.0 + i) for i in range(5)]
+    with db:
+        insert_sessions(db, records)
+    pending = pending_sessions(db, 2, limit=2)
+    assert [(session_id, record) for session_id, record in pending] == [(3, records[2]), (4, records[3])]
+    assert pending_sessions(db, 5) == []
+
+
+class Collector(http.server.BaseHTTPRequestHandler):
+    """Answers every upload with the server's `status`"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append(decode_batch(body, self.headers.get('Content-Encoding')))
+        status = self.server.status
+        reply = json.dumps({'accepted': len(self.server.received[-1]), 'duplicates': 0}).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def collector():
+    server = http.server.HTTPServer(("127.0.0.1", 0), Collector)
+    server.status, server.received = 200, []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uploader(tmp_path, collector):
+    path = str(tmp_path / "history.db")
+    statuses = []
+    uploader = ResultUploader(path, f"http://127.0.0.1:{collector.server_port}", on_status=lambda *s: statuses.append(s),
+                              batch_size=2)
+    with uploader._db:
+        insert_sessions(uploader._db, [make_record(finished=1_700_000_000.0 + i) for i in range(3)])
+    uploader.statuses = statuses
+    yield uploader
+    uploader.close()
+
+
+def test_upload_sends_batches_in_order(uploader, collector):
+    assert uploader.upload_once()       # One more batch waiting
+    assert not uploader.upload_once()
+    assert not uploader.upload_once()   # Nothing left: nothing sent
+    assert [[uid for uid, _ in batch] for batch in collector.received] == \
+        [[f"{uploader.database_id}-1", f"{uploader.database_id}-2"], [f"{uploader.database_id}-3"]]
+    assert (uploader.uploaded, uploader.queued, uploader.online) == (3, 0, True)
+
+
+def test_rejected_batch_is_skipped(uploader, collector):
+    collector.status = 422
+    uploader.upload_once()
+    assert uploader.rejected == 2 and uploader._last_id() == 2
+    assert "rejected 2 session(s)" in uploader.statuses[-1][2]
+
+
+def test_other_errors_keep_the_batch(uploader, collector):
+    collector.status = 503
+    with pytest.raises(urllib.error.HTTPError):
+        uploader.upload_once()
+    assert uploader.rejected == 0 and uploader._last_id() == 0
+    collector.status = 200
+    uploader.upload_once()
+    assert uploader._last_id() == 2  # The same sessions went again
@@ -0,0 +1,304 @@
+"""
+asyncio client for VIRC receivers.
+
+    async with VIRCClient(transport, device_info) as client:
+        print(await client.firmware_version())
+        async for event in client.events():
+            print(event.device, hex(event.code), event.button)
+
+One event loop can serve any number of receivers next to other coroutines
+(uploader, metrics server...). Each client has a single pump task that reads
+the device and routes every report by its ID (virc_mux.QueryRouter):
+
+    7 / 8       -> the event queue, consumed by events() (8: batched format 2
+                   events, one VIRCEvent each, repeat frames skipped)
+    2 / 4 / 6   -> the oldest pending device_type() / api_version() /
+                   firmware_version() query waiting for that reply
+    0           -> the oldest pending query (the device did not know the command)
+
+so queries can be pipelined while IR events keep flowing, and a reply can
+never be mistaken for an IR report or the other way round.
+
+The event queue is bounded: while it is full the pump stops reading the
+device, so a slow consumer slows the receiver down instead of losing events
+or growing memory; close() also ends a pump waiting for queue space. hidapi only has blocking reads (and a replayed capture
+keeps its timing by blocking until a report is due), so they run in slices
+of read_slice_ms, which bounds how long close() waits, on a thread pool
+shared by all clients. A pump keeps one of its threads busy while it
+listens, so the pool is sized to the pumps running: it grows as clients
+open (doubling, threads are reused), and open() uses the loop's default
+executor, never waiting behind a read. The limit is the number of threads
+the OS allows, far more receivers than USB hubs take. A slice returns as
+soon as a report arrives, so it adds no latency. Cancelling a task
+awaiting events() or a query is immediate. A query fails with
+asyncio.TimeoutError, or UnknownCommandError on report 0.
+
+Run this file to print the events of every receiver (python virc_async.py --emulate 3).
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from virc_hotplug import VIRC_VENDOR_IDS, DeviceRegistry
+from virc_mux import QueryRouter
+from virc_profiles import CodeEntry, default_registry
+from virc_protocol import (API_V2_REQUEST, CMD_API_VERSION, CMD_DEVICE_TYPE, CMD_FW_VERSION, QUERY_COMMANDS,
+                           REPORT_IR_BATCH, REPORT_IR_CODE, REPORT_SIZE, EventSequence, decode_ir_code,
+                           decode_version)
+
+EVENT_QUEUE_SIZE = 1024
+READ_SLICE_MS = 250
+QUERY_TIMEOUT_S = 1.0
+
+MIN_READ_THREADS = 4
+
+
+class ReadPool:
+    """Threads for the blocking device reads, at least one per running pump (any thread)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.executor = None
+        self.size = 0
+        self.readers = 0
+
+    def add_reader(self):
+        with self._lock:
+            self.readers += 1
+            if self.readers > self.size:
+                # Reads already submitted finish on the old pool, the next ones go to the new one
+                old = self.executor
+                self.size = max(MIN_READ_THREADS, self.readers, 2 * self.size)
+                self.executor = concurrent.futures.ThreadPoolExecutor(self.size, thread_name_prefix="VIRC read")
+                if old:
+                    old.shutdown(wait=False)
+
+    def remove_reader(self):
+        with self._lock:
+            self.readers -= 1
+
+
+READ_POOL = ReadPool()
+
+
+class VIRCEvent(NamedTuple):
+    device: str                  # Serial number (or HID path) of the receiver
+    code: int
+    entry: Optional[CodeEntry]   # Profile / button, None for a code no profile knows
+    report: list
+    received_ns: int             # time.monotonic_ns() when the report was read
+    device_ns: Optional[int] = None  # Receiver clock (format 2 reports only)
+
+    @property
+    def button(self):
+        return self.entry.button if self.entry else "Unknown Button"
+
+
+class VIRCClient:
+    """One receiver: IR events as an async iterator, awaitable info queries"""
+
+    def __init__(self, transport, device_info, registry=None, queue_size=EVENT_QUEUE_SIZE,
+                 read_slice_ms=READ_SLICE_MS):
+        self.transport = transport
+        self.device_info = device_info
+        path = device_info['path']
+        self.name = device_info.get('serial_number') or (path.decode(errors="replace") if isinstance(path, bytes) else str(path))
+        self.registry = registry or default_registry()
+        self.read_slice_ms = read_slice_ms
+        self.device = None
+        self.events_received = 0
+        self.read_timeouts = 0  # Read slices that returned no report
+        self._events = asyncio.Queue(maxsize=queue_size)
+        self.queries = QueryRouter(self.name)
+        self.sequence = EventSequence()  # Lost events of format 2 reports (sequence.lost)
+        self._pump = None
+        self._closing = False
+        self._closed = asyncio.Event()  # Wakes a pump waiting for queue space
+        self._ended = False
+        self.error = None   # Read error that ended the pump (receiver lost)
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.device = await loop.run_in_executor(None, self.transport.open, self.device_info['path'])
+        if self.transport.answers_queries:
+            self.device.write(API_V2_REQUEST)  # Batched reports if the firmware has them; the reply is just routed
+        self._pump = asyncio.create_task(self._run_pump(), name=f"VIRC pump {self.name}")
+        return self
+
+    async def close(self):
+        self._closing = True
+        self._closed.set()
+        if self._pump:
+            await asyncio.gather(self._pump, return_exceptions=True)  # Ends within one read slice
+            self._pump = None
+        if self.device:
+            self.device.close()
+            self.device = None
+        self.queries.fail_all(ConnectionError(f"{self.name}: client closed"))
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _run_pump(self):
+        loop = asyncio.get_running_loop()
+        READ_POOL.add_reader()
+        try:
+            while not self._closing:
+                report = await loop.run_in_executor(READ_POOL.executor, self.device.read, REPORT_SIZE,
+                                                    self.read_slice_ms)
+                if not report:
+                    if getattr(self.device, 'finished', False):  # End of a replayed capture
+                        break
+                    self.read_timeouts += 1
+                    continue
+                if self.queries.route(report):
+                    continue
+                if report[0] == REPORT_IR_CODE:
+                    code = decode_ir_code(report)
+                    event = VIRCEvent(self.name, code, self.registry.lookup(code), report, time.monotonic_ns())
+                    await self._put(event)  # Backpressure: no reads while the consumer is behind
+                elif report[0] == REPORT_IR_BATCH:
+                    received = time.monotonic_ns()
+                    for ir_event, device_ns in self.sequence.feed(report):
+                        if ir_event.repeat:
+                            continue
+                        if not await self._put(VIRCEvent(self.name, ir_event.code,
+                                                         self.registry.lookup(ir_event.code), report, received,
+                                                         device_ns)):
+                            break
+        except Exception as e:
+            self.error = e
+            self.queries.fail_all(e)
+        finally:
+            READ_POOL.remove_reader()
+            self._ended = True
+            try:
+                self._events.put_nowait(None)  # Wake a waiting consumer
+            except asyncio.QueueFull:
+                pass  # The consumer is not waiting; it sees _ended once the queue is drained
+
+    async def _put(self, event):
+        """Queue an event, waiting while the queue is full; False if the client was closed meanwhile"""
+        if not self._events.full():
+            self._events.put_nowait(event)
+        else:
+            put = asyncio.ensure_future(self._events.put(event))
+            closed = asyncio.ensure_future(self._closed.wait())
+            try:
+                await asyncio.wait((put, closed), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                closed.cancel()
+                if not put.done():
+                    put.cancel()
+            if not put.done() or put.cancelled():
+                return False
+        self.events_received += 1
+        return True
+
+    async def query(self, command, timeout=QUERY_TIMEOUT_S):
+        """Send one query command and await its reply report; queries may overlap"""
+        if self._pump is None or self._pump.done():
+            raise ConnectionError(f"{self.name}: not connected")
+        future = self.queries.add(command, asyncio.get_running_loop().create_future())
+        self.device.write(QUERY_COMMANDS[command])  # 2-byte output report, does not block
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.queries.discard(command, future)  # No-op once answered
+
+    async def device_type(self, timeout=QUERY_TIMEOUT_S):
+        return (await self.query(CMD_DEVICE_TYPE, timeout))[2]
+
+    async def api_version(self, timeout=QUERY_TIMEOUT_S):
+        return decode_version(await self.query(CMD_API_VERSION, timeout))
+
+    async def firmware_version(self, timeout=QUERY_TIMEOUT_S):
+        return decode_version(await self.query(CMD_FW_VERSION, timeout))
+
+    async def events(self):
+        """IR events until the client is closed; raises the read error if the receiver is lost"""
+        while True:
+            if self._ended and self._events.empty():
+                if self.error is not None:
+                    raise self.error
+                return
+            event = await self._events.get()
+            if event is not None:
+                yield event
+
+
+async def open_clients(transport, vendor_ids=VIRC_VENDOR_IDS, **options):
+    """Open a client for every receiver the transport lists (one enumeration, every VIRC vendor ID)"""
+    registry = DeviceRegistry(vendor_ids)
+    registry.scan(transport)
+    clients = [VIRCClient(transport, info, **options) for info in registry]
+    await asyncio.gather(*(client.open() for client in clients))
+    return clients
+
+
+async def merged_events(clients):
+    """Events of several clients as one async iterator, in arrival order
+
+    A receiver that is lost just stops contributing (see client.error).
+    """
+    merged = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+    async def forward(client):
+        try:
+            async for event in client.events():
+                await merged.put(event)
+        except Exception:
+            pass
+        await merged.put(None)
+
+    tasks = [asyncio.create_task(forward(client)) for client in clients]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            event = await merged.get()
+            if event is None:
+                remaining -= 1
+            else:
+                yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _print_events(args):
+    from virc_transport import transport_from_args
+    transport = transport_from_args(args)
+    clients = await open_clients(transport)
+    if not clients:
+        print("No receivers found")
+        return
+    try:
+        for client in clients:
+            if transport.answers_queries:
+                info = await asyncio.gather(client.device_type(), client.api_version(), client.firmware_version(),
+                                            return_exceptions=True)
+                print(f"{client.name}: device type {info[0]}, API {info[1]}, firmware {info[2]}")
+        async for event in merged_events(clients):
+            print(f"[{event.device}] 0x{event.code:08X} : {event.button}")
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+
+
+def main():
+    from virc_transport import add_transport_arguments
+    parser = argparse.ArgumentParser(description="Print the IR events of every VIRC receiver (asyncio client)")
+    add_transport_arguments(parser)
+    try:
+        asyncio.run(_print_events(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\nExiting...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,650 @@
+"""
+Performance benchmarks for the VIRC QC station.
+
+    python virc_bench.py                        # every benchmark, JSON on stdout
+    python virc_bench.py -o bench.json          # ... also written to a file
+    python virc_bench.py --only decode,cli      # a subset
+    python virc_bench.py --compare bench.json   # exit 1 if a metric got worse than --tolerance
+
+Receiver traffic is synthetic: reports are written to a capture file
+(virc_capture.py) and replayed at max speed through the normal listener, so
+runs are repeatable and need no receiver or remote. The GUI benchmarks drive
+VIRCCompleteGUI on a withdrawn Tk root and are reported as skipped where Tk
+has no display.
+
+Metric names tell which direction is better: *_per_s higher, *_ms / *_s /
+*_bytes lower; *_ok must stay true. Everything else is informational.
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from virc_capture import CaptureWriter, ReplayTransport
+from virc_emulator import EmulatedDevice, EmulatedReceiver, emulator_transport, ir_report
+from virc_hotplug import HotplugMonitor
+from virc_profiles import default_registry
+from virc_qc import QCLane
+from virc_protocol import (API_V2_REQUEST, BATCH_EVENTS, NUMPY_AVAILABLE, REPORT_IR_BATCH, REPORT_IR_CODE,
+                           REPORT_SIZE, EventSequence, IREvent, decode_ir_code, encode_ir_batch,
+                           encode_timing_chunks, ir_codes)
+from virc_timing import GOOD_SCORE, WEAK_SCORE, analyze_frames, frames_from_reports
+from virc_trace import Tracer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCHMARKS = ("decode", "protocol", "timing", "qc", "debounce", "gui", "memory", "startup", "cli", "reconnect")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def registry_codes(profile=None):
+    registry = default_registry()
+    profiles = [registry.get(profile)] if profile else list(registry)
+    return [code for p in profiles for code, _ in p.buttons]
+
+
+def write_synthetic_capture(path, events, codes, devices=1, gap_ms=400, burst=1, burst_gap_ms=20):
+    """Capture of `events` presses per device, each sent `burst` times (like a held button)
+
+    Consecutive presses use different codes and are gap_ms apart, so with the
+    150 ms repeat window exactly `events` per device must get through.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    writer = CaptureWriter(path)
+    device_ids = [writer.device_id(f"BENCH{d + 1:04d}") for d in range(devices)]
+    reports = {code: ir_report(code) for code in codes}
+    timestamp = 0
+    for i in range(events):
+        report = reports[codes[i % len(codes)]]
+        for _ in range(burst):
+            for device_id in device_ids:
+                writer.write(device_id, report, timestamp)
+            timestamp += burst_gap_ms * 1_000_000
+        timestamp += gap_ms * 1_000_000
+    writer.close()
+
+
+def bench_decode(events=200_000):
+    """Report -> (code, profile, button) as the listener does it, and the NumPy bulk decoder"""
+    registry = default_registry()
+    codes = registry_codes()
+    reports = [list(ir_report(codes[i % len(codes)])) for i in range(events)]  # hidapi returns lists
+
+    start = time.perf_counter()
+    known = 0
+    for report in reports:
+        if report[0] == REPORT_IR_CODE and registry.lookup(decode_ir_code(report)) is not None:
+            known += 1
+    elapsed = time.perf_counter() - start
+    metrics = {
+        'events': events,
+        'decode_ok': known == events,
+        'decode_per_s': events / elapsed,
+        'decode_ns_per_event': elapsed / events * 1e9,
+    }
+
+    if NUMPY_AVAILABLE:
+        buffer = b"".join(bytes(r) for r in reports)
+        start = time.perf_counter()
+        decoded = ir_codes(buffer)
+        elapsed = time.perf_counter() - start
+        metrics['bulk_decode_ok'] = len(decoded) == events
+        metrics['bulk_decode_per_s'] = events / elapsed
+    return metrics
+
+
+def emulated_burst(events, spacing_s=0.0002, negotiate=True):
+    """Presses `spacing_s` apart through the emulated firmware; (reports read, events decoded, EventSequence)"""
+    receiver = EmulatedReceiver(latency_s=0.0)
+    device = EmulatedDevice(receiver)
+    if negotiate:
+        device.write(API_V2_REQUEST)
+        device.read(REPORT_SIZE, 100)  # API version reply
+    codes = registry_codes()
+    start = time.monotonic()
+    for i in range(events):
+        receiver.press(codes[i % len(codes)], at=start + i * spacing_s)
+    sequence = EventSequence()
+    reports = decoded = 0
+    order_ok = True
+    last_ns = -1
+    while decoded < events:
+        report = device.read(REPORT_SIZE, 1000)
+        if not report:
+            break
+        reports += 1
+        if report[0] == REPORT_IR_CODE:
+            decoded += 1
+        elif report[0] == REPORT_IR_BATCH:
+            for _, device_ns in sequence.feed(report):
+                order_ok = order_ok and device_ns >= last_ns
+                last_ns = device_ns
+                decoded += 1
+    return reports, decoded, sequence, order_ok
+
+
+def bench_protocol(events=100_000, burst=2_000):
+    """Format 1 (report 7) vs format 2 (report 8) decoding, and a 5 kHz burst through the emulated firmware"""
+    codes = registry_codes()
+    v1_reports = [list(ir_report(codes[i % len(codes)])) for i in range(events)]  # hidapi returns lists
+    v2_reports = [list(encode_ir_batch([IREvent(i + j, 0, (i + j) * 100, codes[(i + j) % len(codes)])
+                                        for j in range(BATCH_EVENTS)]))
+                  for i in range(0, events, BATCH_EVENTS)]
+
+    start = time.perf_counter()
+    v1_codes = [decode_ir_code(report) for report in v1_reports]
+    v1_elapsed = time.perf_counter() - start
+    sequence = EventSequence()
+    start = time.perf_counter()
+    v2_codes = [event.code for report in v2_reports for event, _ in sequence.feed(report)]
+    v2_elapsed = time.perf_counter() - start
+
+    reports_v1, decoded_v1, _, _ = emulated_burst(burst, negotiate=False)
+    reports_v2, decoded_v2, burst_sequence, order_ok = emulated_burst(burst)
+    return {
+        'events': events,
+        'decode_ok': v1_codes == v2_codes,
+        'v1_decode_per_s': events / v1_elapsed,
+        'v2_decode_per_s': events / v2_elapsed,
+        'burst_events': burst,
+        'burst_ok': decoded_v1 == decoded_v2 == burst and burst_sequence.lost == 0 and order_ok,
+        'burst_v1_reports': reports_v1,
+        'burst_v2_reports': reports_v2,
+        'burst_v2_bytes_per_event': reports_v2 * REPORT_SIZE / max(decoded_v2, 1),
+    }
+
+
+# Emulated signals of bench_timing: (healthy?, EmulatedReceiver signal options)
+TIMING_SIGNALS = (
+    (True, {}),
+    (True, {'signal_jitter_us': 10}),
+    (False, {'signal_bias_us': -130}),                       # Weak LED
+    (False, {'signal_drift': 0.12, 'signal_jitter_us': 25}),  # Drifting oscillator
+)
+
+
+def bench_timing(frames=60_000, distinct=600):
+    """Raw timing chunks -> frames -> signal quality scores, all in bulk; healthy and bad remotes must separate"""
+    codes = registry_codes()
+    chunks = []
+    healthy = []
+    for i in range(distinct):
+        good, options = TIMING_SIGNALS[i % len(TIMING_SIGNALS)]
+        receiver = EmulatedReceiver(seed=i, **options)
+        durations = receiver.measured_durations(codes[i % len(codes)])
+        chunks.extend(bytes(chunk) for chunk in encode_timing_chunks(i, durations))
+        healthy.append(good)
+    repeat = frames // distinct
+    buffer = b"".join(chunks) * repeat
+
+    start = time.perf_counter()
+    decoded, _, _ = frames_from_reports(buffer)
+    result = analyze_frames(decoded)
+    elapsed = time.perf_counter() - start
+
+    scores = result['score'][:distinct]
+    good_scores = [score for score, good in zip(scores, healthy) if good]
+    bad_scores = [score for score, good in zip(scores, healthy) if not good]
+    expected_codes = [codes[i % len(codes)] for i in range(distinct)] * repeat
+    return {
+        'frames': len(decoded),
+        'codes_ok': len(decoded) == distinct * repeat and result['code'].tolist() == expected_codes,
+        'scoring_ok': bool(min(good_scores) >= GOOD_SCORE and max(bad_scores) < WEAK_SCORE),
+        'analyze_per_s': len(decoded) / elapsed,
+        'healthy_score_min': float(min(good_scores)),
+        'bad_score_max': float(max(bad_scores)),
+    }
+
+
+def bench_qc(lanes=64, units=200):
+    """Checklist engine without a display: many lanes in parallel, every verdict must come out as scripted
+
+    Each lane tests `units` remotes: most press every button once (in random
+    order, with some repeats) and PASS; every fifth one leaves a button out and
+    is finished by the next remote showing up (FAIL, "switched").
+    """
+    registry = default_registry()
+    profiles = list(registry)
+    rng = random.Random(1)
+    verdicts = collections.Counter()
+    expected = collections.Counter()
+
+    def on_qc(kind, lane, **fields):
+        if kind == "verdict":
+            verdicts[(fields['record'].verdict, fields['reason'])] += 1
+
+    # Scripts first: the timed loop only feeds presses, interleaved across lanes like a busy line
+    scripts = []
+    for l in range(lanes):
+        presses = []
+        for u in range(units):
+            profile = profiles[(l + u) % len(profiles)]
+            codes = [code for code, _ in profile.buttons]
+            rng.shuffle(codes)
+            codes[-1:-1] = rng.sample(codes[:-1], min(3, len(codes) - 1))  # Repeats, before the deciding press
+            if u % 5 == 4 and u + 1 < units and len(codes) > 1 and profiles[(l + u + 1) % len(profiles)] is not profile:
+                codes = [code for code in codes if code != codes[0]] or codes  # One button never pressed
+                expected[("FAIL", "switched")] += 1
+            else:
+                expected[("PASS", "complete")] += 1
+            presses.extend((code, registry.lookup(code)) for code in codes)
+        scripts.append(presses)
+    qc_lanes = [QCLane(f"BENCH{l + 1:04d}", "", "bench", on_qc) for l in range(lanes)]
+
+    start = time.perf_counter()
+    total = 0
+    for step in range(max(len(presses) for presses in scripts)):
+        for lane, presses in zip(qc_lanes, scripts):
+            if step < len(presses):
+                code, entry = presses[step]
+                lane.press(code, entry, step * 0.5)
+                total += 1
+    elapsed = time.perf_counter() - start
+    return {
+        'lanes': lanes,
+        'presses': total,
+        'sessions': sum(verdicts.values()),
+        'qc_ok': verdicts == expected,
+        'presses_per_s': total / elapsed,
+        'sessions_per_s': sum(verdicts.values()) / elapsed,
+    }
+
+
+class GuiHarness:
+    """VIRCCompleteGUI on a withdrawn Tk root, fed by a replayed capture"""
+
+    def __init__(self, capture_path, test_mode=False, tracer=None):
+        import tkinter as tk
+        import complete_gui
+
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.app = complete_gui.VIRCCompleteGUI(self.root, transport=ReplayTransport(capture_path, None), tracer=tracer)
+        self.app.show_test_results = lambda lane, record: None  # No modal verdict dialog in a benchmark
+        # Receivers are found and opened in the background once the window is up
+        receivers = len(self.app.transport.enumerate())
+        deadline = time.perf_counter() + 10
+        while len(self.app.lanes) < receivers and time.perf_counter() < deadline:
+            self.root.update()
+            time.sleep(0.001)
+
+        # Reader threads put "ir" events in FIFO order, so enqueue times can be matched on apply
+        self.enqueued = collections.deque()
+        self.applied = []     # Enqueue times of events applied since the last frame was drawn
+        self.latencies = []   # Enqueue -> drawn, seconds
+        self.count = 0
+        self.first_apply = None
+        self.last_apply = None
+        self._lock = threading.Lock()
+
+        post_ui_event = self.app.post_ui_event
+        apply_ir_event = self.app.apply_ir_event
+
+        def traced_post(kind, *args):
+            if kind != "ir":
+                return post_ui_event(kind, *args)
+            with self._lock:
+                self.enqueued.append(time.perf_counter())
+                post_ui_event(kind, *args)
+
+        def traced_apply(*args):
+            apply_ir_event(*args)
+            now = time.perf_counter()
+            self.applied.append(self.enqueued.popleft())
+            self.count += 1
+            self.first_apply = self.first_apply or now
+            self.last_apply = now
+
+        self.app.post_ui_event = traced_post
+        self.app.apply_ir_event = traced_apply
+        self.test_mode = test_mode
+
+    def run(self, expected, timeout_s=120):
+        """Listen until `expected` events were applied (or the replay ran dry)"""
+        if self.test_mode:
+            self.app.start_test_mode()
+        else:
+            self.app.start_listening()
+        start = time.perf_counter()
+        idle_since = None
+        while self.count < expected and time.perf_counter() - start < timeout_s:
+            self.root.update()
+            now = time.perf_counter()
+            self.latencies.extend(now - t for t in self.applied)
+            self.applied.clear()
+
+            replay_done = all(getattr(lane.device, 'finished', True) for lane in self.app.lanes.values())
+            if replay_done and self.app.ui_queue.empty():
+                idle_since = idle_since or now
+                if now - idle_since > 1.0:
+                    break  # Everything that got through the debounce has been applied
+            else:
+                idle_since = None
+        self.elapsed = time.perf_counter() - start
+
+    def close(self):
+        self.app.on_close()
+
+
+def tk_unavailable():
+    """Reason the GUI benchmarks cannot run here, or None"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.destroy()
+    except Exception as e:
+        return f"Tk not available: {e}"
+    return None
+
+
+def bench_gui(workdir, events=5_000, devices=4, test_mode=True):
+    """Events/s through the whole pipeline and enqueue -> drawn latency percentiles"""
+    path = os.path.join(workdir, "gui.vcap")
+    registry = default_registry()
+    profile = next(iter(registry)).name
+    write_synthetic_capture(path, events, registry_codes(profile), devices=devices)
+
+    tracer = Tracer()
+    harness = GuiHarness(path, test_mode=test_mode, tracer=tracer)
+    try:
+        harness.run(events * devices)
+    finally:
+        harness.close()
+
+    latencies_ms = [t * 1000 for t in harness.latencies]
+    busy = (harness.last_apply - harness.first_apply) if harness.count > 1 else None
+    stats = harness.app.ui_stats
+    return {
+        'events': events * devices,
+        'devices': devices,
+        'test_mode': test_mode,
+        'applied_ok': harness.count == events * devices,
+        'events_per_s': harness.count / busy if busy else None,
+        'latency_p50_ms': percentile(latencies_ms, 0.50),
+        'latency_p95_ms': percentile(latencies_ms, 0.95),
+        'latency_p99_ms': percentile(latencies_ms, 0.99),
+        'latency_max_ms': max(latencies_ms) if latencies_ms else None,
+        'frames': stats['frames'],
+        'max_batch': stats['max_batch'],
+        'max_queue_depth': stats['max_queue_depth'],
+        # Where the time goes, per pipeline stage (see virc_trace.py)
+        **{f'stage_{stage}_p95_ms': stage_stats['p95_ms'] for stage, stage_stats in tracer.summary().items()},
+    }
+
+
+def bench_debounce(workdir):
+    """Held buttons (bursts of repeats) must count once, distinct or separate presses every time"""
+    registry = default_registry()
+    profile = next(iter(registry)).name
+    codes = registry_codes(profile)
+    cases = {
+        # name: (presses, codes, burst, burst gap ms, gap ms, expected events)
+        'held_button': (200, codes, 5, 20, 400, 200),
+        'fast_distinct': (200, codes, 1, 0, 30, 200),
+        'same_code_slow': (50, codes[:1], 1, 0, 350, 50),
+        'double_press': (50, codes[:1], 1, 0, 200, 50),    # Same button, released 200 ms between presses
+        'long_hold': (50, codes[:1], 1, 0, 110, 1),        # A code resent every 110 ms for 5.5 s is one press
+    }
+    metrics = {}
+    all_ok = True
+    for name, (presses, case_codes, burst, burst_gap, gap, expected) in cases.items():
+        path = os.path.join(workdir, f"debounce_{name}.vcap")
+        write_synthetic_capture(path, presses, case_codes, burst=burst, burst_gap_ms=burst_gap, gap_ms=gap)
+        harness = GuiHarness(path)
+        try:
+            harness.run(expected + 1, timeout_s=30)  # +1: wait for the replay to end, extra events must show
+        finally:
+            harness.close()
+        metrics[f'{name}_events'] = harness.count
+        metrics[f'{name}_expected'] = expected
+        metrics[f'{name}_suppressed'] = sum(lane.debouncer.suppressed for lane in harness.app.lanes.values())
+        all_ok = all_ok and harness.count == expected
+    metrics['debounce_ok'] = all_ok
+    return metrics
+
+
+def bench_memory(workdir, events=10_000):
+    """Traced Python memory kept by the GUI per 10k applied events"""
+    path = os.path.join(workdir, "memory.vcap")
+    write_synthetic_capture(path, events, registry_codes())
+    tracemalloc.start()
+    try:
+        harness = GuiHarness(path)
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            harness.run(events)
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            harness.close()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'events': harness.count,
+        'growth_per_10k_bytes': (after - before) * 10_000 / max(harness.count, 1),
+        'peak_bytes': peak,
+    }
+
+
+def startup_probe():
+    """Child process of bench_startup: import, build, first-draw and device timings as JSON"""
+    start = time.perf_counter()
+    import tkinter as tk
+    import complete_gui
+    from virc_emulator import emulator_transport
+    imported = time.perf_counter()
+    root = tk.Tk()
+    root.withdraw()
+    app = complete_gui.VIRCCompleteGUI(root, transport=emulator_transport(1))
+    built = time.perf_counter()
+    root.update()
+    interactive = time.perf_counter()
+    while "device info" not in app.startup.milestones and time.perf_counter() - interactive < 10:
+        root.update()
+        time.sleep(0.001)
+    milestones = app.startup.milestones
+    app.on_close()
+    print(json.dumps({
+        'import_s': imported - start,
+        'construct_s': built - imported,
+        'first_frame_s': interactive - built,
+        'time_to_interactive_s': interactive - start,
+        # Background discovery once the window is up, from the start of the complete_gui import
+        # (device info includes the 500 ms the station waits before querying a new receiver)
+        **{f'{name.replace(" ", "_")}_s': ms / 1000 for name, ms in milestones.items()},
+        **{f'step_{name.lower()}_ms': ms for name, ms in app.startup.steps},
+    }))
+
+
+def bench_startup(runs=3):
+    """Startup of complete_gui.py in a fresh interpreter (best of `runs`)"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-probe"],
+                                cwd=SCRIPT_DIR, capture_output=True, text=True, timeout=60)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "startup probe failed")
+        metrics = json.loads(result.stdout.strip().splitlines()[-1])
+        metrics['process_s'] = wall
+        if best is None or metrics['process_s'] < best['process_s']:
+            best = metrics
+    return best
+
+
+def bench_cli(workdir, events=20_000):
+    """main.py replaying a capture at max speed, process start to exit"""
+    path = os.path.join(workdir, "cli.vcap")
+    write_synthetic_capture(path, events, registry_codes())
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "main.py", "--replay", path, "--speed", "max"],
+                            cwd=SCRIPT_DIR, capture_output=True, text=True, timeout=300)
+    elapsed = time.perf_counter() - start
+    received = result.stdout.count("Received IR signal")
+    return {
+        'events': events,
+        'printed_ok': result.returncode == 0 and received == events,
+        'total_s': elapsed,
+        'events_per_s': received / elapsed,
+    }
+
+
+def bench_reconnect(cycles=20, outage_s=0.2):
+    """Pull and re-plug an emulated receiver: re-plug -> reopened by the hotplug monitor"""
+    transport = emulator_transport(1)
+    receiver = transport.receivers[0]
+    reopened = threading.Event()
+
+    def reopen(key, device_info):
+        transport.open(device_info['path']).close()
+        reopened.set()
+        return True
+
+    monitor = HotplugMonitor(transport, reopen)
+    monitor.start()
+    reattach_ms = []
+    try:
+        for _ in range(cycles):
+            reopened.clear()
+            receiver.unplug()
+            monitor.lost(receiver.serial)  # What the reader does when its read fails
+            time.sleep(outage_s)
+            plugged = time.perf_counter()
+            receiver.plug()
+            if not reopened.wait(5):
+                break
+            reattach_ms.append((time.perf_counter() - plugged) * 1000)
+    finally:
+        monitor.stop()
+    stats = monitor.stats.summary()
+    return {
+        'cycles': cycles,
+        'outage_ms': outage_s * 1000,
+        'recovered_ok': len(reattach_ms) == cycles,
+        'reattach_p50_ms': percentile(reattach_ms, 0.50),
+        'reattach_max_ms': max(reattach_ms) if reattach_ms else None,
+        'recovery_p50_ms': stats['recovery_p50_ms'],  # Includes the outage
+        'scans': monitor.registry.scans,
+    }
+
+
+def run_benchmarks(selected):
+    results = {
+        'meta': {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': NUMPY_AVAILABLE,
+        },
+        'benchmarks': {},
+    }
+    no_tk = tk_unavailable() if {"gui", "debounce", "memory", "startup"} & set(selected) else None
+    with tempfile.TemporaryDirectory(prefix="virc_bench_") as workdir:
+        for name in selected:
+            if name in ("gui", "debounce", "memory", "startup") and no_tk:
+                results['benchmarks'][name] = {'skipped': no_tk}
+                continue
+            print(f"Running {name}...", file=sys.stderr)
+            try:
+                if name == "decode":
+                    metrics = bench_decode()
+                elif name == "protocol":
+                    metrics = bench_protocol()
+                elif name == "timing":
+                    metrics = bench_timing() if NUMPY_AVAILABLE else {'skipped': "NumPy not installed"}
+                elif name == "qc":
+                    metrics = bench_qc()
+                elif name == "debounce":
+                    metrics = bench_debounce(workdir)
+                elif name == "gui":
+                    metrics = bench_gui(workdir)
+                elif name == "memory":
+                    metrics = bench_memory(workdir)
+                elif name == "startup":
+                    metrics = bench_startup()
+                elif name == "reconnect":
+                    metrics = bench_reconnect()
+                else:
+                    metrics = bench_cli(workdir)
+            except Exception as e:
+                metrics = {'error': f"{type(e).__name__}: {e}"}
+            results['benchmarks'][name] = metrics
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Human-readable list of metrics that got worse than the baseline"""
+    regressions = []
+    for bench, metrics in results['benchmarks'].items():
+        old_metrics = baseline.get('benchmarks', {}).get(bench, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if old is None or value is None or isinstance(value, str):
+                continue
+            if metric.endswith("_ok"):
+                worse = bool(old) and not value
+            elif metric.endswith("_per_s"):
+                worse = value < old * (1 - tolerance)
+            elif metric.endswith(("_ms", "_s", "_bytes")):
+                worse = value > old * (1 + tolerance)
+            else:
+                continue
+            if worse:
+                regressions.append(f"{bench}.{metric}: {old:.6g} -> {value:.6g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VIRC QC station benchmarks")
+    parser.add_argument("--only", help=f"comma separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("-o", "--output", metavar="FILE", help="also write the JSON results to a file")
+    parser.add_argument("--compare", metavar="FILE", help="baseline results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown before a metric counts as a regression (default: 0.2)")
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_probe:
+        startup_probe()
+        return
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(selected)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
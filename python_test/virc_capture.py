@@ -0,0 +1,321 @@
+"""
+Binary capture and replay of raw VIRC HID reports.
+
+A capture file (.vcap) is append-only:
+
+    file header   b"VIRCCAP1"
+    record        <length u32> <kind u8> <device id u16> <timestamp ns i64> <payload>
+
+`length` is the payload length. Kind 1 records name a device id (payload =
+UTF-8 serial or HID path) and are written the first time a device shows up;
+kind 0 records hold one raw report exactly as read from the device, stamped
+with time.monotonic_ns(). A truncated last record (station killed while
+writing) is ignored by the reader.
+
+CaptureReader memory-maps a file and indexes the record offsets once, so
+random access and bulk decoding need no further parsing. ReplayDevice looks
+like an opened hid.device (read/write/close), so a capture can be fed to the
+same listener code at recorded speed, N times faster, or as fast as possible;
+ReplayTransport lists the recorded receivers like virc_transport.HidTransport.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import NamedTuple
+
+from virc_protocol import REPORT_SIZE, decode_reports, load_numpy
+
+MAGIC = b"VIRCCAP1"
+RECORD_HEADER = struct.Struct("<IBHq")
+
+KIND_REPORT = 0
+KIND_DEVICE = 1
+
+FLUSH_INTERVAL_NS = 1_000_000_000  # Flush the write buffer at least once a second
+GATHER_CHUNK = 16384  # Records per gather in reports_buffer(): bounds its index arrays to ~8 MB
+
+
+class CaptureRecord(NamedTuple):
+    timestamp_ns: int
+    device_id: int
+    report: memoryview
+
+
+class CaptureWriter:
+    """Appends raw reports of one or more devices to a capture file (thread-safe)"""
+
+    def __init__(self, path):
+        self.path = path
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab", buffering=64 * 1024)
+        if new_file:
+            self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._last_flush = time.monotonic_ns()
+        self.records = 0
+
+    def device_id(self, name):
+        """Id for a device name (serial or path), recorded in the file on first use"""
+        with self._lock:
+            device_id = self._devices.get(name)
+            if device_id is None:
+                device_id = len(self._devices)
+                self._devices[name] = device_id
+                payload = name.encode("utf-8")
+                self._file.write(RECORD_HEADER.pack(len(payload), KIND_DEVICE, device_id, time.monotonic_ns()))
+                self._file.write(payload)
+            return device_id
+
+    def write(self, device_id, report, timestamp_ns=None):
+        """Append one raw report (list of ints, bytes or memoryview)"""
+        now = time.monotonic_ns()
+        payload = bytes(report)
+        header = RECORD_HEADER.pack(len(payload), KIND_REPORT, device_id,
+                                    now if timestamp_ns is None else timestamp_ns)
+        with self._lock:
+            self._file.write(header)
+            self._file.write(payload)
+            self.records += 1
+            if now - self._last_flush > FLUSH_INTERVAL_NS:
+                self._file.flush()
+                self._last_flush = now
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class CaptureReader:
+    """Memory-mapped, indexed view of a capture file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(MAGIC):
+            raise ValueError(f"Not a VIRC capture file: {path}")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a VIRC capture file: {path}")
+
+        self.devices = {}                  # device id -> name
+        self.offsets = array("Q")          # payload offset of every report record
+        self.lengths = array("I")
+        self.timestamps = array("q")
+        self.device_ids = array("H")
+        self._index()
+
+    def _index(self):
+        mm = self._mmap
+        end = len(mm)
+        pos = len(MAGIC)
+        header_size = RECORD_HEADER.size
+        unpack = RECORD_HEADER.unpack_from
+        offsets, lengths = self.offsets, self.lengths
+        timestamps, device_ids = self.timestamps, self.device_ids
+        while pos + header_size <= end:
+            length, kind, device_id, timestamp_ns = unpack(mm, pos)
+            payload = pos + header_size
+            if payload + length > end:
+                break  # Truncated tail
+            if kind == KIND_REPORT:
+                offsets.append(payload)
+                lengths.append(length)
+                timestamps.append(timestamp_ns)
+                device_ids.append(device_id)
+            elif kind == KIND_DEVICE:
+                self.devices[device_id] = bytes(mm[payload:payload + length]).decode("utf-8", "replace")
+            pos = payload + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        offset = self.offsets[index]
+        report = memoryview(self._mmap)[offset:offset + self.lengths[index]]
+        return CaptureRecord(self.timestamps[index], self.device_ids[index], report)
+
+    def __iter__(self):
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+    def indices_for(self, device_id):
+        """Record indices of one device, in capture order"""
+        return array("Q", (i for i, d in enumerate(self.device_ids) if d == device_id))
+
+    def reports_buffer(self, report_size=REPORT_SIZE):
+        """All report payloads packed into one N x report_size buffer (for bulk decoding)
+
+        Only the result takes N x report_size bytes: reports of one size at a
+        fixed stride (the usual capture) are copied through a strided view of
+        the map, anything else is gathered GATHER_CHUNK records at a time.
+        """
+        np = load_numpy()
+        count = len(self.offsets)
+        packed = np.zeros((count, report_size), dtype=np.uint8)
+        if not count:
+            return packed.reshape(-1)
+        data = np.frombuffer(self._mmap, dtype=np.uint8)
+        offsets = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        strides = np.diff(offsets)
+        if lengths.min() >= report_size and (count == 1 or (strides == strides[0]).all()):
+            stride = int(strides[0]) if count > 1 else report_size
+            packed[:] = np.lib.stride_tricks.as_strided(data[offsets[0]:], shape=(count, report_size),
+                                                        strides=(stride, 1), writeable=False)
+            return packed.reshape(-1)
+        columns = np.arange(report_size)
+        for start in range(0, count, GATHER_CHUNK):
+            chunk_offsets = offsets[start:start + GATHER_CHUNK]
+            gathered = data[np.minimum(chunk_offsets[:, None] + columns, len(data) - 1)]
+            gathered[columns[None, :] >= lengths[start:start + GATHER_CHUNK, None]] = 0  # Short reads are zero padded
+            packed[start:start + len(chunk_offsets)] = gathered
+        return packed.reshape(-1)
+
+    def decode(self):
+        """(report IDs, codes, timestamps ns, device ids) of every record as NumPy arrays"""
+        np = load_numpy()
+        report_ids, codes = decode_reports(self.reports_buffer())
+        return (report_ids, codes, np.frombuffer(self.timestamps, dtype=np.int64),
+                np.frombuffer(self.device_ids, dtype=np.uint16))
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except (BufferError, ValueError):
+            pass  # Records are still referenced; the map is released with them
+        self._file.close()
+
+
+class ReplayClock:
+    """Shared pacing for all devices of one replay (speed None = as fast as possible)"""
+
+    def __init__(self, first_timestamp_ns, speed=1.0):
+        self.first_timestamp_ns = first_timestamp_ns
+        self.speed = speed
+        self.wall_start = time.time()  # Recorded timestamps are mapped onto this wall time
+        self._start_ns = None
+        self._lock = threading.Lock()
+
+    def wait_for(self, timestamp_ns, timeout_s):
+        """Sleep until a record is due; False if it is not due within timeout_s"""
+        if not self.speed:
+            return True
+        with self._lock:
+            if self._start_ns is None:
+                self._start_ns = time.monotonic_ns()
+        due_ns = self._start_ns + (timestamp_ns - self.first_timestamp_ns) / self.speed
+        delay = (due_ns - time.monotonic_ns()) / 1e9
+        if delay > timeout_s:
+            time.sleep(timeout_s)
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+class ReplayDevice:
+    """Stand-in for an opened hid.device that plays back one device of a capture"""
+
+    def __init__(self, reader, device_id, clock):
+        self.reader = reader
+        self.device_id = device_id
+        self.clock = clock
+        self._indices = reader.indices_for(device_id)
+        self._pos = 0
+        self.finished = not self._indices
+        self.last_timestamp_ns = clock.first_timestamp_ns
+
+    def read(self, size, timeout_ms=0):
+        """Next report as a list of ints, like hid.device.read; [] on timeout or at the end"""
+        if self._pos >= len(self._indices):
+            self.finished = True
+            if timeout_ms:
+                time.sleep(timeout_ms / 1000)
+            return []
+        index = self._indices[self._pos]
+        if not self.clock.wait_for(self.reader.timestamps[index], (timeout_ms or 1000) / 1000):
+            return []
+        self._pos += 1
+        self.last_timestamp_ns = self.reader.timestamps[index]
+        offset = self.reader.offsets[index]
+        length = min(size, self.reader.lengths[index])
+        return list(self.reader._mmap[offset:offset + length])
+
+    def event_time(self):
+        """Recorded time of the last report as time.time(), for the log"""
+        return self.clock.wall_start + (self.last_timestamp_ns - self.clock.first_timestamp_ns) / 1e9
+
+    def event_time_ns(self):
+        """Recorded time.monotonic_ns() of the last report, so debouncing sees the original gaps"""
+        return self.last_timestamp_ns
+
+    def write(self, data):
+        return len(data)  # Queries are not answered during replay
+
+    def close(self):
+        self._pos = len(self._indices)
+
+
+def open_replay(path, speed=1.0):
+    """(reader, {device name: ReplayDevice}) for every device in a capture file"""
+    reader = CaptureReader(path)
+    first = reader.timestamps[0] if len(reader) else 0
+    clock = ReplayClock(first, speed)
+    devices = {}
+    for device_id, name in sorted(reader.devices.items()):
+        devices[name] = ReplayDevice(reader, device_id, clock)
+    return reader, devices
+
+
+class ReplayTransport:
+    """Transport over the receivers recorded in a capture file (see virc_transport.py)"""
+
+    answers_queries = False  # A capture only holds what the receivers sent
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.reader, self.devices = open_replay(path, speed)
+        speed_text = f"{speed:g}x" if speed else "max speed"
+        self.description = f"Replay of {len(self.reader)} reports from {path} at {speed_text}"
+
+    def enumerate(self, vendor_id=0, product_id=0):
+        """Every recorded receiver (the vendor/product filter does not apply to a capture)"""
+        return [replay_device_info(self.path, name) for name in self.devices]
+
+    def open(self, path):
+        for name, device in self.devices.items():
+            if replay_device_info(self.path, name)['path'] == path:
+                return device
+        raise OSError("open failed")
+
+
+def replay_device_info(path, name):
+    """hid.enumerate()-style entry for one replayed device"""
+    return {
+        'path': f"replay:{name}".encode(),
+        'serial_number': name,
+        'manufacturer_string': "Replay",
+        'product_string': os.path.basename(path),
+        'vendor_id': 0x2e8a,  # Recorded from VIRC receivers, listed as such
+        'product_id': 0x000a,
+    }
+
+
+def parse_speed(text):
+    """'1', '4x', 'max' -> replay speed (None = as fast as possible)"""
+    text = text.strip().lower()
+    if text in ("max", "0", ""):
+        return None
+    return float(text[:-1] if text.endswith("x") else text)
@@ -0,0 +1,232 @@
+"""
+Central QC results collector: a small HTTP service every station on the LAN uploads to.
+
+    python virc_collector.py                              # Port 8750, collector.db in the data directory
+    python virc_collector.py --port 9000 --db /srv/virc/results.db
+
+    python complete_gui.py --collector http://qc-server:8750
+    python virc_station.py --collector http://qc-server:8750
+
+    POST /api/v1/sessions   batch of sessions from a station (virc_upload.py),
+                            gzip JSON; answers {"accepted": n, "duplicates": n}
+    GET  /api/v1/health     {"status": "ok", "sessions": n, "stations": n}
+
+The database has the same schema as a station's history, so virc_history.py
+and the statistics dashboard work on it, for every station at once. A
+`received` table holds the uid of every session stored: a session sent
+again (by a station that did not get the reply) is acknowledged as a
+duplicate and stored only once.
+
+Every request runs on its own thread (ThreadingHTTPServer) and hands its
+sessions to a single writer thread, which commits whatever all requests have
+pending in one transaction and then answers them. Dozens of stations
+uploading at the same time cost one commit per round, not one per request,
+and a station only gets its reply once its sessions are on disk.
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from virc_history import DATA_DIR, connect, insert_sessions
+from virc_upload import UPLOAD_PATH, decode_batch
+
+DEFAULT_DB = os.path.join(DATA_DIR, "collector.db")  # Same directory as the station history
+DEFAULT_PORT = 8750
+HEALTH_PATH = "/api/v1/health"
+MAX_BODY_BYTES = 16 * 1024 * 1024   # Compressed request body
+INGEST_TIMEOUT_S = 30.0
+
+RECEIVED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS received (
+    uid         TEXT PRIMARY KEY,
+    session_id  INTEGER NOT NULL,
+    received    REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class _Ingest:
+    """One request's sessions waiting for the writer"""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.done = threading.Event()
+        self.accepted = 0
+        self.duplicates = 0
+        self.error = None
+
+
+class IngestWriter:
+    """Single writer thread with group commit; submit() blocks until the sessions are on disk"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.sessions = 0
+        self.duplicates = 0
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._db = connect(path)
+        self._db.executescript(RECEIVED_SCHEMA)
+        self._thread = threading.Thread(target=self._run, name="VIRC ingest", daemon=True)
+        self._thread.start()
+
+    def submit(self, sessions, timeout=INGEST_TIMEOUT_S):
+        """Store [(uid, SessionRecord)] (any thread); (accepted, duplicates) once committed"""
+        ingest = _Ingest(sessions)
+        self._queue.put(ingest)
+        if not ingest.done.wait(timeout):
+            raise TimeoutError("database write timed out")
+        if ingest.error:
+            raise ingest.error
+        return ingest.accepted, ingest.duplicates
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(5.0)
+
+    def _run(self):
+        closing = False
+        while not closing:
+            pending = [self._queue.get()]
+            try:
+                while True:
+                    pending.append(self._queue.get_nowait())  # Everything that came in meanwhile shares the commit
+            except queue.Empty:
+                pass
+            closing = None in pending
+            self._write([ingest for ingest in pending if ingest is not None])
+        self._db.close()
+
+    def _write(self, pending):
+        if not pending:
+            return
+        now = time.time()
+        try:
+            with self._db:
+                for ingest in pending:
+                    ingest.accepted = ingest.duplicates = 0
+                    for uid, record in ingest.sessions:
+                        if self._db.execute("SELECT 1 FROM received WHERE uid = ?", (uid,)).fetchone():
+                            ingest.duplicates += 1
+                            continue
+                        session_id, = insert_sessions(self._db, [record])
+                        self._db.execute("INSERT INTO received (uid, session_id, received) VALUES (?, ?, ?)",
+                                         (uid, session_id, now))
+                        ingest.accepted += 1
+            self.commits += 1
+            for ingest in pending:
+                self.sessions += ingest.accepted
+                self.duplicates += ingest.duplicates
+        except sqlite3.Error as e:
+            for ingest in pending:
+                ingest.error = e
+        for ingest in pending:
+            ingest.done.set()
+
+    def health(self):
+        """Totals for the health endpoint (own short-lived connection, WAL reads do not block the writer)"""
+        db = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            sessions, stations = db.execute("SELECT COUNT(*), COUNT(DISTINCT station) FROM sessions").fetchone()
+        finally:
+            db.close()
+        return {'status': "ok", 'sessions': sessions, 'stations': stations}
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    server_version = "VIRCCollector/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != UPLOAD_PATH:
+            self._reply(404, {'error': "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._reply(411, {'error': "Content-Length required"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._reply(413, {'error': f"batch larger than {MAX_BODY_BYTES} bytes"})
+            return
+        body = self.rfile.read(length)
+        try:
+            sessions = decode_batch(body, self.headers.get("Content-Encoding"))
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+        try:
+            accepted, duplicates = self.server.writer.submit(sessions)
+        except (sqlite3.Error, TimeoutError) as e:
+            self._reply(503, {'error': f"cannot store the batch: {e}"})
+            return
+        stations = sorted({record.station for _, record in sessions})
+        self.log_message("%s: %d session(s) stored, %d duplicate(s)", ", ".join(stations) or "-", accepted, duplicates)
+        self._reply(200, {'accepted': accepted, 'duplicates': duplicates})
+
+    def do_GET(self):
+        if self.path != HEALTH_PATH:
+            self._reply(404, {'error': "not found"})
+            return
+        try:
+            self._reply(200, self.server.writer.health())
+        except sqlite3.Error as e:
+            self._reply(503, {'status': "error", 'error': str(e)})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class CollectorServer(ThreadingHTTPServer):
+    """HTTP server plus the ingest writer; one thread per connection"""
+
+    daemon_threads = True
+    request_queue_size = 128  # Stations reconnecting together after a collector restart
+
+    def __init__(self, address, db_path=DEFAULT_DB, quiet=False):
+        self.writer = IngestWriter(db_path)
+        self.quiet = quiet
+        super().__init__(address, CollectorHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VIRC central QC results collector (HTTP)")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on (default: all interfaces)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"results database (default: {DEFAULT_DB})")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args()
+
+    server = CollectorServer((args.host, args.port), args.db, quiet=args.quiet)
+    print(f"VIRC collector on http://{args.host}:{args.port}{UPLOAD_PATH}, storing to {args.db}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting...")
+    finally:
+        server.server_close()
+        writer = server.writer
+        print(f"{writer.sessions} session(s) stored, {writer.duplicates} duplicate(s), {writer.commits} commit(s)")
+
+
+if __name__ == "__main__":
+    main()
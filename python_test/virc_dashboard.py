@@ -0,0 +1,256 @@
+"""
+QC statistics dashboard window.
+
+Shows pass rate, units per hour and mean checklist time per shift, the
+worst failing buttons and the totals per remote type. All figures come from
+the history's summary tables (virc_history.dashboard_stats), so opening or
+refreshing the window costs the same with ten sessions or a year of them.
+The station calls refresh() after every history commit, and the window
+refreshes itself every REFRESH_MS for the units-per-hour of the running
+shift.
+
+ExportDialog exports a range of the history (virc_export.py) on a
+background thread and polls its progress.
+"""
+import os
+import time
+import tkinter as tk
+from datetime import datetime, timedelta
+from tkinter import filedialog, ttk
+
+from virc_export import FORMATS, ExportFilter, ExportJob
+from virc_history import FAIL, PASS, connect, dashboard_stats
+
+REFRESH_MS = 30_000
+EXPORT_POLL_MS = 100
+ALL = "All"
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_rate(rate):
+    return "-" if rate is None else f"{rate:.1%}"
+
+
+class StatsDashboard:
+    """Toplevel window over a history database (Tk thread only)"""
+
+    def __init__(self, root, history_path, on_close=None):
+        self.history_path = history_path
+        self.on_close = on_close
+        self.db = connect(history_path)  # Own read connection; WAL lets it read while the writer commits
+        self.refresh_ms = 0.0            # Duration of the last refresh
+        self._after = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("VIRC QC Statistics")
+        self.window.geometry("760x560")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        header = ttk.Frame(self.window, padding=(10, 8))
+        header.pack(fill=tk.X)
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(header, textvariable=self.summary_var, font=("Arial", 10, "bold")).pack(side=tk.LEFT)
+        ttk.Button(header, text="🔄 Refresh", command=self.refresh).pack(side=tk.RIGHT)
+        ttk.Button(header, text="📤 Export...", command=lambda: ExportDialog(self.window, history_path)).pack(
+            side=tk.RIGHT, padx=(0, 6))
+
+        self.shift_tree = self._table("🕒 Shifts", (
+            ("shift", "Shift", 160), ("sessions", "Units", 70), ("pass_rate", "Pass Rate", 90),
+            ("units_per_hour", "Units/Hour", 90), ("mean_s", "Mean Checklist Time", 140)), height=6)
+        self.button_tree = self._table("❌ Button Failure Rate", (
+            ("button", "Button", 170), ("remote", "Remote", 170), ("failed", "Failed / Tested", 110),
+            ("fail_rate", "Failure Rate", 90)), height=6)
+        self.remote_tree = self._table("🎮 Remote Types", (
+            ("remote", "Remote", 220), ("sessions", "Units", 70), ("pass_rate", "Pass Rate", 90),
+            ("mean_s", "Mean Checklist Time", 140)), height=4)
+
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.window, textvariable=self.status_var, font=("Arial", 8), foreground="gray").pack(
+            side=tk.BOTTOM, anchor=tk.W, padx=10, pady=(0, 6))
+        self.refresh()
+
+    def _table(self, title, columns, height):
+        frame = ttk.LabelFrame(self.window, text=title, padding=5)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=4)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in columns], show="headings", height=height)
+        for key, heading, width in columns:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor=tk.W if key in ("shift", "button", "remote") else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True)
+        return tree
+
+    def refresh(self):
+        """Re-read the summary tables and redraw"""
+        if self._after:
+            self.window.after_cancel(self._after)
+        start = time.perf_counter()
+        stats = dashboard_stats(self.db)
+        self.refresh_ms = (time.perf_counter() - start) * 1000
+
+        self.summary_var.set(f"{stats['sessions']} units tested | pass rate {format_rate(stats['pass_rate'])} | "
+                             f"{stats['units_per_hour']:.1f} units/hour (last 8 h) | "
+                             f"mean checklist {format_seconds(stats['mean_s'])}")
+        self._fill(self.shift_tree, [
+            (f"{'▶ ' if s['current'] else ''}{s['day']} {s['shift']}", s['sessions'], format_rate(s['pass_rate']),
+             f"{s['units_per_hour']:.1f}", format_seconds(s['mean_s']))
+            for s in stats['shifts']])
+        self._fill(self.button_tree, [
+            (b['button'], b['remote'], f"{b['failed']} / {b['tested']}", format_rate(b['fail_rate']))
+            for b in stats['buttons']])
+        self._fill(self.remote_tree, [
+            (r['remote'], r['sessions'], format_rate(r['pass_rate']), format_seconds(r['mean_s']))
+            for r in stats['remotes']])
+        self.status_var.set(f"{self.history_path} | updated {time.strftime('%H:%M:%S')} in {self.refresh_ms:.1f} ms")
+        self._after = self.window.after(REFRESH_MS, self.refresh)
+
+    def _fill(self, tree, rows):
+        tree.delete(*tree.get_children())
+        for row in rows:
+            tree.insert("", tk.END, values=row)
+
+    def lift(self):
+        self.window.deiconify()
+        self.window.lift()
+
+    def close(self):
+        if self._after:
+            self.window.after_cancel(self._after)
+            self._after = None
+        self.db.close()
+        self.window.destroy()
+        if self.on_close:
+            self.on_close()
+
+
+class ExportDialog:
+    """Export a date / remote / station / verdict range (or one session) of the history (Tk thread only)"""
+
+    def __init__(self, root, history_path):
+        self.history_path = history_path
+        self.job = None
+        self._poll = None
+        db = connect(history_path)
+        try:
+            remotes = [row[0] for row in db.execute("SELECT remote FROM remote_stats ORDER BY remote")]
+        finally:
+            db.close()
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Export QC History")
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        form = ttk.Frame(self.window, padding=10)
+        form.pack(fill=tk.BOTH, expand=True)
+
+        self.since_var = tk.StringVar()
+        self.until_var = tk.StringVar()
+        self.remote_var = tk.StringVar(value=ALL)
+        self.station_var = tk.StringVar()
+        self.verdict_var = tk.StringVar(value=ALL)
+        self.session_var = tk.StringVar()
+        self.format_var = tk.StringVar(value=FORMATS['csv'][1])
+        fields = (
+            ("From (YYYY-MM-DD)", ttk.Entry(form, textvariable=self.since_var, width=28)),
+            ("To (YYYY-MM-DD, included)", ttk.Entry(form, textvariable=self.until_var, width=28)),
+            ("Remote", ttk.Combobox(form, textvariable=self.remote_var, values=[ALL] + remotes, state="readonly",
+                                    width=26)),
+            ("Station (empty: all)", ttk.Entry(form, textvariable=self.station_var, width=28)),
+            ("Verdict", ttk.Combobox(form, textvariable=self.verdict_var, values=(ALL, PASS, FAIL), state="readonly",
+                                     width=26)),
+            ("Session # (just one, see the log)", ttk.Entry(form, textvariable=self.session_var, width=28)),
+            ("Format", ttk.Combobox(form, textvariable=self.format_var, values=[name for _, name in FORMATS.values()],
+                                    state="readonly", width=26)),
+        )
+        for row, (label, widget) in enumerate(fields):
+            ttk.Label(form, text=label).grid(row=row, column=0, sticky=tk.W, pady=2, padx=(0, 8))
+            widget.grid(row=row, column=1, sticky=tk.W, pady=2)
+
+        self.progress = ttk.Progressbar(form, length=300, mode="determinate")
+        self.progress.grid(row=len(fields), column=0, columnspan=2, sticky=tk.EW, pady=(10, 2))
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(form, textvariable=self.status_var, font=("Arial", 8), foreground="gray", wraplength=320).grid(
+            row=len(fields) + 1, column=0, columnspan=2, sticky=tk.W)
+        buttons = ttk.Frame(form)
+        buttons.grid(row=len(fields) + 2, column=0, columnspan=2, sticky=tk.E, pady=(8, 0))
+        self.cancel_btn = ttk.Button(buttons, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT)
+        self.export_btn = ttk.Button(buttons, text="📤 Export...", command=self.export)
+        self.export_btn.pack(side=tk.RIGHT, padx=(0, 6))
+
+    def filters(self):
+        """ExportFilter of the form; ValueError with a readable message if a field is invalid"""
+        def date(text, name):
+            try:
+                return datetime.strptime(text.strip(), "%Y-%m-%d") if text.strip() else None
+            except ValueError:
+                raise ValueError(f"{name}: expected YYYY-MM-DD") from None
+
+        since = date(self.since_var.get(), "From")
+        until = date(self.until_var.get(), "To")
+        session = self.session_var.get().strip()
+        if session and not session.isdigit():
+            raise ValueError("Session ID: expected a number")
+        return ExportFilter(since=since.timestamp() if since else None,
+                            until=(until + timedelta(days=1)).timestamp() if until else None,
+                            remote=None if self.remote_var.get() == ALL else self.remote_var.get(),
+                            station=self.station_var.get().strip() or None,
+                            verdict=None if self.verdict_var.get() == ALL else self.verdict_var.get(),
+                            session_id=int(session) if session else None)
+
+    def export(self):
+        try:
+            filters = self.filters()
+        except ValueError as e:
+            self.status_var.set(f"❌ {e}")
+            return
+        fmt = next(key for key, (_, name) in FORMATS.items() if name == self.format_var.get())
+        extension, name = FORMATS[fmt]
+        path = filedialog.asksaveasfilename(
+            parent=self.window, title="Export QC History", defaultextension=extension,
+            initialfile=f"QC_History_{datetime.now():%Y%m%d_%H%M%S}{extension}",
+            filetypes=[(name, f"*{extension}"), ("All files", "*.*")])
+        if not path:
+            return
+        self.job = ExportJob(self.history_path, path, fmt, filters).start()
+        self.export_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.progress.config(value=0, maximum=1)
+        self.status_var.set("Counting sessions...")
+        self._poll = self.window.after(EXPORT_POLL_MS, self.poll)
+
+    def poll(self):
+        """Show the running job's progress; the job never touches Tk"""
+        self._poll = None
+        job = self.job
+        if job.total is not None:
+            self.progress.config(value=job.done, maximum=max(job.total, 1))
+            self.status_var.set(f"{job.done} / {job.total} sessions")
+        if not job.finished.is_set():
+            self._poll = self.window.after(EXPORT_POLL_MS, self.poll)
+            return
+        self.job = None
+        self.export_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+        if job.error:
+            self.status_var.set(f"❌ Export failed: {job.error}")
+        elif job.cancelled:
+            self.progress.config(value=0)
+            self.status_var.set("Export cancelled")
+        else:
+            self.status_var.set(f"✅ {job.done} session(s) exported to {os.path.basename(job.path)}")
+
+    def cancel(self):
+        if self.job:
+            self.job.cancel()
+
+    def close(self):
+        self.cancel()  # The job stops at its next chunk and removes its partial file
+        if self._poll:
+            self.window.after_cancel(self._poll)
+        self.window.destroy()
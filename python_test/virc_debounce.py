@@ -0,0 +1,89 @@
+"""
+Press / repeat / hold classification of IR reports.
+
+A remote sends its code again every ~110 ms while a button is held (and an
+IR reflection can decode twice), so one press reaches the host as a burst
+of identical reports. Each receiver has a Debouncer that keeps a small
+state per IR code, on time.monotonic_ns():
+
+    report, code not seen for >= repeat window   -> PRESS   (counts as a button press)
+    report within the repeat window of the last  -> REPEAT  (same press continuing, suppressed)
+    first REPEAT >= hold time after the PRESS    -> HOLD    (reported once per press, suppressed)
+    report the receiver flagged as a repeat      -> REPEAT / HOLD, never a PRESS (format 2)
+
+The window is measured from the code's previous report, not from the last
+accepted press, so a held button stays one press however long it is held,
+while two quick presses of the same button (a release gap longer than the
+repeat window) are two presses. A format 2 receiver flags the frames of a
+held button itself, so those continue the press even when they arrive late.
+Other codes and other receivers never
+affect each other. Every classification is counted.
+"""
+import time
+
+PRESS = "press"
+REPEAT = "repeat"
+HOLD = "hold"
+
+REPEAT_MS = 150   # NEC remotes resend a held code every ~108 ms
+HOLD_MS = 500
+MAX_CODES = 256   # Per receiver; codes idle for longer than the repeat window are dropped beyond this
+
+
+class Debouncer:
+    """Press / repeat / hold state per IR code of one receiver (used by its reader thread only)"""
+
+    def __init__(self, repeat_ms=REPEAT_MS, hold_ms=HOLD_MS, clock_ns=time.monotonic_ns):
+        self.repeat_ns = int(repeat_ms * 1_000_000)
+        self.hold_ns = int(hold_ms * 1_000_000)
+        self.clock_ns = clock_ns
+        self._codes = {}  # code -> [press ns, last report ns, hold reported]
+        self.presses = 0
+        self.repeats = 0
+        self.holds = 0
+        self._earlier = (0, 0)  # (reports, suppressed) before the last reset_counts()
+
+    @property
+    def suppressed(self):
+        """Reports that did not count as a press"""
+        return self.repeats + self.holds
+
+    def feed(self, code, now_ns=None, repeat=False):
+        """Classify one report of `code`: PRESS, REPEAT or HOLD (repeat: flagged by the receiver)"""
+        if now_ns is None:
+            now_ns = self.clock_ns()
+        state = self._codes.get(code)
+        gap = now_ns - state[1] if state else -1
+        # A negative gap only happens replaying captures of several sessions: start over.
+        # A flagged repeat frame continues its press however late it arrives.
+        if gap < 0 or (gap >= self.repeat_ns and not repeat):
+            if state is None and len(self._codes) >= MAX_CODES:
+                self._prune(now_ns)
+            self._codes[code] = [now_ns, now_ns, False]
+            if repeat:
+                self.repeats += 1  # The press frame itself was lost: the hold is timed from here
+                return REPEAT
+            self.presses += 1
+            return PRESS
+        state[1] = now_ns
+        if not state[2] and now_ns - state[0] >= self.hold_ns:
+            state[2] = True
+            self.holds += 1
+            return HOLD
+        self.repeats += 1
+        return REPEAT
+
+    def _prune(self, now_ns):
+        self._codes = {code: state for code, state in self._codes.items() if now_ns - state[1] < self.repeat_ns}
+
+    def stats(self):
+        return {'presses': self.presses, 'repeats': self.repeats, 'holds': self.holds, 'suppressed': self.suppressed}
+
+    def totals(self):
+        """(reports, suppressed) since the debouncer was created, reset_counts() included"""
+        reports, suppressed = self._earlier
+        return reports + self.presses + self.repeats + self.holds, suppressed + self.suppressed
+
+    def reset_counts(self):
+        self._earlier = self.totals()
+        self.presses = self.repeats = self.holds = 0
@@ -0,0 +1,361 @@
+"""
+In-process emulator of a VIRC receiver (virc_firmware/virc_firmware.ino).
+
+EmulatedReceiver answers the same output reports as the firmware:
+
+    command 1 -> report 2 [2, 0, DEVICE_TYPE]              (3 bytes)
+    command 3 -> report 4 [4, 0, API major, minor, format] (5 bytes)
+    command 5 -> report 6 [6, 0, FW major, minor]          (4 bytes)
+    command 9 -> report 10 [10, 0, raw timing on]          (3 bytes)
+    other     -> report 0 [0, 0, 3]                        (3 bytes)
+
+Until the host asks for format 2 ([0, 3, 2]) every IR press is a 64-byte
+report 7 with the little-endian NEC code and repeat frames are dropped. In
+format 2 presses and repeat frames are IREvents with a sequence number and
+the device time in µs, batched into report 8 like the firmware does: an
+event joins the report still waiting for the next USB poll (1 ms), up to 5
+per report. api_version=(1, 0) emulates firmware before format 2.
+
+With raw timing diagnostics on ([0, 9, 1], format 2 only) every press is
+followed by its mark/space durations in report 11 chunks, one per USB poll.
+The durations are the NEC nominal ones as a receiver would measure them:
+scaled by signal_drift (remote oscillator off by that fraction), marks
+signal_bias_us longer and spaces that much shorter (negative: a weak LED),
+plus Gaussian signal_jitter_us, rounded to 50 µs ticks.
+
+Presses come from press() / hold() (any thread) or a schedule of
+(seconds, code) pairs that is consumed lazily, so endless schedules cost
+nothing. Every report is delayed by the USB latency plus a uniform
++/- jitter. unplug()/plug() simulate a receiver being pulled and put back.
+
+Schedule files have one press per line, "<seconds> <code>", # comments:
+
+    0.0  0xFE017F80   # Short Pause
+    0.5  0xFD027F80
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from virc_protocol import (BATCH_EVENTS, CMD_API_VERSION, CMD_DEVICE_TYPE, CMD_FW_VERSION, CMD_RAW_TIMING,
+                           FLAG_REPEAT, FORMAT_V1, FORMAT_V2, REPORT_API_VERSION, REPORT_DEVICE_TYPE,
+                           REPORT_FW_VERSION, REPORT_IR_CODE, REPORT_RAW_TIMING_STATE, REPORT_SIZE,
+                           REPORT_UNKNOWN_COMMAND, TIMING_OFF, TIMING_ON, IREvent, encode_ir_batch,
+                           encode_timing_chunks)
+from virc_timing import MARK_EXCESS_US, TICK_US, nec_durations
+
+# Values compiled into virc_firmware.ino
+FIRMWARE_VID = 0x2e8a
+FIRMWARE_PID = 0x000a
+FIRMWARE_DEVICE_TYPE = 1
+FIRMWARE_API_VERSION = (2, 1)
+FIRMWARE_FW_VERSION = (1, 3)
+USB_POLL_S = 0.001       # usb_hid.setPollInterval(1)
+NEC_REPEAT_S = 0.108     # NEC repeat frame period while a button is held
+
+
+def ir_report(code):
+    """64-byte report 7 exactly as the firmware builds it"""
+    report = bytearray(REPORT_SIZE)
+    report[0] = REPORT_IR_CODE
+    report[2:6] = (code & 0xFFFFFFFF).to_bytes(4, "little")
+    return bytes(report)
+
+
+class EmulatedReceiver:
+    """One emulated receiver: command replies, scheduled IR presses, USB latency"""
+
+    def __init__(self, serial="EMU0001", latency_s=0.001, jitter_s=0.0, seed=None,
+                 device_type=FIRMWARE_DEVICE_TYPE, api_version=FIRMWARE_API_VERSION,
+                 fw_version=FIRMWARE_FW_VERSION, signal_drift=0.0, signal_bias_us=0.0, signal_jitter_us=0.0):
+        self.serial = serial
+        self.path = f"emulator:{serial}".encode()
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.device_type = device_type
+        self.api_version = api_version
+        self.fw_version = fw_version
+        self.connected = True
+        self.format = FORMAT_V1
+        self.raw_timing = False
+        self.signal_drift = signal_drift
+        self.signal_bias_us = signal_bias_us
+        self.signal_jitter_us = signal_jitter_us
+        self.reports_sent = 0
+        self.commands_received = 0
+        self.events_sent = 0
+
+        self._random = random.Random(seed)
+        self._cond = threading.Condition()
+        self._pending = []              # Heap of (due monotonic time, seq, report)
+        self._seq = itertools.count()
+        self._script = None             # Iterator of (seconds, code) still to be played
+        self._script_start = None       # Set by the first read, so the host sees the schedule from the start
+        self._script_next = None        # Next (seconds, code) of the script
+        self._skip_until = 0.0          # Presses while unplugged are lost, like on a real receiver
+        self._boot = time.monotonic()   # micros() == 0
+        self._event_seq = 0
+        self._batch = None              # (device send time, [IREvent], heap entry) of the report 8 being filled
+        self._last_send = 0.0
+        self._last_chunk = 0.0          # Send time of the last report 11 chunk queued
+
+    def device_info(self):
+        """hid.enumerate()-style entry"""
+        return {
+            'path': self.path,
+            'vendor_id': FIRMWARE_VID,
+            'product_id': FIRMWARE_PID,
+            'serial_number': self.serial,
+            'manufacturer_string': "Raspberry Pi",
+            'product_string': "VIRC Controller",
+            'interface_number': 0,
+        }
+
+    def _delay(self):
+        if not self.jitter_s:
+            return self.latency_s
+        return max(0.0, self.latency_s + self._random.uniform(-self.jitter_s, self.jitter_s))
+
+    def _send(self, report, at):
+        """Queue an input report for the host (lock held)"""
+        entry = [at + self._delay(), next(self._seq), report]
+        heapq.heappush(self._pending, entry)
+        self._cond.notify_all()
+        return entry
+
+    def _ir(self, code, at, repeat=False):
+        """One decoded IR frame at device time `at` (lock held)"""
+        if self.format == FORMAT_V1:
+            if not repeat:  # Format 1 firmware drops repeat frames (decodedRawData == 0)
+                self._send(ir_report(code), at)
+            return
+        event = IREvent(self._event_seq & 0xFFFF, FLAG_REPEAT if repeat else 0,
+                        int((at - self._boot) * 1_000_000) & 0xFFFFFFFF, code & 0xFFFFFFFF)
+        self._event_seq += 1
+        self.events_sent += 1
+        batch = self._batch
+        if batch and batch[0] >= at and len(batch[1]) < BATCH_EVENTS:
+            # The report has not gone out yet: the event rides along
+            batch[1].append(event)
+            batch[2][2] = bytes(encode_ir_batch(batch[1]))
+            send_at = batch[0]
+        else:
+            send_at = max(at, self._last_send + USB_POLL_S)
+            self._last_send = send_at
+            events = [event]
+            self._batch = (send_at, events, self._send(bytes(encode_ir_batch(events)), send_at))
+        if self.raw_timing and not repeat:
+            # Events go first, the chunks follow on the next polls, after those of the events before
+            start = max(send_at, self._last_chunk)
+            for n, chunk in enumerate(encode_timing_chunks(event.seq, self.measured_durations(code)), 1):
+                self._last_chunk = start + n * USB_POLL_S
+                self._send(bytes(chunk), self._last_chunk)
+
+    def measured_durations(self, code):
+        """Durations (µs) of one frame of `code` as IRremote would measure them"""
+        durations = []
+        for i, nominal in enumerate(nec_durations(code)):
+            mark = i % 2 == 0
+            measured = nominal * (1 + self.signal_drift) + (MARK_EXCESS_US + self.signal_bias_us) * (1 if mark else -1)
+            if self.signal_jitter_us:
+                measured += self._random.gauss(0.0, self.signal_jitter_us)
+            durations.append(max(1, round(measured / TICK_US)) * TICK_US)
+        return durations
+
+    def handle_output(self, data):
+        """Output report from the host; same switch as set_report_callback()"""
+        # hidapi strips report ID 0, so the firmware sees the command as buffer[0], and the
+        # report arrives zero-padded to its full size (always, with hidapi on Windows)
+        buffer = bytes(data[1:REPORT_SIZE + 1]).ljust(REPORT_SIZE, b"\0")
+        command = buffer[0]
+        if command == CMD_DEVICE_TYPE:
+            reply = bytes((REPORT_DEVICE_TYPE, 0, self.device_type))
+        elif command == CMD_API_VERSION:
+            if buffer[1] >= FORMAT_V2 and self.api_version[0] >= FORMAT_V2:
+                self.format = FORMAT_V2
+            if self.api_version[0] >= FORMAT_V2:
+                reply = bytes((REPORT_API_VERSION, 0) + tuple(self.api_version) + (self.format,))
+            else:
+                reply = bytes((REPORT_API_VERSION, 0) + tuple(self.api_version))
+        elif command == CMD_FW_VERSION:
+            reply = bytes((REPORT_FW_VERSION, 0) + tuple(self.fw_version))
+        elif command == CMD_RAW_TIMING and tuple(self.api_version) >= (2, 1):
+            if buffer[1] in (TIMING_ON, TIMING_OFF):
+                self.raw_timing = buffer[1] == TIMING_ON
+            reply = bytes((REPORT_RAW_TIMING_STATE, 0, int(self.raw_timing)))
+        else:
+            reply = bytes((REPORT_UNKNOWN_COMMAND, 0, 3))
+        with self._cond:
+            self.commands_received += 1
+            self._send(reply, time.monotonic())
+
+    def press(self, code, at=None):
+        """Send one IR code now (or at a monotonic time)"""
+        with self._cond:
+            self._ir(code, time.monotonic() if at is None else at)
+
+    def hold(self, code, seconds, at=None):
+        """A button held for `seconds`: the code, then NEC repeat frames every 108 ms
+
+        The frames are queued up front, so press nothing else on this receiver meanwhile.
+        """
+        start = time.monotonic() if at is None else at
+        with self._cond:
+            self._ir(code, start)
+            for n in range(1, int(seconds / NEC_REPEAT_S) + 1):
+                self._ir(code, start + n * NEC_REPEAT_S, repeat=True)
+
+    def play(self, schedule, loop=False):
+        """Play (seconds, code) pairs once the host reads; loop repeats a finite schedule forever
+
+        A looped schedule restarts one average gap after its last press.
+        """
+        if loop:
+            presses = list(schedule)
+            if not presses:
+                return
+            period = presses[-1][0] + (presses[-1][0] / max(len(presses) - 1, 1) or 1.0)
+            schedule = ((offset + n * period, code) for n in itertools.count() for offset, code in presses)
+        with self._cond:
+            self._script = iter(schedule)
+            self._script_start = None
+            self._script_next = next(self._script, None)
+            self._cond.notify_all()
+
+    def _pull_script(self, now):
+        """Queue every scripted press that is due (lock held)"""
+        if self._script_start is None:
+            self._script_start = now
+        while self._script_next is not None:
+            at = self._script_start + self._script_next[0]
+            if at > now:
+                return at
+            if at >= self._skip_until:
+                self._ir(self._script_next[1], at)
+            self._script_next = next(self._script, None)
+        return None
+
+    def read(self, size, timeout_ms=0):
+        """Next due input report as a list of ints, [] on timeout (like hid.device.read)"""
+        deadline = time.monotonic() + timeout_ms / 1000
+        with self._cond:
+            while True:
+                if not self.connected:
+                    raise OSError("read error")
+                now = time.monotonic()
+                wake = self._pull_script(now)
+                if self._pending and self._pending[0][0] <= now:
+                    entry = heapq.heappop(self._pending)
+                    if self._batch and entry is self._batch[2]:
+                        self._batch = None  # Sent, the next event starts a new report
+                    report = entry[2]
+                    self.reports_sent += 1
+                    return list(report[:size])
+                if now >= deadline:
+                    return []
+                if self._pending:
+                    wake = min(wake or deadline, self._pending[0][0])
+                self._cond.wait(min(wake or deadline, deadline) - now)
+
+    def unplug(self):
+        """Simulate the receiver being pulled: reads fail, enumerate no longer lists it"""
+        with self._cond:
+            self.connected = False
+            self._pending.clear()
+            self._batch = None
+            self._cond.notify_all()
+
+    def plug(self):
+        """Plug back in: the receiver restarts in format 1, raw timing off, with a fresh clock and sequence"""
+        with self._cond:
+            self.connected = True
+            self.format = FORMAT_V1
+            self.raw_timing = False
+            self._boot = time.monotonic()
+            self._event_seq = 0
+            self._batch = None
+            self._skip_until = time.monotonic()
+            self._cond.notify_all()
+
+
+class EmulatedDevice:
+    """Opened handle of an EmulatedReceiver (the hid.device side)"""
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.closed = False
+
+    def read(self, size, timeout_ms=0):
+        if self.closed:
+            raise OSError("device is closed")
+        return self.receiver.read(size, timeout_ms)
+
+    def write(self, data):
+        if self.closed or not self.receiver.connected:
+            raise OSError("write error")
+        self.receiver.handle_output(data)
+        return len(data)
+
+    def close(self):
+        self.closed = True
+
+
+class EmulatorTransport:
+    """Transport over a set of emulated receivers (see virc_transport.py)"""
+
+    description = "Emulator"
+    answers_queries = True
+
+    def __init__(self, receivers):
+        self.receivers = list(receivers)
+
+    def enumerate(self, vendor_id=0, product_id=0):
+        return [r.device_info() for r in self.receivers
+                if r.connected and vendor_id in (0, FIRMWARE_VID) and product_id in (0, FIRMWARE_PID)]
+
+    def open(self, path):
+        for receiver in self.receivers:
+            if receiver.path == path and receiver.connected:
+                return EmulatedDevice(receiver)
+        raise OSError("open failed")
+
+
+def load_script(path):
+    """[(seconds, code)] from a schedule file"""
+    schedule = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                offset, code = line.split()
+                schedule.append((float(offset), int(code, 0)))
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: expected '<seconds> <code>': {line!r}") from e
+    schedule.sort()
+    return schedule
+
+
+def profile_schedule(registry, interval_s=0.5):
+    """Every button of every profile once, interval_s apart"""
+    codes = [code for profile in registry for code, _ in profile.buttons]
+    return [(i * interval_s, code) for i, code in enumerate(codes)]
+
+
+def emulator_transport(count=1, script=None, interval_s=0.5, latency_s=0.001, jitter_s=0.0, seed=None):
+    """Transport with `count` receivers looping a schedule file (or every bundled button)"""
+    if script:
+        schedule = load_script(script)
+    else:
+        from virc_profiles import default_registry
+        schedule = profile_schedule(default_registry(), interval_s)
+    receivers = []
+    for i in range(count):
+        receiver = EmulatedReceiver(f"EMU{i + 1:04d}", latency_s, jitter_s,
+                                    seed=None if seed is None else seed + i)
+        receiver.play(schedule, loop=True)
+        receivers.append(receiver)
+    return EmulatorTransport(receivers)
@@ -0,0 +1,405 @@
+"""
+Streaming export of the QC history: CSV, JSON Lines and JUnit XML.
+
+    python virc_export.py results.csv --since 2026-01-01 --until 2027-01-01
+    python virc_export.py - --format jsonl --remote "White Remote" | jq .verdict
+    python virc_export.py mes_import.xml --station LINE-3 --verdict FAIL
+    python virc_export.py session.xml --session 1234
+
+    csv     one row per button result, the session's columns repeated (spreadsheets)
+    jsonl   one object per session with its buttons (pipelines)
+    junit   a <testsuite> per session, a <testcase> per button, <failure> for a
+            failed button (MES import)
+    report  the station's printable text report, a block per session
+            (what "Export Results" in the station window writes)
+
+Sessions are read CHUNK at a time (keyset pagination on the session id, the
+buttons of one chunk in one query) and written as they come, so a year of
+history exports in the memory of one chunk. Output goes to "<file>.part"
+and is renamed when complete: a cancelled or failed export leaves no
+half-written file behind.
+
+ExportJob runs an export on its own thread with its own connection (WAL
+lets it read while the station records); done / total are there to poll for
+progress, cancel() stops it between chunks. Whatever makes it fail ends up
+in its error. export_records() writes sessions held in memory instead (the
+station without a history).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+from virc_history import DEFAULT_DB, FAIL, PASS, ButtonResult, SessionRecord, connect
+from virc_timing import grade
+
+CHUNK = 500  # Sessions per query; also how often progress is reported
+
+# Format -> (file extension, name shown in file dialogs)
+FORMATS = {
+    'csv': (".csv", "CSV"),
+    'jsonl': (".jsonl", "JSON Lines"),
+    'junit': (".xml", "JUnit XML"),
+    'report': (".txt", "Text report"),
+}
+
+CSV_COLUMNS = ("session_id", "started", "finished", "station", "receiver", "serial", "remote", "verdict",
+               "duration_s", "button", "code", "outcome", "press_s", "quality")
+
+
+class ExportFilter(NamedTuple):
+    since: Optional[float] = None       # Unix time, sessions finished at or after
+    until: Optional[float] = None       # Unix time, exclusive
+    remote: Optional[str] = None
+    station: Optional[str] = None
+    verdict: Optional[str] = None
+    session_id: Optional[int] = None    # Just this session
+    first_id: Optional[int] = None      # Sessions from this id on (one test run of a station)
+
+
+def format_for_path(path):
+    """Format of an output file by its extension; None if it has none of ours"""
+    extension = os.path.splitext(path)[1].lower()
+    for fmt, (fmt_extension, _) in FORMATS.items():
+        if extension == fmt_extension:
+            return fmt
+    return None
+
+
+def _where(filters):
+    where, params = [], []
+    for clause, value in (("finished >= ?", filters.since), ("finished < ?", filters.until),
+                          ("remote = ?", filters.remote), ("station = ?", filters.station),
+                          ("verdict = ?", filters.verdict), ("id = ?", filters.session_id),
+                          ("id >= ?", filters.first_id)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    return where, params
+
+
+def count_sessions(db, filters=ExportFilter()):
+    where, params = _where(filters)
+    sql = "SELECT COUNT(*) FROM sessions" + (" WHERE " + " AND ".join(where) if where else "")
+    return db.execute(sql, params).fetchone()[0]
+
+
+def iter_sessions(db, filters=ExportFilter(), chunk=CHUNK):
+    """(session id, SessionRecord) of every matching session, oldest first, read `chunk` at a time"""
+    where, params = _where(filters)
+    sql = ("SELECT id, started, finished, station, receiver, serial, remote, verdict FROM sessions WHERE "
+           + " AND ".join(["id > ?"] + where) + " ORDER BY id LIMIT ?")
+    last_id = 0
+    while True:
+        rows = db.execute(sql, [last_id, *params, chunk]).fetchall()
+        if not rows:
+            return
+        buttons = {}
+        ids = [row[0] for row in rows]
+        for session_id, *button in db.execute(
+                "SELECT session_id, code, button, outcome, press_s, quality FROM button_results "
+                f"WHERE session_id IN ({','.join('?' * len(ids))}) ORDER BY session_id, rowid", ids):
+            buttons.setdefault(session_id, []).append(ButtonResult(*button))
+        for row in rows:
+            yield row[0], SessionRecord(*row[1:], tuple(buttons.get(row[0], ())))
+        last_id = ids[-1]
+
+
+def local_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def iso_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _round(value, digits=3):
+    return None if value is None else round(value, digits)
+
+
+class CsvExport:
+    def __init__(self, out):
+        self.writer = csv.writer(out)
+
+    def begin(self):
+        self.writer.writerow(CSV_COLUMNS)
+
+    def session(self, session_id, record):
+        head = (session_id, local_time(record.started), local_time(record.finished), record.station,
+                record.receiver, record.serial, record.remote, record.verdict, _round(record.duration_s))
+        self.writer.writerows(head + (b.button, f"0x{b.code:08X}", b.outcome, _round(b.press_s), _round(b.quality, 1))
+                              for b in record.buttons)
+
+    def end(self):
+        pass
+
+
+class JsonLinesExport:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        pass
+
+    def session(self, session_id, record):
+        self.out.write(json.dumps({
+            'session_id': session_id,
+            'started': iso_time(record.started),
+            'finished': iso_time(record.finished),
+            'station': record.station,
+            'receiver': record.receiver,
+            'serial': record.serial,
+            'remote': record.remote,
+            'verdict': record.verdict,
+            'duration_s': _round(record.duration_s),
+            'buttons': [{'button': b.button, 'code': f"0x{b.code:08X}", 'outcome': b.outcome,
+                         'press_s': _round(b.press_s), 'quality': _round(b.quality, 1)} for b in record.buttons],
+        }, ensure_ascii=False) + "\n")
+
+    def end(self):
+        pass
+
+
+def case_times(buttons):
+    """Seconds each button took: from the previous pass (in press order) to its own, 0 if never passed
+
+    press_s is the offset from the first press, so these add up to the session's duration.
+    """
+    times = {}
+    previous = 0.0
+    for press_s, index in sorted((b.press_s, i) for i, b in enumerate(buttons) if b.press_s is not None):
+        times[index] = max(0.0, press_s - previous)
+        previous = press_s
+    return [times.get(i, 0.0) for i in range(len(buttons))]
+
+
+class JUnitExport:
+    """JUnit XML: root attributes would need totals up front, so they are left out
+
+    A testcase's time is how long its button took (case_times()); the offset
+    from the first press is kept as its press_s property.
+    """
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites name="VIRC QC">\n')
+
+    def session(self, session_id, record):
+        failures = sum(1 for b in record.buttons if b.outcome != "pass")
+        timestamp = datetime.fromtimestamp(record.started).strftime("%Y-%m-%dT%H:%M:%S")
+        name = f"{record.remote} {record.serial or record.receiver}"
+        lines = [f'  <testsuite name={quoteattr(name)} id="{session_id}" tests="{len(record.buttons)}" '
+                 f'failures="{failures}" errors="0" time="{record.duration_s:.3f}" '
+                 f'timestamp="{timestamp}" hostname={quoteattr(record.station)}>',
+                 f'    <properties><property name="receiver" value={quoteattr(record.receiver)}/>'
+                 f'<property name="verdict" value="{record.verdict}"/></properties>']
+        for b, took in zip(record.buttons, case_times(record.buttons)):
+            case = (f'    <testcase classname={quoteattr(record.remote)} name={quoteattr(b.button)} '
+                    f'time="{took:.3f}">')
+            if b.press_s is not None:
+                case += f'<properties><property name="press_s" value="{b.press_s:.3f}"/></properties>'
+            if b.outcome != "pass":
+                case += (f'<failure message="button not received">{escape(b.button)} '
+                         f'(0x{b.code:08X}) was not received</failure>')
+            lines.append(case + "</testcase>")
+        lines.append("  </testsuite>\n")
+        self.out.write("\n".join(lines))
+
+    def end(self):
+        self.out.write("</testsuites>\n")
+
+
+class TextReport:
+    """Human-readable report; the session count goes at the end, it is only known there"""
+
+    def __init__(self, out):
+        self.out = out
+        self.sessions = 0
+
+    def begin(self):
+        self.out.write(f"\nVIRC REMOTE QUALITY CONTROL TEST REPORT\n{'=' * 50}\n\n"
+                       f"Report Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    def session(self, session_id, record):
+        self.sessions += 1
+        total = len(record.buttons)
+        lines = [f"\n{'-' * 50}",
+                 f"Session: #{session_id}",
+                 f"Finished: {local_time(record.finished)}",
+                 f"Station: {record.station}",
+                 f"Receiver: {record.receiver}",
+                 f"Remote Type: {record.remote}",
+                 f"Test Status: {'PASSED' if record.verdict == PASS else 'FAILED'}",
+                 "",
+                 "SUMMARY:",
+                 "--------",
+                 f"Total Buttons Tested: {total}",
+                 f"Buttons Passed: {record.passed}",
+                 f"Buttons Failed: {total - record.passed}",
+                 f"Success Rate: {record.passed / total * 100 if total else 0.0:.1f}%"]
+        scored = [b for b in record.buttons if b.quality is not None]
+        if scored:
+            weakest = min(scored, key=lambda b: b.quality)
+            lines.append(f"Weakest Signal: {weakest.button} ({weakest.quality:.0f}/100, {grade(weakest.quality)})")
+        lines += ["", "DETAILED RESULTS:", "-----------------"]
+        for b in record.buttons:
+            status = "✅ PASS" if b.outcome == "pass" else "❌ FAIL"
+            if b.quality is not None:
+                status = f"{status:14} Q {b.quality:3.0f} ({grade(b.quality)})"
+            lines.append(f"{b.button:20} : {status}")
+        self.out.write("\n".join(lines) + "\n")
+
+    def end(self):
+        self.out.write(f"\n{'=' * 50}\nSessions: {self.sessions}\nGenerated by VIRC QC Testing Station\n")
+
+
+EXPORTERS = {'csv': CsvExport, 'jsonl': JsonLinesExport, 'junit': JUnitExport, 'report': TextReport}
+
+
+def export_sessions(db, out, fmt, filters=ExportFilter(), progress=None, cancelled=None):
+    """Write every matching session to the text stream `out`; number of sessions written
+
+    progress(done, total) is called after every chunk; cancelled() is checked
+    there too and stops the export early.
+    """
+    exporter = EXPORTERS[fmt](out)
+    total = count_sessions(db, filters)
+    done = 0
+    exporter.begin()
+    if progress:
+        progress(done, total)
+    for session_id, record in iter_sessions(db, filters):
+        exporter.session(session_id, record)
+        done += 1
+        if done % CHUNK == 0:
+            if progress:
+                progress(done, total)
+            if cancelled and cancelled():
+                return done
+    exporter.end()
+    if progress:
+        progress(done, total)
+    return done
+
+
+def export_records(out, records, fmt):
+    """Write SessionRecords held in memory, numbered from 1 (no history ids); number written"""
+    exporter = EXPORTERS[fmt](out)
+    exporter.begin()
+    for number, record in enumerate(records, 1):
+        exporter.session(number, record)
+    exporter.end()
+    return len(records)
+
+
+class ExportJob:
+    """One export on a background thread; poll done / total / finished, read error afterwards"""
+
+    def __init__(self, history_path, path, fmt=None, filters=ExportFilter()):
+        self.history_path = history_path
+        self.path = path
+        self.fmt = fmt or format_for_path(path)
+        if self.fmt not in EXPORTERS:
+            raise ValueError(f"unknown export format for {path}")
+        self.filters = filters
+        self.done = 0
+        self.total = None           # Known once the export has counted the sessions
+        self.error = None
+        self.cancelled = False
+        self.finished = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="VIRC export", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _progress(self, done, total):
+        self.done, self.total = done, total
+
+    def _run(self):
+        partial = self.path + ".part"
+        try:
+            db = connect(self.history_path)
+            try:
+                # newline="" lets the csv module write its own line endings
+                with open(partial, "w", encoding="utf-8", newline="" if self.fmt == "csv" else None) as out:
+                    export_sessions(db, out, self.fmt, self.filters, self._progress, lambda: self.cancelled)
+            finally:
+                db.close()
+            if self.cancelled:
+                os.remove(partial)
+            else:
+                os.replace(partial, self.path)
+        except Exception as e:  # Reported through error, the thread has nobody else to tell
+            self.error = e
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+        finally:
+            self.finished.set()
+
+
+def _parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the QC test history as CSV, JSON Lines or JUnit XML")
+    parser.add_argument("output", help="output file (.csv, .jsonl, .xml, .txt) or - for stdout")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="default: from the output file's extension")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"history database (default: {DEFAULT_DB})")
+    parser.add_argument("--since", type=_parse_date, metavar="YYYY-MM-DD")
+    parser.add_argument("--until", type=_parse_date, metavar="YYYY-MM-DD", help="exclusive")
+    parser.add_argument("--remote", help="remote type, e.g. \"White Remote\"")
+    parser.add_argument("--station")
+    parser.add_argument("--verdict", choices=(PASS, FAIL), type=str.upper)
+    parser.add_argument("--session", type=int, metavar="ID", help="export just this session")
+    args = parser.parse_args()
+
+    fmt = args.format or (format_for_path(args.output) if args.output != "-" else None)
+    if fmt is None:
+        parser.error("cannot tell the format from the output name, use --format")
+    if not os.path.exists(args.db):
+        parser.error(f"no history database at {args.db}")
+    filters = ExportFilter(args.since, args.until, args.remote, args.station, args.verdict, args.session)
+
+    if args.output == "-":
+        db = connect(args.db)
+        try:
+            export_sessions(db, sys.stdout, fmt, filters)
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())  # Reader went away (| head)
+        finally:
+            db.close()
+        return
+
+    job = ExportJob(args.db, args.output, fmt, filters).start()
+    try:
+        while not job.finished.wait(0.5):
+            if job.total:
+                print(f"\r{job.done}/{job.total} sessions", end="", file=sys.stderr)
+    except KeyboardInterrupt:
+        job.cancel()
+        job.finished.wait()
+        print("\nCancelled", file=sys.stderr)
+        sys.exit(1)
+    if job.error:
+        print(f"\nExport failed: {job.error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\r{job.done} session(s) exported to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
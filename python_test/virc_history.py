@@ -0,0 +1,453 @@
+"""
+QC test history in a local SQLite database.
+
+Every completed checklist (one receiver, one remote) is one row in
+`sessions`, its buttons rows in `button_results`:
+
+    sessions        id, started, finished (Unix time), station, receiver,
+                    serial, remote, verdict (PASS / FAIL), buttons, passed,
+                    duration_s
+    button_results  session_id, code, button, outcome (pass / fail),
+                    press_s (seconds from the first press of
+                    the session), quality (signal score, NULL without --timing)
+
+The database is in WAL mode, and sessions are indexed by finish time,
+remote + time and verdict + time, so a month of history is a few index
+range scans.
+
+Summary tables are updated in the same transaction as each session, so
+the statistics dashboard reads a bounded number of rows however long the
+history is:
+
+    shift_stats     per day and shift: sessions, passed, total duration,
+                    first / last finish
+    hour_stats      sessions and passes per clock hour
+    remote_stats    per remote type: sessions, passed, total duration
+    button_stats    per remote type and button: times tested, times failed
+
+A database of an older version gets its summary tables built once from the
+sessions when it is opened.
+
+HistoryWriter owns the only write connection on a background thread:
+record() only queues the session, the writer commits whatever is queued in
+one transaction (at most every COMMIT_INTERVAL_S while sessions keep
+coming), so recording never waits for the disk. Readers open their
+own connections; WAL lets them run while the writer commits.
+
+The database lives in DATA_DIR: the per-user data directory when run from
+source (%LOCALAPPDATA%\\VIRC, ~/Library/Application Support/VIRC,
+$XDG_DATA_HOME/virc), next to the executable in a PyInstaller build (a
+onefile build unpacks to a temporary directory that is deleted on exit).
+
+    python virc_history.py                          # Last 20 sessions of qc_history.db
+    python virc_history.py --since 2026-10-01 --remote "White Remote" --verdict FAIL
+"""
+import argparse
+import os
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+
+
+def data_dir():
+    """Directory of the station's databases (see the module docstring)"""
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    if sys.platform == "win32":
+        return os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local"), "VIRC")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Application Support/VIRC")
+    return os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "virc")
+
+
+DATA_DIR = data_dir()
+DEFAULT_DB = os.path.join(DATA_DIR, "qc_history.db")
+
+COMMIT_INTERVAL_S = 0.5   # Sessions queued meanwhile go into the same transaction
+MAX_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id          INTEGER PRIMARY KEY,
+    started     REAL NOT NULL,
+    finished    REAL NOT NULL,
+    station     TEXT NOT NULL,
+    receiver    TEXT NOT NULL,
+    serial      TEXT NOT NULL,
+    remote      TEXT NOT NULL,
+    verdict     TEXT NOT NULL,
+    buttons     INTEGER NOT NULL,
+    passed      INTEGER NOT NULL,
+    duration_s  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS button_results (
+    session_id  INTEGER NOT NULL REFERENCES sessions(id),
+    code        INTEGER NOT NULL,
+    button      TEXT NOT NULL,
+    outcome     TEXT NOT NULL,
+    press_s     REAL,
+    quality     REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_finished ON sessions(finished);
+CREATE INDEX IF NOT EXISTS sessions_remote ON sessions(remote, finished);
+CREATE INDEX IF NOT EXISTS sessions_verdict ON sessions(verdict, finished);
+CREATE INDEX IF NOT EXISTS button_results_session ON button_results(session_id);
+"""
+
+SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shift_stats (
+    day         TEXT NOT NULL,
+    shift       INTEGER NOT NULL,
+    sessions    INTEGER NOT NULL,
+    passed      INTEGER NOT NULL,
+    duration_s  REAL NOT NULL,
+    first       REAL NOT NULL,
+    last        REAL NOT NULL,
+    PRIMARY KEY (day, shift)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hour_stats (
+    hour        INTEGER PRIMARY KEY,
+    sessions    INTEGER NOT NULL,
+    passed      INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS remote_stats (
+    remote      TEXT PRIMARY KEY,
+    sessions    INTEGER NOT NULL,
+    passed      INTEGER NOT NULL,
+    duration_s  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS button_stats (
+    remote      TEXT NOT NULL,
+    code        INTEGER NOT NULL,
+    button      TEXT NOT NULL,
+    tested      INTEGER NOT NULL,
+    failed      INTEGER NOT NULL,
+    PRIMARY KEY (remote, code)
+) WITHOUT ROWID;
+"""
+SCHEMA_VERSION = 2  # 1: sessions only, 2: with summary tables
+
+# Shift start hours (local time); a shift belongs to the day it starts on
+SHIFTS = ((6, "Early"), (14, "Late"), (22, "Night"))
+
+PASS = "PASS"
+FAIL = "FAIL"
+
+
+class ButtonResult(NamedTuple):
+    code: int
+    button: str
+    outcome: str                    # "pass" or "fail" (sessions are recorded once finished)
+    press_s: Optional[float] = None  # Seconds from the session's first press
+    quality: Optional[float] = None  # Signal quality score (virc_timing.py)
+
+
+class SessionRecord(NamedTuple):
+    started: float      # time.time()
+    finished: float
+    station: str
+    receiver: str       # Lane name
+    serial: str
+    remote: str
+    verdict: str        # PASS / FAIL
+    buttons: tuple      # ButtonResult per checklist button
+
+    @property
+    def passed(self):
+        return sum(1 for b in self.buttons if b.outcome == "pass")
+
+    @property
+    def duration_s(self):
+        return self.finished - self.started
+
+
+def station_name():
+    """This station's name in the history: VIRC_STATION or the host name"""
+    return os.environ.get("VIRC_STATION") or socket.gethostname()
+
+
+def connect(path=DEFAULT_DB):
+    """Connection to a history database, created with its schema (and directory) if needed"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL: durable at checkpoints, never corrupt
+    db.executescript(SCHEMA)
+    if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        with db:
+            db.executescript(SUMMARY_SCHEMA)
+            rebuild_summaries(db)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return db
+
+
+def shift_of(timestamp):
+    """(day 'YYYY-MM-DD', shift index, shift start time) of a Unix time, in local time"""
+    moment = datetime.fromtimestamp(timestamp)
+    starts = [hour for hour, _ in SHIFTS]
+    index = max((i for i, hour in enumerate(starts) if moment.hour >= hour), default=None)
+    if index is None:  # Before the first shift starts: the last shift of the day before
+        moment -= timedelta(days=1)
+        index = len(SHIFTS) - 1
+    start = moment.replace(hour=starts[index], minute=0, second=0, microsecond=0)
+    return start.strftime("%Y-%m-%d"), index, start.timestamp()
+
+
+def _update_summaries(db, record):
+    day, shift, _ = shift_of(record.finished)
+    passed = int(record.verdict == PASS)
+    db.execute("INSERT INTO shift_stats VALUES (?, ?, 1, ?, ?, ?, ?) ON CONFLICT (day, shift) DO UPDATE SET "
+               "sessions = sessions + 1, passed = passed + excluded.passed, duration_s = duration_s + excluded.duration_s, "
+               "first = min(first, excluded.first), last = max(last, excluded.last)",
+               (day, shift, passed, record.duration_s, record.finished, record.finished))
+    db.execute("INSERT INTO hour_stats VALUES (?, 1, ?) ON CONFLICT (hour) DO UPDATE SET "
+               "sessions = sessions + 1, passed = passed + excluded.passed",
+               (int(record.finished // 3600), passed))
+    db.execute("INSERT INTO remote_stats VALUES (?, 1, ?, ?) ON CONFLICT (remote) DO UPDATE SET "
+               "sessions = sessions + 1, passed = passed + excluded.passed, duration_s = duration_s + excluded.duration_s",
+               (record.remote, passed, record.duration_s))
+    db.executemany("INSERT INTO button_stats VALUES (?, ?, ?, 1, ?) ON CONFLICT (remote, code) DO UPDATE SET "
+                   "tested = tested + 1, failed = failed + excluded.failed, button = excluded.button",
+                   [(record.remote, b.code, b.button, int(b.outcome != "pass")) for b in record.buttons])
+
+
+def rebuild_summaries(db):
+    """Recompute the summary tables from the sessions (the caller commits)"""
+    for table in ("shift_stats", "hour_stats", "remote_stats", "button_stats"):
+        db.execute(f"DELETE FROM {table}")
+    for row in query_sessions(db):
+        buttons = tuple(button_results(db, row['id']))
+        _update_summaries(db, SessionRecord(row['started'], row['finished'], row['station'], row['receiver'],
+                                            row['serial'], row['remote'], row['verdict'], buttons))
+
+
+def insert_sessions(db, records):
+    """Insert sessions and their buttons, and count them in the summary tables (the caller commits)
+
+    Returns the new session ids.
+    """
+    ids = []
+    for record in records:
+        _update_summaries(db, record)
+        cursor = db.execute(
+            "INSERT INTO sessions (started, finished, station, receiver, serial, remote, verdict, buttons, passed, "
+            "duration_s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record.started, record.finished, record.station, record.receiver, record.serial, record.remote,
+             record.verdict, len(record.buttons), record.passed, record.duration_s))
+        db.executemany(
+            "INSERT INTO button_results (session_id, code, button, outcome, press_s, quality) VALUES (?, ?, ?, ?, ?, ?)",
+            [(cursor.lastrowid,) + tuple(button) for button in record.buttons])
+        ids.append(cursor.lastrowid)
+    return ids
+
+
+class HistoryWriter:
+    """Background writer of SessionRecords; record() never blocks"""
+
+    def __init__(self, path=DEFAULT_DB, on_error=None, on_commit=None):
+        self.path = path
+        self.on_error = on_error    # Called on the writer thread with the exception of a failed batch
+        self.on_commit = on_commit  # Called on the writer thread with [(session id, SessionRecord)] committed
+        self.written = 0
+        self.commits = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._db = connect(path)  # Opened here, so a bad path fails at startup
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="VIRC history", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, session):
+        """Queue a finished session (any thread)"""
+        self._queue.put(session)
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=5.0):
+        """Write what is still queued and close the database
+
+        The writer thread closes its connection when it is done; after
+        `timeout` it is left to finish in the background.
+        """
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self._write(self._drain([]))
+            self._db.close()
+
+    def _drain(self, batch):
+        try:
+            while len(batch) < MAX_BATCH:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + COMMIT_INTERVAL_S
+            # Wait a little for more sessions to share the commit (a full lane row finishes together)
+            while None not in batch and len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            closing = None in batch
+            self._write([record for record in batch if record is not None])
+        self._write(self._drain([]))
+        self._db.close()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            with self._db:  # One transaction per batch
+                ids = insert_sessions(self._db, batch)
+            self.written += len(batch)
+            self.commits += 1
+        except sqlite3.Error as e:
+            self.failed += len(batch)
+            if self.on_error:
+                self.on_error(e)
+            return
+        if self.on_commit:
+            self.on_commit(list(zip(ids, batch)))
+
+
+def query_sessions(db, since=None, until=None, remote=None, verdict=None, limit=None):
+    """Session rows (dicts), newest first; since/until are Unix times"""
+    where, params = [], []
+    for clause, value in (("finished >= ?", since), ("finished < ?", until), ("remote = ?", remote),
+                          ("verdict = ?", verdict)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    sql = "SELECT * FROM sessions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY finished DESC"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    cursor = db.execute(sql, params)
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def button_results(db, session_id):
+    return [ButtonResult(*row) for row in db.execute(
+        "SELECT code, button, outcome, press_s, quality FROM button_results WHERE session_id = ? ORDER BY rowid",
+        (session_id,))]
+
+
+def shift_name(index):
+    return SHIFTS[index][1]
+
+
+def shift_hours(index):
+    """Length of a shift in hours"""
+    return (SHIFTS[(index + 1) % len(SHIFTS)][0] - SHIFTS[index][0]) % 24 or 24
+
+
+def dashboard_stats(db, now=None, shifts=6, hours=8, buttons=10):
+    """Dashboard figures, read from the summary tables only (a bounded number of rows)
+
+    Returns a dict: shifts (newest first, with pass rate, mean checklist
+    time and units per hour), units_per_hour over the last `hours` clock
+    hours, last_hour, remotes, the `buttons` worst failing buttons and totals.
+    """
+    now = time.time() if now is None else now
+    _, _, current_start = shift_of(now)
+    shift_rows = []
+    for day, index, sessions, passed, duration_s, first, last in db.execute(
+            "SELECT day, shift, sessions, passed, duration_s, first, last FROM shift_stats "
+            "ORDER BY day DESC, shift DESC LIMIT ?", (shifts,)):
+        start = datetime.strptime(day, "%Y-%m-%d").replace(hour=SHIFTS[index][0]).timestamp()
+        current = start == current_start
+        # The running shift counts the hours so far, earlier ones their full length
+        worked_h = max((now - start) / 3600, 1 / 60) if current else shift_hours(index)
+        shift_rows.append({
+            'day': day,
+            'shift': shift_name(index),
+            'current': current,
+            'sessions': sessions,
+            'passed': passed,
+            'pass_rate': passed / sessions,
+            'mean_s': duration_s / sessions,
+            'units_per_hour': sessions / worked_h,
+        })
+
+    hour = int(now // 3600)
+    recent = dict(db.execute("SELECT hour, sessions FROM hour_stats WHERE hour > ?", (hour - hours,)).fetchall())
+    remotes = [{'remote': remote, 'sessions': sessions, 'passed': passed, 'pass_rate': passed / sessions,
+                'mean_s': duration_s / sessions}
+               for remote, sessions, passed, duration_s in db.execute(
+                   "SELECT remote, sessions, passed, duration_s FROM remote_stats ORDER BY sessions DESC")]
+    failing = [{'remote': remote, 'button': button, 'tested': tested, 'failed': failed, 'fail_rate': failed / tested}
+               for remote, button, tested, failed in db.execute(
+                   "SELECT remote, button, tested, failed FROM button_stats WHERE failed > 0 "
+                   "ORDER BY failed * 1.0 / tested DESC, failed DESC LIMIT ?", (buttons,))]
+    total = sum(r['sessions'] for r in remotes)
+    passed = sum(r['passed'] for r in remotes)
+    return {
+        'shifts': shift_rows,
+        'units_per_hour': sum(recent.values()) / hours,
+        'last_hour': recent.get(hour, 0),
+        'remotes': remotes,
+        'buttons': failing,
+        'sessions': total,
+        'pass_rate': passed / total if total else None,
+        'mean_s': sum(r['mean_s'] * r['sessions'] for r in remotes) / total if total else None,
+    }
+
+
+def _parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the QC test history")
+    parser.add_argument("database", nargs="?", default=DEFAULT_DB, help=f"history database (default: {DEFAULT_DB})")
+    parser.add_argument("--since", type=_parse_date, metavar="YYYY-MM-DD")
+    parser.add_argument("--until", type=_parse_date, metavar="YYYY-MM-DD", help="exclusive")
+    parser.add_argument("--remote", help="remote type, e.g. \"White Remote\"")
+    parser.add_argument("--verdict", choices=(PASS, FAIL), type=str.upper)
+    parser.add_argument("--limit", type=int, default=20, help="sessions to list, 0 for all (default: 20)")
+    parser.add_argument("--buttons", action="store_true", help="also list every button of each session")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        parser.error(f"no history database at {args.database}")
+    db = connect(args.database)
+    start = time.perf_counter()
+    rows = query_sessions(db, args.since, args.until, args.remote, args.verdict, args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for row in rows:
+        finished = datetime.fromtimestamp(row['finished']).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"#{row['id']:<7} {finished}  {row['station']:12} {row['receiver']:16} {row['remote']:16} {row['verdict']}  "
+              f"{row['passed']}/{row['buttons']} buttons in {row['duration_s']:.1f} s")
+        if args.buttons:
+            for button in button_results(db, row['id']):
+                timing = f"{button.press_s:6.1f} s" if button.press_s is not None else "       -"
+                quality = f"  Q {button.quality:3.0f}" if button.quality is not None else ""
+                print(f"    {button.button:20} {button.outcome:10} {timing}{quality}")
+    print(f"{len(rows)} session(s) in {elapsed_ms:.1f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
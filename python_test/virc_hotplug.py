@@ -0,0 +1,314 @@
+"""
+Receiver presence monitoring and fast reattach.
+
+One background thread per station does all the USB housekeeping:
+
+    presence    one transport.enumerate() pass per tick, diffed against a
+                registry keyed by serial (or HID path), reports receivers
+                plugged in / pulled out
+    reattach    a receiver whose reads failed is looked for again with a
+                short backoff (10 ms doubling up to 100 ms), so it is back
+                within ~100 ms of re-enumerating; it keeps being looked for
+                at the presence interval after REATTACH_FAST_S
+    heartbeat   optional device type query to every open receiver; a receiver
+                that stops answering has a stale handle and is reattached
+                before the next press gets lost
+
+Receivers are identified by serial number, so a receiver re-plugged into
+another port (new HID path) is still the same lane, and another receiver is
+never picked up in its place. Every recovery is timed (RecoveryStats).
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+from virc_protocol import CMD_DEVICE_TYPE, QUERY_COMMANDS
+
+# VIRC firmware vendor IDs: Raspberry Pi (official) and Adafruit (legacy firmware builds)
+USB_VID_RASPBERRY_PI = 0x2e8a
+USB_VID_ADAFRUIT = 0x239a
+VIRC_VENDOR_IDS = (USB_VID_RASPBERRY_PI, USB_VID_ADAFRUIT)
+
+PRESENCE_INTERVAL_S = 0.5    # Enumeration interval while every receiver is fine
+REATTACH_MIN_S = 0.01        # First reattach scan after a receiver was lost...
+REATTACH_MAX_S = 0.1         # ...doubling up to this
+REATTACH_FAST_S = 10.0       # Then only every PRESENCE_INTERVAL_S
+HEARTBEAT_TIMEOUT_S = 0.5
+
+
+def device_key(device_info):
+    """Stable identity of an enumerated receiver: the serial survives re-plugging, the path does not"""
+    return device_info.get('serial_number') or device_info['path']
+
+
+def device_label(device_info):
+    ident = device_info.get('serial_number') or device_info['path'].decode(errors='replace')
+    return (f"{device_info.get('manufacturer_string') or 'Unknown'} - {device_info.get('product_string') or 'Unknown'} "
+            f"[{ident}] (VID: 0x{device_info['vendor_id']:04x}, PID: 0x{device_info['product_id']:04x})")
+
+
+class DeviceRegistry:
+    """VIRC receivers of the last enumeration pass, keyed by device_key()"""
+
+    def __init__(self, vendor_ids=VIRC_VENDOR_IDS):
+        self.vendor_ids = vendor_ids
+        self.receivers = {}     # key -> device info, in enumeration order
+        self.all_devices = []   # Every HID device of the last pass (for the device log)
+        self.scans = 0
+        self.scan_ms = 0.0      # Duration of the last pass
+
+    def scan(self, transport):
+        """Enumerate once and update the registry; returns (added, removed) device infos"""
+        start = time.perf_counter()
+        devices = transport.enumerate()
+        self.scan_ms = (time.perf_counter() - start) * 1000
+        self.scans += 1
+        # Raspberry Pi VID first, then the legacy VID, each in enumeration order
+        receivers = {}
+        for vid in self.vendor_ids:
+            for info in devices:
+                if info['vendor_id'] == vid:
+                    receivers.setdefault(device_key(info), info)
+        added = [info for key, info in receivers.items() if key not in self.receivers]
+        removed = [info for key, info in self.receivers.items() if key not in receivers]
+        self.receivers = receivers
+        self.all_devices = devices
+        return added, removed
+
+    def find(self, key):
+        return self.receivers.get(key)
+
+    def __iter__(self):
+        return iter(list(self.receivers.values()))
+
+    def __len__(self):
+        return len(self.receivers)
+
+
+class RecoveryStats:
+    """Lost -> reattached times of every receiver (thread-safe)"""
+
+    def __init__(self, window=100):
+        self.losses = 0
+        self.stale = 0          # Losses found by a missed heartbeat rather than a read error
+        self.attempts = 0       # Reopen attempts (one writer: the monitor thread / event loop)
+        self.recoveries = collections.deque(maxlen=window)  # (key, seconds, scans)
+        self._lock = threading.Lock()
+
+    def lost(self, stale=False):
+        with self._lock:
+            self.losses += 1
+            self.stale += stale
+
+    def recovered(self, key, seconds, scans):
+        with self._lock:
+            self.recoveries.append((key, seconds, scans))
+
+    def summary(self):
+        """{losses, stale, recovered, recovery_p50_ms, recovery_max_ms, last_recovery_ms}"""
+        with self._lock:
+            times = sorted(seconds * 1000 for _, seconds, _ in self.recoveries)
+            last = self.recoveries[-1][1] * 1000 if self.recoveries else None
+            result = {'losses': self.losses, 'stale': self.stale, 'recovered': len(self.recoveries)}
+        result['recovery_p50_ms'] = times[len(times) // 2] if times else None
+        result['recovery_max_ms'] = times[-1] if times else None
+        result['last_recovery_ms'] = last
+        return result
+
+    def format_summary(self):
+        s = self.summary()
+        if not s['recovered']:
+            return f"{s['losses']} receiver loss(es), none recovered yet"
+        return (f"{s['losses']} receiver loss(es) ({s['stale']} by heartbeat), {s['recovered']} recovered: "
+                f"p50 {s['recovery_p50_ms']:.0f} ms, max {s['recovery_max_ms']:.0f} ms")
+
+
+class _Missing:
+    """A lost receiver being looked for"""
+
+    def __init__(self, key, since):
+        self.key = key
+        self.since = since
+        self.delay = REATTACH_MIN_S
+        self.next_scan = since
+        self.scans = 0
+        self.warned = False
+
+
+class HotplugMonitor:
+    """Background presence polling, backoff reattach and heartbeats for one transport
+
+    reopen(key, device_info) reopens a lost receiver and returns True, False if
+    it is no longer wanted (lane closed meanwhile); None or an exception means
+    "retry".
+    The callbacks run on the monitor thread: on_change(added, removed) after a
+    presence change, on_recovered(key, seconds) after a reattach, on_stale(key)
+    when a heartbeat went unanswered, on_missing(key, seconds) once a receiver
+    has been gone for REATTACH_FAST_S. heartbeat_targets() returns
+    (key, device, QueryRouter) of every open receiver.
+    """
+
+    def __init__(self, transport, reopen, on_change=None, on_recovered=None, on_stale=None, on_missing=None,
+                 heartbeat_targets=None, heartbeat_s=0.0, registry=None, interval_s=PRESENCE_INTERVAL_S):
+        self.transport = transport
+        self.reopen = reopen
+        self.on_change = on_change
+        self.on_recovered = on_recovered
+        self.on_stale = on_stale
+        self.on_missing = on_missing
+        self.heartbeat_targets = heartbeat_targets
+        self.heartbeat_s = heartbeat_s if transport.answers_queries else 0.0
+        self.registry = registry if registry is not None else DeviceRegistry()
+        self.interval_s = interval_s
+        self.stats = RecoveryStats()
+        self.running = False
+        self._missing = {}              # key -> _Missing
+        self._heartbeats = {}           # key -> (future, router, deadline)
+        self._next_presence = 0.0
+        self._next_heartbeat = 0.0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="VIRC hotplug", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def lost(self, key, stale=False):
+        """A receiver's handle failed (any thread): look for it until it is back or forgotten"""
+        now = time.monotonic()
+        with self._lock:
+            if key in self._missing:
+                return
+            self._missing[key] = _Missing(key, now)
+            self._heartbeats.pop(key, None)
+        self.stats.lost(stale)
+        self._wakeup.set()
+
+    def forget(self, key):
+        """Stop looking for a receiver (its lane was closed)"""
+        with self._lock:
+            self._missing.pop(key, None)
+            self._heartbeats.pop(key, None)
+
+    @property
+    def missing(self):
+        with self._lock:
+            return list(self._missing)
+
+    def _run(self):
+        while self.running:
+            now = time.monotonic()
+            with self._lock:
+                due = [m for m in self._missing.values() if m.next_scan <= now]
+            if due or now >= self._next_presence:
+                self._scan(due, now)
+            if self.heartbeat_s:
+                self._check_heartbeats(now)
+
+            with self._lock:
+                wake = min([m.next_scan for m in self._missing.values()] + [self._next_presence])
+            if self.heartbeat_s:
+                wake = min(wake, self._next_heartbeat, *(beat[2] for beat in self._heartbeats.values()))
+            self._wakeup.wait(max(0.0, wake - time.monotonic()))
+            self._wakeup.clear()
+
+    def _scan(self, due, now):
+        """One enumeration pass: presence changes, then reattach of the lost receivers that are due"""
+        try:
+            added, removed = self.registry.scan(self.transport)
+        except Exception:
+            added, removed = [], []  # Enumeration can fail while the USB stack settles; next tick
+        self._next_presence = now + self.interval_s
+        if (added or removed) and self.on_change:
+            self.on_change(added, removed)
+
+        for missing in due:
+            missing.scans += 1
+            self.stats.attempts += 1
+            info = self.registry.find(missing.key)
+            reopened = None
+            if info is not None:
+                try:
+                    reopened = self.reopen(missing.key, info)
+                except Exception:
+                    reopened = None  # Listed but not openable yet (driver still attaching)
+            if reopened is not None:
+                self.forget(missing.key)
+                if reopened:
+                    seconds = time.monotonic() - missing.since
+                    self.stats.recovered(missing.key, seconds, missing.scans)
+                    if self.on_recovered:
+                        self.on_recovered(missing.key, seconds)
+                continue
+            with self._lock:
+                if self._missing.get(missing.key) is not missing:
+                    continue  # Forgotten meanwhile
+                elapsed = now - missing.since
+                if elapsed < REATTACH_FAST_S:
+                    missing.delay = min(missing.delay * 2, REATTACH_MAX_S)
+                else:
+                    missing.delay = self.interval_s
+                missing.next_scan = time.monotonic() + missing.delay
+                warn = elapsed >= REATTACH_FAST_S and not missing.warned
+                missing.warned = missing.warned or warn
+            if warn and self.on_missing:
+                self.on_missing(missing.key, elapsed)
+
+    def _check_heartbeats(self, now):
+        """Flag receivers whose heartbeat went unanswered, then send the next round"""
+        with self._lock:
+            finished = [(key, beat) for key, beat in self._heartbeats.items() if beat[0].done() or beat[2] <= now]
+            for key, _ in finished:
+                del self._heartbeats[key]
+        for key, (future, router, _) in finished:
+            if future.done():
+                continue  # Answered, or failed because the handle was closed (the reader reports that)
+            router.discard(CMD_DEVICE_TYPE, future)
+            self.lost(key, stale=True)
+            if self.on_stale:
+                self.on_stale(key)
+
+        if now < self._next_heartbeat or not self.heartbeat_targets:
+            return
+        self._next_heartbeat = now + self.heartbeat_s
+        for key, device, router in self.heartbeat_targets():
+            with self._lock:
+                if key in self._heartbeats or key in self._missing:
+                    continue
+            future = router.add(CMD_DEVICE_TYPE, concurrent.futures.Future())
+            try:
+                device.write(QUERY_COMMANDS[CMD_DEVICE_TYPE])
+            except Exception:
+                router.discard(CMD_DEVICE_TYPE, future)
+                continue  # Handle already gone, the reader reports it
+            with self._lock:
+                self._heartbeats[key] = (future, router, now + HEARTBEAT_TIMEOUT_S)
+
+
+def wait_for_device(transport, key, timeout_s=None, registry=None):
+    """Block until the receiver `key` is listed again (same backoff as the monitor); None on timeout"""
+    registry = registry if registry is not None else DeviceRegistry()
+    start = time.monotonic()
+    delay = REATTACH_MIN_S
+    while True:
+        try:
+            registry.scan(transport)
+        except Exception:
+            pass
+        info = registry.find(key)
+        if info is not None:
+            return info
+        elapsed = time.monotonic() - start
+        if timeout_s is not None and elapsed >= timeout_s:
+            return None
+        delay = min(delay * 2, REATTACH_MAX_S) if elapsed < REATTACH_FAST_S else PRESENCE_INTERVAL_S
+        time.sleep(delay)
@@ -0,0 +1,213 @@
+"""
+Remote image cache for the VIRC QC station.
+
+Remote pictures are decoded and scaled once per (remote, size) and every
+button highlight is pre-rendered with ImageDraw, so showing a button press
+only swaps an already built PhotoImage. Entries are kept in an LRU bounded
+by an estimate of their pixel memory.
+
+Pillow is imported when the first picture is built (the station preloads
+them after its window is up), not at startup.
+
+Run this file directly to measure the time per display update with and
+without the cache.
+"""
+import importlib.util
+import os
+import sys
+import time
+from collections import OrderedDict
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+Image = ImageTk = ImageDraw = None  # Set by load_pil()
+
+# Button boxes as fractions of the image (x0, y0, x1, y1), measured on the artwork
+WHITE_REMOTE_LAYOUT = {
+    "Short Pause": (0.20, 0.18, 0.49, 0.295),
+    "Long Pause": (0.50, 0.18, 0.78, 0.295),
+    "Bed Mode": (0.20, 0.30, 0.49, 0.405),
+    "Chair Mode": (0.50, 0.30, 0.78, 0.405),
+    "Square Button": (0.20, 0.41, 0.49, 0.52),
+    "Triangle Button": (0.50, 0.41, 0.78, 0.52),
+}
+
+BLACK_REMOTE_LAYOUT = {
+    "Short Pause": (0.08, 0.13, 0.42, 0.23),
+    "Long Pause": (0.50, 0.13, 0.87, 0.23),
+    "Bed Mode": (0.08, 0.24, 0.42, 0.345),
+    "Chair Mode": (0.50, 0.24, 0.87, 0.345),
+    "Square Button": (0.08, 0.355, 0.42, 0.465),
+    "Triangle Button": (0.50, 0.355, 0.87, 0.465),
+}
+
+# Candidate files per remote, first one that loads wins; layout None = no highlights
+REMOTE_IMAGES = {
+    "white": [("white_remote.png", WHITE_REMOTE_LAYOUT)],
+    "black": [("black_remote.jpeg", BLACK_REMOTE_LAYOUT), ("black_remote.png", None)],
+}
+
+DEFAULT_SIZE = (100, 160)
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+HIGHLIGHT_FILL = (39, 174, 96, 110)      # Same green as the Success buttons
+HIGHLIGHT_OUTLINE = (39, 174, 96, 255)
+
+_MISSING = object()  # Cached "no image available" result
+
+
+def load_pil():
+    """Import Pillow on first use; False if it is not installed"""
+    global Image, ImageTk, ImageDraw, PIL_AVAILABLE
+    if Image is None and PIL_AVAILABLE:
+        try:
+            from PIL import Image, ImageTk, ImageDraw
+        except ImportError:
+            PIL_AVAILABLE = False
+    return PIL_AVAILABLE
+
+
+class RemoteImageCache:
+    """LRU of decoded/scaled remote images and pre-rendered button highlights"""
+
+    def __init__(self, image_dir, max_bytes=CACHE_MAX_BYTES, remote_images=None):
+        self.image_dir = image_dir
+        self.max_bytes = max_bytes
+        self.remote_images = remote_images or REMOTE_IMAGES
+        self._entries = OrderedDict()  # key -> (PIL image, PhotoImage or None, bytes)
+        self._layouts = {}             # (remote, size) -> layout of the file that loaded
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, key, image):
+        size = image.width * image.height * 4 if image is not _MISSING else 0
+        self._entries[key] = (image, None, size)
+        self.bytes_used += size
+        while self.bytes_used > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes_used -= evicted
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _load_base(self, remote, size):
+        """Decode and scale the remote picture once"""
+        for filename, layout in self.remote_images.get(remote, ()):
+            path = os.path.join(self.image_dir, filename)
+            try:
+                image = Image.open(path)
+                if image.format == "JPEG":
+                    # Let the JPEG decoder downscale; the full-size photo is ~2800px tall
+                    image.draft("RGB", (size[0] * 2, size[1] * 2))
+                image = image.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+            except (OSError, ValueError):
+                continue
+            self._layouts[(remote, size)] = layout
+            return image
+        return _MISSING
+
+    def _render_highlight(self, base, layout, button):
+        """Base image with a translucent box over one button"""
+        box = layout.get(button) if layout else None
+        if box is None:
+            return _MISSING
+        width, height = base.size
+        overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        draw.rounded_rectangle((box[0] * width, box[1] * height, box[2] * width, box[3] * height),
+                               radius=3, fill=HIGHLIGHT_FILL, outline=HIGHLIGHT_OUTLINE, width=2)
+        return Image.alpha_composite(base, overlay)
+
+    def image(self, remote, size=DEFAULT_SIZE, button=None):
+        """PIL image for a remote (optionally with a button highlighted), or None"""
+        if not load_pil():
+            return None
+        key = (remote, size, button)
+        entry = self._lookup(key)
+        if entry is None:
+            if button is None:
+                image = self._load_base(remote, size)
+            else:
+                base = self.image(remote, size)
+                image = _MISSING if base is None else \
+                    self._render_highlight(base, self._layouts.get((remote, size)), button)
+            self._store(key, image)
+            entry = self._entries[key]
+        return None if entry[0] is _MISSING else entry[0]
+
+    def photo(self, remote, size=DEFAULT_SIZE, button=None):
+        """Tk PhotoImage for the display (Tk thread only); falls back to the plain image"""
+        image = self.image(remote, size, button)
+        if image is None:
+            if button is None:
+                return None
+            return self.photo(remote, size)  # No highlight for this button/picture
+        key = (remote, size, button)
+        pil_image, photo, nbytes = self._entries[key]
+        if photo is None:
+            photo = ImageTk.PhotoImage(pil_image)
+            self._entries[key] = (pil_image, photo, nbytes)
+        return photo
+
+    def preload(self, size=DEFAULT_SIZE):
+        """Build every remote picture and button highlight ahead of the first IR event"""
+        for remote, candidates in self.remote_images.items():
+            if self.photo(remote, size) is None:
+                continue
+            layout = self._layouts.get((remote, size)) or {}
+            for button in layout:
+                self.photo(remote, size, button)
+
+    def clear(self):
+        self._entries.clear()
+        self._layouts.clear()
+        self.bytes_used = 0
+
+
+def measure_display_update(iterations=50):
+    """Time per display update: reload + resize every time vs. cached sprite swap"""
+    import tkinter as tk
+
+    image_dir = os.path.dirname(os.path.abspath(__file__))
+    root = tk.Tk()
+    root.withdraw()
+    label = tk.Label(root)
+    buttons = list(BLACK_REMOTE_LAYOUT)
+
+    def uncached(i):
+        image = Image.open(os.path.join(image_dir, "black_remote.jpeg"))
+        image = image.resize(DEFAULT_SIZE, Image.Resampling.LANCZOS)
+        photo = ImageTk.PhotoImage(image)
+        label.configure(image=photo)
+        label.image = photo
+
+    cache = RemoteImageCache(image_dir)
+
+    def cached(i):
+        label.configure(image=cache.photo("black", DEFAULT_SIZE, buttons[i % len(buttons)]))
+
+    results = {}
+    for name, update in (("uncached", uncached), ("cached", cached)):
+        start = time.perf_counter()
+        for i in range(iterations):
+            update(i)
+            root.update_idletasks()
+        results[name] = (time.perf_counter() - start) / iterations * 1000
+
+    root.destroy()
+    print(f"Display update, uncached: {results['uncached']:.2f} ms")
+    print(f"Display update, cached:   {results['cached']:.3f} ms  "
+          f"(cache: {cache.bytes_used // 1024} KiB, {cache.hits} hits / {cache.misses} misses)")
+    return results
+
+
+if __name__ == "__main__":
+    if not load_pil():
+        print("Pillow is required: pip install -r requirements.txt")
+        sys.exit(1)
+    measure_display_update()
@@ -0,0 +1,236 @@
+"""
+Session log for the VIRC QC station.
+
+Log lines are typed LogEntry records kept in a fixed-capacity ring buffer,
+so appending is O(1) no matter how long the station has been running. Small
+per-kind/code/remote/lane indexes make filtering cheap, and LogView maps the
+rows of a (filtered) view onto the buffer so the GUI only has to render the
+lines that are actually visible.
+"""
+import string
+import time
+from collections import deque
+from enum import Enum
+
+# Enough for a full 8-hour shift on several receivers (~5 lines per IR event)
+LOG_CAPACITY = 200_000
+
+
+class LogKind(Enum):
+    """Kind of a log line; the value is the Text tag used to render it"""
+    NORMAL = "normal"
+    HEADER = "header"
+    SUCCESS = "success"
+    ERROR = "error"
+    WARNING = "warning"
+    TEST = "test"
+    IR_SIGNAL = "ir_signal"
+    INSTRUCTION = "instruction"
+    SEPARATOR = "separator"
+
+
+def search_code(search):
+    """IR code a log search stands for, or None
+
+    0x-prefixed hex, or bare hex of at least 4 digits: "Bed", "add" or "Face"
+    are button names, not codes.
+    """
+    search = search.strip()
+    digits = search[2:] if search[:2].lower() == "0x" else search
+    if not digits or (digits is search and len(digits) < 4) or any(c not in string.hexdigits for c in digits):
+        return None
+    return int(digits, 16)
+
+
+class LazyMessage:
+    """Message built only when its line is rendered or searched
+
+    Per-event log lines (raw bytes, codes) are logged this way so the reader
+    path does no string formatting for lines nobody looks at.
+    """
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return self.func(*self.args)
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+
+class LogEntry:
+    """One log line with the metadata it can be filtered by (message is a str or LazyMessage)"""
+    __slots__ = ('seq', 'timestamp', 'kind', 'message', 'code', 'remote', 'lane')
+
+    def __init__(self, seq, timestamp, kind, message, code=None, remote=None, lane=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.kind = kind
+        self.message = message
+        self.code = code
+        self.remote = remote
+        self.lane = lane
+
+    @property
+    def time_text(self):
+        return time.strftime("%H:%M:%S", time.localtime(self.timestamp))
+
+
+class LogBuffer:
+    """Ring buffer of LogEntry; sequence numbers grow forever, the oldest entries fall off"""
+
+    def __init__(self, capacity=LOG_CAPACITY):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self.first_seq = 0  # Oldest entry still held
+        self.next_seq = 0   # Sequence number of the next append
+        # key -> deque of seq, oldest first (evicted seqs are always at the left end)
+        self._indexes = {'kind': {}, 'code': {}, 'remote': {}, 'lane': {}}
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def append(self, kind, message, code=None, remote=None, lane=None, timestamp=None):
+        """Add an entry, evicting the oldest one when full"""
+        seq = self.next_seq
+        slot = seq % self.capacity
+        evicted = self._slots[slot]
+        if evicted is not None:
+            self._unindex(evicted)
+            self.first_seq = evicted.seq + 1
+
+        entry = LogEntry(seq, time.time() if timestamp is None else timestamp,
+                         kind, message, code, remote, lane)
+        self._slots[slot] = entry
+        self.next_seq = seq + 1
+        for field, index in self._indexes.items():
+            key = getattr(entry, field)
+            if key is not None:
+                index.setdefault(key, deque()).append(seq)
+        return entry
+
+    def _unindex(self, entry):
+        for field, index in self._indexes.items():
+            key = getattr(entry, field)
+            if key is None:
+                continue
+            seqs = index[key]
+            seqs.popleft()
+            if not seqs:
+                del index[key]
+
+    def get(self, seq):
+        """Entry by sequence number, or None once it has been evicted"""
+        if seq < self.first_seq or seq >= self.next_seq:
+            return None
+        return self._slots[seq % self.capacity]
+
+    def keys(self, field):
+        """Distinct kinds/codes/remotes/lanes currently in the buffer"""
+        return list(self._indexes[field])
+
+    def select(self, kind=None, code=None, remote=None, lane=None, text=None, search=None, after_seq=-1):
+        """Sequence numbers of matching entries newer than after_seq, oldest first
+
+        The smallest index among the given criteria drives the scan, the other
+        criteria are checked per candidate. A text search alone scans the buffer.
+        `search` is the log's search box: entries of the IR code it stands for
+        (search_code()) or containing it as text.
+        """
+        criteria = {'kind': kind, 'code': code, 'remote': remote, 'lane': lane}
+        criteria = {field: key for field, key in criteria.items() if key is not None}
+        if text:
+            text = text.lower()
+        search_for = search_code(search) if search else None
+        if search:
+            search = search.strip().lower()
+
+        if criteria:
+            driver = min(criteria, key=lambda f: len(self._indexes[f].get(criteria[f], ())))
+            candidates = reversed(self._indexes[driver].get(criteria[driver], ()))
+        else:
+            candidates = range(self.next_seq - 1, self.first_seq - 1, -1)
+
+        matches = []
+        for seq in candidates:
+            if seq <= after_seq:
+                break
+            entry = self._slots[seq % self.capacity]
+            if any(getattr(entry, field) != key for field, key in criteria.items()):
+                continue
+            if text and text not in str(entry.message).lower():
+                continue
+            if search and (search_for is None or entry.code != search_for) \
+                    and search not in str(entry.message).lower():
+                continue
+            matches.append(seq)
+        matches.reverse()
+        return matches
+
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self.first_seq = self.next_seq
+        for index in self._indexes.values():
+            index.clear()
+
+
+class LogView:
+    """Rows of a filtered (or unfiltered) view over a LogBuffer
+
+    The unfiltered view is just a sequence-number range starting at `floor`;
+    a filtered view keeps the matching sequence numbers and extends them
+    incrementally as new entries arrive.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.floor = 0         # Unfiltered view hides entries before this (Clear Log)
+        self.filter = None     # Keyword arguments for LogBuffer.select
+        self._seqs = None
+        self._scanned = -1
+
+    def set_filter(self, **criteria):
+        criteria = {k: v for k, v in criteria.items() if v not in (None, "")}
+        self.filter = criteria or None
+        self._seqs = None
+        self._scanned = -1
+
+    def clear(self):
+        """Start an empty, unfiltered view; the session history stays searchable through filters"""
+        self.floor = self.buffer.next_seq
+        self.set_filter()
+
+    def _sync(self):
+        if self.filter is None:
+            return
+        if self._seqs is None:
+            self._seqs = []
+        new = self.buffer.select(after_seq=self._scanned, **self.filter)
+        self._seqs.extend(new)
+        self._scanned = self.buffer.next_seq - 1
+        # Drop rows whose entries were evicted from the ring
+        first = self.buffer.first_seq
+        if self._seqs and self._seqs[0] < first:
+            drop = 0
+            while drop < len(self._seqs) and self._seqs[drop] < first:
+                drop += 1
+            del self._seqs[:drop]
+
+    def __len__(self):
+        if self.filter is None:
+            return self.buffer.next_seq - max(self.floor, self.buffer.first_seq)
+        self._sync()
+        return len(self._seqs)
+
+    def rows(self, start, count):
+        """Entries for rows [start, start + count) of the view"""
+        total = len(self)
+        start = max(0, min(start, total))
+        stop = min(total, start + count)
+        if self.filter is None:
+            base = max(self.floor, self.buffer.first_seq)
+            return [self.buffer.get(base + row) for row in range(start, stop)]
+        return [self.buffer.get(seq) for seq in self._seqs[start:stop]]
@@ -0,0 +1,210 @@
+"""
+Live station metrics in the Prometheus text format.
+
+    python complete_gui.py --metrics-port 9750
+    python virc_station.py --metrics-port 9750
+    curl http://localhost:9750/metrics
+
+Most numbers already exist as plain counters kept by the thread that owns
+them (a lane's Debouncer and read timeouts on its reader thread, reconnects
+in RecoveryStats, verdicts on the Tk thread / event loop). The registry only
+holds functions that read them when /metrics is scraped, so the listener
+path pays nothing for being observed: no locks, no extra queue.
+
+The few numbers with no counter of their own (sessions per remote, the
+latency and queue depth distributions) are StationMetrics' Counter and
+Histograms, written by one thread each. A scrape copies them without a
+lock; at worst a histogram's _sum / _count are one observation ahead of its
+buckets, which Prometheus tolerates.
+
+    virc_station_info{station, mode}                1
+    virc_receivers                                  open receivers
+    virc_ir_events_total{receiver}                  IR events decoded
+    virc_ir_events_suppressed_total{receiver}       repeats / holds the debouncer swallowed
+    virc_read_timeouts_total{receiver}              reads that returned no report
+    virc_receiver_losses_total                      receivers lost (read error or missed heartbeat)
+    virc_reconnect_attempts_total                   reopen attempts of lost receivers
+    virc_receiver_recovery_seconds                  lost -> reading again (histogram)
+    virc_sessions_total{remote, verdict}            finished QC sessions
+    virc_event_to_verdict_seconds                   IR report read -> verdict (histogram)
+    virc_ui_queue_depth                             events waiting per UI frame (histogram, GUI only)
+"""
+import bisect
+import collections
+import threading
+
+DEFAULT_PORT = 9750
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+RECOVERY_BUCKETS_S = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUEUE_DEPTH_BUCKETS = (0, 1, 4, 16, 64, 256, 1024, 2048)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() from one thread only (no lock)"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last one: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1  # Bucket bounds are inclusive (le)
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(le, observations <= le)], ending with +Inf"""
+        counts = list(self.counts)
+        result, total = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _samples(value):
+    """A source's result as [(labels, value)]"""
+    return value if isinstance(value, list) else [({}, value)]
+
+
+class MetricsRegistry:
+    """Metric families whose values are read from their owners at scrape time"""
+
+    def __init__(self):
+        self._families = []  # (name, kind, help, source)
+
+    def counter(self, name, help, source):
+        """source() -> number, or [(labels, number)]"""
+        self._families.append((name, "counter", help, source))
+
+    def gauge(self, name, help, source):
+        self._families.append((name, "gauge", help, source))
+
+    def histogram(self, name, help, source):
+        """source: a Histogram, or a function returning [(labels, Histogram)]"""
+        self._families.append((name, "histogram", help, source))
+
+    def render(self):
+        """All families in the Prometheus text exposition format"""
+        lines = []
+        for name, kind, help, source in self._families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for labels, value in _samples(source()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for labels, histogram in _samples(source) if isinstance(source, Histogram) else source():
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(float(bound))})} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class StationMetrics:
+    """Registry of one station plus the metrics nothing else counts
+
+    The station registers its own sources for the counters its readers keep
+    (receivers, IR events, read timeouts, reconnects) and reports verdicts,
+    recoveries and UI frames here.
+    """
+
+    def __init__(self, station, mode):
+        self.registry = MetricsRegistry()
+        self.sessions = collections.Counter()  # (remote, verdict) -> sessions; written by the verdict thread
+        self.verdict_latency = Histogram(LATENCY_BUCKETS_S)
+        self.recovery = Histogram(RECOVERY_BUCKETS_S)
+        self.queue_depth = Histogram(QUEUE_DEPTH_BUCKETS)
+        self.registry.gauge("virc_station_info", "Station name and front end",
+                            lambda: [({'station': station, 'mode': mode}, 1)])
+
+    def register_receivers(self, receivers, ir_events, suppressed, read_timeouts, recovery_stats):
+        """Sources of the per-receiver counters and the reconnect stats (virc_hotplug.RecoveryStats)"""
+        registry = self.registry
+        registry.gauge("virc_receivers", "Receivers open", receivers)
+        registry.counter("virc_ir_events_total", "IR events decoded", ir_events)
+        registry.counter("virc_ir_events_suppressed_total", "IR reports the debouncer suppressed (repeats, holds)",
+                         suppressed)
+        registry.counter("virc_read_timeouts_total", "Receiver reads that returned no report", read_timeouts)
+        registry.counter("virc_receiver_losses_total", "Receivers lost (read error or missed heartbeat)",
+                         lambda: recovery_stats.losses)
+        registry.counter("virc_reconnect_attempts_total", "Reopen attempts of lost receivers",
+                         lambda: recovery_stats.attempts)
+        registry.histogram("virc_receiver_recovery_seconds", "Time from losing a receiver to reading it again",
+                           self.recovery)
+        registry.counter("virc_sessions_total", "Finished QC sessions by remote type and verdict",
+                         lambda: [({'remote': remote, 'verdict': verdict}, count)
+                                  for (remote, verdict), count in list(self.sessions.items())])
+        registry.histogram("virc_event_to_verdict_seconds", "Time from reading the deciding IR report to the verdict",
+                           self.verdict_latency)
+
+    def register_ui_queue(self):
+        self.registry.histogram("virc_ui_queue_depth", "Events waiting in the UI queue, sampled every frame",
+                                self.queue_depth)
+
+    def verdict(self, remote, verdict, latency_s=None):
+        self.sessions[(remote, verdict)] += 1
+        if latency_s is not None:
+            self.verdict_latency.observe(latency_s)
+
+
+class MetricsServer:
+    """/metrics over HTTP on a daemon thread"""
+
+    def __init__(self, registry, port=DEFAULT_PORT, host="127.0.0.1"):
+        # Only stations serving metrics load the HTTP server modules
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != METRICS_PATH:
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scraped every few seconds
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}{METRICS_PATH}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="VIRC metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread:
+            self.server.shutdown()
+            self._thread = None
+        self.server.server_close()
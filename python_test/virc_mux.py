@@ -0,0 +1,179 @@
+"""
+Report-ID multiplexing for device queries.
+
+Each receiver has exactly one reader. Every report it reads goes through
+QueryRouter.route(): query replies (IDs 2/4/6/10) resolve the oldest future
+waiting for that reply, report 0 (unknown command) the oldest query sent,
+whatever its command, and are consumed, while
+everything else (IR reports, ID 7) stays with the reader as an event. So
+queries can be sent at any time, several at once, without stealing or
+misreading IR reports.
+
+The futures are anything with done()/set_result()/set_exception(): the GUI
+uses concurrent.futures.Future (waited on by a worker thread), the asyncio
+client (virc_async.py) asyncio futures.
+
+Device info results are cached per receiver serial, so a reconnect or a new
+lane for a known receiver shows its info without asking the device again.
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+from typing import NamedTuple
+
+from virc_protocol import (CMD_API_VERSION, CMD_DEVICE_TYPE, CMD_FW_VERSION, QUERY_COMMANDS, QUERY_REPLIES,
+                           REPORT_UNKNOWN_COMMAND, decode_version)
+
+QUERY_TIMEOUT_S = 1.0
+
+# Query commands of the Device Information panel, in display order
+INFO_QUERIES = (
+    (CMD_DEVICE_TYPE, "Device Type"),
+    (CMD_API_VERSION, "API Version"),
+    (CMD_FW_VERSION, "Firmware Version"),
+)
+
+REPLY_COMMANDS = {reply: command for command, reply in QUERY_REPLIES.items()}
+
+
+class UnknownCommandError(Exception):
+    """The receiver answered a query with report ID 0"""
+
+
+class QueryRouter:
+    """Queries of one receiver waiting for their reply report (thread-safe)"""
+
+    def __init__(self, name="", on_add=None):
+        self.name = name
+        self.on_add = on_add  # Called after a query was registered, e.g. to wake an idle reader
+        self._pending = collections.deque()  # (reply report ID, future) in send order, a handful at most
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Number of queries waiting for a reply"""
+        return len(self._pending)
+
+    def add(self, command, future):
+        """Register a future before the command is written"""
+        with self._lock:
+            self._pending.append((QUERY_REPLIES[command], future))
+        if self.on_add:
+            self.on_add()
+        return future
+
+    def discard(self, command, future):
+        """Forget a timed out / cancelled query; a late reply goes to the next query of that command"""
+        with self._lock:
+            try:
+                self._pending.remove((QUERY_REPLIES[command], future))
+            except ValueError:
+                pass  # Answered meanwhile
+
+    def route(self, report):
+        """Resolve the query a reply belongs to; False if the report is not a query reply"""
+        report_id = report[0]
+        if report_id != REPORT_UNKNOWN_COMMAND and report_id not in REPLY_COMMANDS:
+            return False
+        with self._lock:
+            # Report 0 does not say which command it answers: the oldest query sent is the one the device read first
+            index = next((i for i, (reply, _) in enumerate(self._pending)
+                          if report_id in (reply, REPORT_UNKNOWN_COMMAND)), None)
+            future = None
+            if index is not None:
+                future = self._pending[index][1]
+                del self._pending[index]
+        if future is not None:
+            if report_id == REPORT_UNKNOWN_COMMAND:
+                _resolve(future, exception=UnknownCommandError(f"{self.name}: command not supported"))
+            else:
+                _resolve(future, result=report)
+        return True
+
+    def fail_all(self, error):
+        """Fail every pending query (device closed or lost)"""
+        with self._lock:
+            futures = [future for _, future in self._pending]
+            self._pending.clear()
+        for future in futures:
+            _resolve(future, exception=error)
+
+
+def _resolve(future, result=None, exception=None):
+    if future.done():  # Timed out or cancelled meanwhile
+        return
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        pass  # Cancelled between done() and set_*()
+
+
+class DeviceInfo(NamedTuple):
+    device_type: str
+    api_version: str
+    fw_version: str
+    queried_at: float  # time.time() of the answer
+
+    def __str__(self):
+        return f"device type {self.device_type}, API {self.api_version}, firmware {self.fw_version}"
+
+
+def format_reply(command, report):
+    """Display value of a query reply"""
+    if command == CMD_DEVICE_TYPE:
+        return str(report[2]) if len(report) >= 3 else "N/A"
+    return "%d.%d" % decode_version(report) if len(report) >= 4 else "N/A"
+
+
+def query_device_info(device, router, timeout=QUERY_TIMEOUT_S, on_reply=None):
+    """Pipeline the three info queries and wait for the replies (call off the UI thread)
+
+    The device's reader thread must be running, it delivers the replies.
+    on_reply(description, report or exception) is called per query as it completes.
+    Returns a DeviceInfo; values that did not arrive are "N/A".
+    """
+    futures = []
+    for command, desc in INFO_QUERIES:
+        future = router.add(command, concurrent.futures.Future())
+        device.write(QUERY_COMMANDS[command])
+        futures.append((command, desc, future))
+
+    deadline = time.monotonic() + timeout
+    values = []
+    for command, desc, future in futures:
+        try:
+            report = future.result(max(0.0, deadline - time.monotonic()))
+            values.append(format_reply(command, report))
+            if on_reply:
+                on_reply(desc, report)
+        except Exception as e:  # Timeout, unknown command, device lost
+            router.discard(command, future)
+            values.append("N/A")
+            if on_reply:
+                on_reply(desc, e if str(e) else TimeoutError(f"no reply within {timeout:g} s"))
+    return DeviceInfo(*values, queried_at=time.time())
+
+
+class DeviceInfoCache:
+    """Last DeviceInfo per receiver serial (thread-safe)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, info):
+        if not key or "N/A" in info[:3]:
+            return  # Incomplete answers are asked again next time
+        with self._lock:
+            self._entries[key] = info
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,144 @@
+"""
+Remote profile registry shared by the GUI and the CLI.
+
+Each remote family is described by a data file in profiles/ (JSON, or TOML
+on Python 3.11+):
+
+    {
+        "name": "White Remote (Scanmode 1)",
+        "image": "white",
+        "display": {"background": "white", "foreground": "black"},
+        "buttons": [{"name": "Short Pause", "code": "0xFE017F80"}, ...]
+    }
+
+All profiles are compiled into one decode index mapping a raw NEC code to
+(profile, button, bit position). The index is bucketed by the NEC address
+byte (the low byte of IRremote's decodedRawData), so a lookup is two dict
+hits no matter how many remote families are loaded.
+"""
+import json
+import os
+from typing import NamedTuple
+
+try:
+    import tomllib  # Python 3.11+
+    TOML_AVAILABLE = True
+except ImportError:
+    TOML_AVAILABLE = False
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+
+def nec_address(code):
+    """NEC address byte of a raw code (decodedRawData is LSB first: addr, ~addr, cmd, ~cmd)"""
+    return code & 0xFF
+
+
+class Profile:
+    """One remote family: its buttons in checklist order"""
+
+    def __init__(self, name, buttons, image=None, display=None, source=None):
+        self.name = name
+        self.buttons = list(buttons)  # [(code, button name)], bit i = buttons[i]
+        self.image = image            # Key into virc_images.REMOTE_IMAGES
+        self.display = display or {}  # Colors of the text fallback when there is no image
+        self.source = source
+        self.all_mask = (1 << len(self.buttons)) - 1
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, {len(self.buttons)} buttons)"
+
+    def button_map(self):
+        """{code: button name} in checklist order"""
+        return dict(self.buttons)
+
+
+class CodeEntry(NamedTuple):
+    code: int
+    profile: Profile
+    button: str
+    bit: int
+
+
+class ProfileRegistry:
+    """All known remote profiles and the compiled code -> CodeEntry index"""
+
+    def __init__(self, profiles=()):
+        self.profiles = {}
+        self._by_address = {}  # NEC address byte -> {raw code: CodeEntry}
+        for profile in profiles:
+            self.add(profile)
+
+    def add(self, profile):
+        if profile.name in self.profiles:
+            raise ValueError(f"Duplicate remote profile name: {profile.name}")
+        entries = {}
+        for bit, (code, button) in enumerate(profile.buttons):
+            existing = self.lookup(code)
+            if existing is not None or code in entries:
+                owner = existing.profile.name if existing else profile.name
+                raise ValueError(f"IR code 0x{code:08X} of {profile.name} is already used by {owner}")
+            entries[code] = CodeEntry(code, profile, button, bit)
+
+        self.profiles[profile.name] = profile
+        for code, entry in entries.items():
+            self._by_address.setdefault(nec_address(code), {})[code] = entry
+
+    def lookup(self, code):
+        """CodeEntry for a raw IR code, or None if no profile knows it"""
+        bucket = self._by_address.get(code & 0xFF)
+        if bucket is None:
+            return None
+        return bucket.get(code)
+
+    def get(self, name):
+        return self.profiles.get(name)
+
+    def __iter__(self):
+        return iter(self.profiles.values())
+
+    def __len__(self):
+        return len(self.profiles)
+
+
+def _parse_code(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def load_profile(path):
+    """Read one profile data file (.json or .toml)"""
+    if path.endswith(".toml"):
+        if not TOML_AVAILABLE:
+            raise ValueError(f"TOML profiles need Python 3.11+: {path}")
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+    try:
+        buttons = [(_parse_code(b["code"]), b["name"]) for b in data["buttons"]]
+        return Profile(data["name"], buttons, image=data.get("image"),
+                       display=data.get("display"), source=path)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid remote profile {path}: {e}") from e
+
+
+def load_registry(directory=PROFILE_DIR):
+    """Compile every profile file of a directory (sorted by file name) into a registry"""
+    registry = ProfileRegistry()
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith((".json", ".toml")):
+            registry.add(load_profile(os.path.join(directory, filename)))
+    return registry
+
+
+_default_registry = None
+
+
+def default_registry():
+    """Registry of the bundled profiles/ directory, loaded once"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = load_registry()
+    return _default_registry
@@ -0,0 +1,250 @@
+"""
+VIRC HID report protocol (see virc_firmware/virc_firmware.ino).
+
+Host -> device: 2-byte output report [0x00, command]
+Device -> host: 64-byte input report [report ID, 0, payload...]
+
+    command 1 -> report 2, payload[0] = device type
+    command 3 -> report 4, payload = API version major, minor[, active report format]
+    command 5 -> report 6, payload = firmware version major, minor
+    command 9 -> report 10, payload[0] = raw timing diagnostics on (API 2.1)
+    unknown   -> report 0
+    IR code   -> report 7, payload = 32-bit NEC code, little-endian (format 1)
+    IR events -> report 8, batch of up to 5 events (format 2)
+    IR timing -> report 11, raw mark/space durations in chunks (diagnostics)
+
+Format 2 is negotiated with the API version query: a host that parses it
+sends [0x00, 3, 2] (API_V2_REQUEST). API 2.x firmware switches to report 8
+and answers with the active format in payload[2]; older firmware ignores
+the extra byte and keeps sending report 7, so hosts accept both. Report 8:
+
+    byte 0      8
+    byte 1      number of events (1..5)
+    bytes 2..   per event, 12 bytes: sequence number (u16), flags (u8), 0,
+                device time in µs (u32, wraps every ~71 min), NEC code (u32),
+                all little-endian
+
+The sequence number counts every event the receiver decoded, so a gap means
+events were lost; FLAG_REPEAT marks an NEC repeat frame (button still held,
+code = the held code), FLAG_OVERFLOW the first event after the receiver's
+queue overflowed.
+
+Raw timing diagnostics: [0x00, 9, 1] turns them on, [0x00, 9, 2] off, [0x00, 9]
+only asks. Hosts pad output reports with zeros, so a value byte of 0 only asks
+too (and [0x00, 3] padded to [0x00, 3, 0] keeps the report format). While on
+(and in format 2), every decoded frame is followed by the mark/space durations
+IRremote measured, in 50 µs ticks converted to µs, split over report 11 chunks:
+
+    byte 0      11
+    byte 1      chunk index
+    byte 2      chunk count
+    byte 3      durations in this chunk (1..29)
+    bytes 4..5  sequence number of the frame's event (u16)
+    bytes 6..   durations in µs (u16 each), mark first, little-endian
+
+A full NEC frame (header mark + space, 32 bits, stop mark) is 67 durations,
+3 chunks. A new frame replaces chunks not sent yet, so a frame is complete
+only if all its chunks arrive.
+
+The single-report helpers index the report directly, so they work on the
+list hidapi returns as well as on bytes/bytearray/memoryview, and build no
+intermediate objects. decode_reports() turns a buffer of N concatenated
+64-byte reports into NumPy views of report IDs and codes without copying.
+NumPy is only imported by the first bulk decode (load_numpy()): importing it
+takes longer than the rest of the station's startup.
+"""
+import functools
+import importlib.util
+import struct
+from typing import NamedTuple
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+REPORT_SIZE = 64
+
+CMD_DEVICE_TYPE = 1
+CMD_API_VERSION = 3
+CMD_FW_VERSION = 5
+CMD_RAW_TIMING = 9
+
+REPORT_UNKNOWN_COMMAND = 0
+REPORT_DEVICE_TYPE = 2
+REPORT_API_VERSION = 4
+REPORT_FW_VERSION = 6
+REPORT_IR_CODE = 7
+REPORT_IR_BATCH = 8
+REPORT_RAW_TIMING_STATE = 10
+REPORT_RAW_TIMING = 11
+
+# Report formats (API version majors)
+FORMAT_V1 = 1
+FORMAT_V2 = 2
+
+BATCH_EVENTS = 5
+BATCH_EVENT = struct.Struct("<HBxII")  # seq, flags, pad, device µs, code
+FLAG_REPEAT = 0x01
+FLAG_OVERFLOW = 0x02
+
+TIMING_HEADER = struct.Struct("<BBBBH")  # report ID, chunk index, chunk count, durations, event seq
+TIMING_VALUES = (REPORT_SIZE - TIMING_HEADER.size) // 2
+
+# Reply report ID for each query command
+QUERY_REPLIES = {
+    CMD_DEVICE_TYPE: REPORT_DEVICE_TYPE,
+    CMD_API_VERSION: REPORT_API_VERSION,
+    CMD_FW_VERSION: REPORT_FW_VERSION,
+    CMD_RAW_TIMING: REPORT_RAW_TIMING_STATE,
+}
+
+# Prebuilt output reports (report ID 0 + command byte)
+QUERY_COMMANDS = {cmd: bytes((0, cmd)) for cmd in QUERY_REPLIES}
+
+# API version query that also asks for report format 2
+API_V2_REQUEST = bytes((0, CMD_API_VERSION, FORMAT_V2))
+TIMING_QUERY = 0
+TIMING_ON = 1
+TIMING_OFF = 2
+RAW_TIMING_ON = bytes((0, CMD_RAW_TIMING, TIMING_ON))
+RAW_TIMING_OFF = bytes((0, CMD_RAW_TIMING, TIMING_OFF))
+
+
+def load_numpy(purpose="bulk decoding"):
+    """The numpy module, imported on first use"""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError(f"NumPy is required for {purpose}: pip install numpy")
+    import numpy
+    return numpy
+
+
+@functools.lru_cache(maxsize=None)
+def report_dtype(report_size=REPORT_SIZE):
+    """One report: ID, pad, little-endian code, rest. Fields are views, not copies."""
+    return load_numpy().dtype([('report_id', 'u1'), ('pad', 'u1'), ('code', '<u4'),
+                               ('payload', 'V%d' % (report_size - 6))])
+
+
+class IREvent(NamedTuple):
+    seq: int
+    flags: int
+    time_us: int   # Device clock, wraps at 2**32
+    code: int
+
+    @property
+    def repeat(self):
+        return bool(self.flags & FLAG_REPEAT)
+
+
+def is_ir_report(report):
+    return bool(report) and report[0] in (REPORT_IR_CODE, REPORT_IR_BATCH)
+
+
+def decode_ir_code(report):
+    """32-bit NEC code of a report ID 7 (bytes 2..5, little-endian)"""
+    return report[2] | (report[3] << 8) | (report[4] << 16) | (report[5] << 24)
+
+
+def decode_version(report):
+    """(major, minor) of an API/firmware version reply"""
+    return report[2], report[3]
+
+
+def reply_format(report):
+    """Report format the receiver uses after an API version reply (older firmware: 1)"""
+    return report[4] if len(report) > 4 and report[4] else FORMAT_V1
+
+
+def decode_ir_batch(report):
+    """IREvents of a report 8 (list from hidapi, bytes, ...)"""
+    count = min(report[1], BATCH_EVENTS, (len(report) - 2) // BATCH_EVENT.size)
+    data = bytes(report[2:2 + count * BATCH_EVENT.size])
+    return list(map(IREvent._make, BATCH_EVENT.iter_unpack(data)))
+
+
+def encode_ir_batch(events):
+    """Report 8 of up to BATCH_EVENTS IREvents, byte for byte as the firmware builds it"""
+    report = bytearray(REPORT_SIZE)
+    report[0] = REPORT_IR_BATCH
+    report[1] = len(events)
+    for i, event in enumerate(events):
+        BATCH_EVENT.pack_into(report, 2 + i * BATCH_EVENT.size, event.seq & 0xFFFF, event.flags,
+                              event.time_us & 0xFFFFFFFF, event.code & 0xFFFFFFFF)
+    return report
+
+
+class EventSequence:
+    """Lost-event count and unwrapped device time of one receiver's report 8 stream"""
+
+    def __init__(self):
+        self.next_seq = None
+        self.lost = 0
+        self.events = 0
+        self._last_us = None
+        self._wrap_us = 0
+
+    def feed(self, report):
+        """[(IREvent, device time in ns)] of one report 8; updates self.lost"""
+        result = []
+        for event in decode_ir_batch(report):
+            seq, time_us = event.seq, event.time_us
+            if seq != self.next_seq and self.next_seq is not None:
+                gap = (seq - self.next_seq) & 0xFFFF
+                if gap < 0x8000:
+                    self.lost += gap
+                else:
+                    self._last_us = None  # Sequence went back: the receiver restarted
+            self.next_seq = (seq + 1) & 0xFFFF
+            last_us = self._last_us
+            if last_us is None:
+                self._wrap_us = 0
+            elif time_us < last_us and last_us - time_us > 1 << 31:
+                self._wrap_us += 1 << 32
+            self._last_us = time_us
+            result.append((event, (self._wrap_us + time_us) * 1000))
+        self.events += len(result)
+        return result
+
+
+def encode_timing_chunks(seq, durations):
+    """Report 11 chunks of one frame's durations (µs), byte for byte as the firmware builds them"""
+    durations = [min(max(int(d), 0), 0xFFFF) for d in durations]
+    count = max(1, -(-len(durations) // TIMING_VALUES))
+    reports = []
+    for index in range(count):
+        values = durations[index * TIMING_VALUES:(index + 1) * TIMING_VALUES]
+        report = bytearray(REPORT_SIZE)
+        TIMING_HEADER.pack_into(report, 0, REPORT_RAW_TIMING, index, count, len(values), seq & 0xFFFF)
+        struct.pack_into("<%dH" % len(values), report, TIMING_HEADER.size, *values)
+        reports.append(report)
+    return reports
+
+
+def decode_timing_chunk(report):
+    """(event seq, chunk index, chunk count, durations in µs) of a report 11"""
+    _, index, count, n, seq = TIMING_HEADER.unpack_from(bytes(report[:TIMING_HEADER.size]))
+    n = min(n, TIMING_VALUES, (len(report) - TIMING_HEADER.size) // 2)
+    data = bytes(report[TIMING_HEADER.size:TIMING_HEADER.size + 2 * n])
+    return seq, index, count, struct.unpack("<%dH" % n, data)
+
+
+def format_raw_bytes(report, count=6):
+    """Raw report bytes as shown in the log; only called when a log line is rendered"""
+    return f"Raw bytes: {[hex(report[i]) for i in range(min(count, len(report)))]}"
+
+
+def decode_reports(buffer, report_size=REPORT_SIZE):
+    """Bulk-decode N concatenated reports: (report IDs, codes) as NumPy arrays
+
+    The arrays are strided views into `buffer` (bytes, bytearray, memoryview,
+    mmap...), so nothing is copied. Codes are only meaningful where the report
+    ID is REPORT_IR_CODE; see ir_codes() for just those.
+    """
+    np = load_numpy()
+    usable = len(buffer) - len(buffer) % report_size
+    records = np.frombuffer(buffer, dtype=report_dtype(report_size), count=usable // report_size)
+    return records['report_id'], records['code']
+
+
+def ir_codes(buffer, report_size=REPORT_SIZE):
+    """NEC codes of all IR reports (ID 7) in a buffer of concatenated reports"""
+    report_ids, codes = decode_reports(buffer, report_size)
+    return codes[report_ids == REPORT_IR_CODE]
@@ -0,0 +1,152 @@
+"""
+QC checklist engine, without a UI.
+
+One QCLane per receiver owns its test session; the station window, the
+headless station (virc_station.py) and the benchmarks only feed it presses
+and subscribe to what it emits. The rules:
+
+    first press of a known code   the remote type is detected from it and its
+                                  checklist starts (that button passes)
+    press of a pending button     passes; the last one finishes the remote as PASS
+    press of a passed button      repeat, ignored
+    code of another remote        the unfinished remote is finished as FAIL and
+                                  the new remote's checklist starts
+    unknown code                  unexpected, ignored
+    no press for idle_timeout_s   the unfinished remote is finished as FAIL
+
+Session state is a bitmask: a press sets its CodeEntry.bit, the remote is
+complete when the mask equals Profile.all_mask, and the passed count is
+kept alongside, so a press costs the same whatever the checklist length.
+
+Every listener is called as listener(kind, lane, **fields):
+
+    detected    remote, buttons
+    pass        code, button, passed, buttons
+    repeat      code, button
+    unexpected  code
+    verdict     record (virc_history.SessionRecord), reason: "complete",
+                "idle" or "switched" (another remote showed up)
+
+With rearm (the default) the lane forgets a remote right after its verdict
+and the next press starts the next one, like batch mode. Without it the
+finished checklist stays (verdict, outcome()) until clear(): presses of the
+same remote are repeats, another remote starts a new session. A session
+abandoned before its verdict (operator reset) is just cleared: it was never
+completed, so it gets no verdict and no record.
+"""
+import time
+
+from virc_history import FAIL, PASS, ButtonResult, SessionRecord
+
+IDLE_TIMEOUT_S = 30.0
+
+PENDING = "pending"
+PASSED = "pass"
+FAILED = "fail"
+
+
+class QCLane:
+    """Checklist state of one receiver (one thread or event loop only)"""
+
+    def __init__(self, name, serial, station, emit=None, idle_timeout_s=IDLE_TIMEOUT_S, rearm=True):
+        self.name = name
+        self.serial = serial
+        self.station = station
+        self.listeners = [emit] if emit else []
+        self.idle_timeout_s = idle_timeout_s
+        self.rearm = rearm
+        self.clear()
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def _emit(self, kind, **fields):
+        for listener in self.listeners:
+            listener(kind, self, **fields)
+
+    def clear(self):
+        """Forget the remote (finished or not, nothing is emitted); the next press starts a session"""
+        self.profile = None         # Remote under test
+        self.passed_mask = 0        # Bit i set: profile.buttons[i] passed
+        self.passed = 0
+        self.press_times = {}       # Code -> seconds from the first press
+        self.scores = {}            # Code -> signal quality score, set by the station (raw timing)
+        self.started = None         # Time of the first press (event clock)
+        self.last_press = None      # time.monotonic() of the last press
+        self.verdict = None         # PASS / FAIL once finished (rearm off)
+        self.record = None          # SessionRecord of the finished remote (rearm off)
+
+    @property
+    def buttons(self):
+        return len(self.profile.buttons) if self.profile else 0
+
+    @property
+    def running(self):
+        """A remote is under test and has no verdict yet"""
+        return self.profile is not None and self.verdict is None
+
+    def outcome(self, bit):
+        """"pass", "pending" or (once finished) "fail" of the profile's button `bit`"""
+        if self.passed_mask >> bit & 1:
+            return PASSED
+        return PENDING if self.verdict is None else FAILED
+
+    def results(self):
+        """[(code, button name, outcome)] of the checklist, in profile order"""
+        return [(code, name, self.outcome(bit)) for bit, (code, name) in enumerate(self.profile.buttons)] \
+            if self.profile else []
+
+    def press(self, code, entry, event_time=None):
+        """One debounced button press (entry: the code's virc_profiles.CodeEntry or None)"""
+        event_time = time.time() if event_time is None else event_time
+        if entry is None:
+            self._emit("unexpected", code=code)
+            return
+        profile = entry.profile
+        if profile is not self.profile:
+            if self.running:
+                self.finish(FAIL, "switched")  # Another remote showed up before this one was done
+            self.clear()
+            self.profile = profile
+            self.started = event_time
+            self._emit("detected", remote=profile.name, buttons=len(profile.buttons))
+        elif self.verdict is not None:
+            self._emit("repeat", code=code, button=entry.button)  # Finished, waiting for clear()
+            return
+        self.last_press = time.monotonic()
+
+        bit = 1 << entry.bit
+        if self.passed_mask & bit:
+            self._emit("repeat", code=code, button=entry.button)
+            return
+        self.passed_mask |= bit
+        self.passed += 1
+        self.press_times[code] = event_time - self.started
+        self._emit("pass", code=code, button=entry.button, passed=self.passed, buttons=len(profile.buttons))
+        if self.passed_mask == profile.all_mask:
+            self.finish(PASS, "complete")
+
+    def check_idle(self, now=None):
+        """Finish the remote as FAIL if nobody pressed a button for idle_timeout_s; True if it did"""
+        now = time.monotonic() if now is None else now
+        if self.running and self.idle_timeout_s and now - self.last_press >= self.idle_timeout_s:
+            self.finish(FAIL, "idle")
+            return True
+        return False
+
+    def finish(self, verdict, reason):
+        """Emit the verdict of the remote under test"""
+        if not self.running:
+            return
+        # Same clock as the presses (a replay keeps its recorded times): finished at the last pass
+        finished = self.started + max(self.press_times.values(), default=0.0)
+        buttons = tuple(ButtonResult(code, name, PASSED if self.passed_mask >> bit & 1 else FAILED,
+                                     self.press_times.get(code), self.scores.get(code))
+                        for bit, (code, name) in enumerate(self.profile.buttons))
+        record = SessionRecord(self.started, finished, self.station, self.name, self.serial,
+                               self.profile.name, verdict, buttons)
+        self.verdict = verdict
+        self.record = record
+        self._emit("verdict", record=record, reason=reason)
+        if self.rearm and self.record is record:
+            self.clear()
@@ -0,0 +1,392 @@
+"""
+Headless QC station: the station window's test mode without a window.
+
+Every receiver gets the same checklist rules as the GUI (virc_qc.QCLane):
+the remote type is detected from its first press, each button passes once,
+and the remote gets its verdict when the last button passed (PASS) or
+after --idle-timeout seconds without a press (FAIL). It then waits for the
+next remote, like batch mode. Verdicts go into the QC history as usual.
+
+Everything is written as JSON lines (one object per line, flushed at once)
+to stdout or --output, each with "event" and "time" (ISO 8601, UTC):
+
+    station_start / station_stop    station name, receivers, verdict counts on stop
+    receiver            receiver opened (serial, api, firmware)
+    receiver_lost       reads failed; it is looked for again right away
+    receiver_recovered  back, with recovery_ms
+    receiver_finished   end of a replayed capture
+    ir / hold           every debounced press / a held button (not with --verdicts-only)
+    events_lost         gap in the receiver's event sequence (format 2 firmware)
+    detected / pass / repeat / unexpected   checklist progress
+    verdict             remote, PASS / FAIL, reason (complete / idle / switched),
+                        duration_s and every button's outcome
+    recorded            session_id of a verdict once it is in the history
+                        (virc_export.py --session ID exports just that one)
+    upload              collector (--collector) reachable / unreachable, or a rejected batch
+
+No Tk, no images: the imports are the asyncio client and the history. It
+runs until SIGINT / SIGTERM (or every replayed receiver finished), then
+writes the queued history, reports the remotes it left unfinished (not
+recorded, they were never done) and exits 0, so a service manager can
+restart it at any time:
+
+    python virc_station.py                                  # HID receivers, JSON lines on stdout
+    python virc_station.py --output /var/log/virc/qc.jsonl --station LINE-3
+    python virc_station.py --emulate 2 --no-history --verdicts-only
+    python virc_station.py --collector http://qc-server:8750  # Also upload every verdict (virc_collector.py)
+    python virc_station.py --metrics-port 9750               # Prometheus metrics (virc_metrics.py)
+"""
+import argparse
+import asyncio
+import functools
+import json
+import signal
+import sys
+import time
+from datetime import datetime, timezone
+
+from virc_async import VIRCClient
+from virc_debounce import HOLD, HOLD_MS, PRESS, REPEAT_MS, Debouncer
+from virc_history import DEFAULT_DB, HistoryWriter, station_name
+from virc_hotplug import PRESENCE_INTERVAL_S, REATTACH_MAX_S, DeviceRegistry, RecoveryStats
+from virc_profiles import default_registry
+from virc_qc import IDLE_TIMEOUT_S, QCLane
+from virc_transport import add_transport_arguments, transport_from_args
+
+IDLE_CHECK_S = 0.5
+INFO_TIMEOUT_S = 1.0
+VERDICT_EVENTS = {"station_start", "station_stop", "receiver", "receiver_lost", "receiver_recovered",
+                  "receiver_finished", "receiver_error", "history_error", "upload", "verdict", "recorded"}
+
+
+def iso_time(timestamp=None):
+    return datetime.fromtimestamp(time.time() if timestamp is None else timestamp, timezone.utc).isoformat(
+        timespec="milliseconds")
+
+
+def verdict_fields(record):
+    """JSON fields of a finished session (virc_history.SessionRecord)"""
+    return {
+        'remote': record.remote,
+        'verdict': record.verdict,
+        'passed': record.passed,
+        'buttons': len(record.buttons),
+        'started': iso_time(record.started),
+        'duration_s': round(record.duration_s, 3),
+        'results': [{'button': b.button, 'code': f"0x{b.code:08X}", 'outcome': b.outcome,
+                     'press_s': None if b.press_s is None else round(b.press_s, 3)} for b in record.buttons],
+    }
+
+
+class HeadlessStation:
+    """QC lanes of every receiver on one event loop, JSON lines out"""
+
+    def __init__(self, transport, output, registry=None, history=None, station=None,
+                 idle_timeout_s=IDLE_TIMEOUT_S, verdicts_only=False, repeat_ms=REPEAT_MS, hold_ms=HOLD_MS,
+                 metrics=None):
+        self.transport = transport
+        self.output = output
+        self.registry = registry or default_registry()
+        self.history = history
+        self.station = station or station_name()
+        self.idle_timeout_s = idle_timeout_s
+        self.verdicts_only = verdicts_only
+        self.repeat_ms = repeat_ms
+        self.hold_ms = hold_ms
+        self.lanes = {}         # Receiver key -> QCLane (kept across reconnects)
+        self.debouncers = {}    # Receiver key -> Debouncer
+        self.tasks = {}         # Receiver key -> task reading it
+        self.lost_at = {}       # Receiver key -> time.monotonic() it was lost
+        self.finished = set()   # Receivers whose replay ended
+        self.recovery = RecoveryStats()
+        self.verdicts = {'PASS': 0, 'FAIL': 0}
+        self.stopping = None
+        self.stop_reported = False
+        # Metrics (virc_metrics.StationMetrics): read timeouts of the open clients plus the ones closed before
+        self.metrics = metrics
+        self.clients = {}       # Receiver key -> open VIRCClient
+        self.read_timeouts = {}  # Receiver key -> read timeouts of its earlier clients
+        self.event_ns = None    # received_ns of the event being checked, for event -> verdict latency
+        if metrics:
+            self.register_metrics(metrics)
+
+    def register_metrics(self, metrics):
+        def per_receiver(value):
+            return lambda: [({'receiver': self.lanes[key].name}, value(key)) for key in list(self.lanes)]
+
+        metrics.register_receivers(
+            receivers=lambda: len(self.clients),
+            ir_events=per_receiver(lambda key: self.debouncers[key].totals()[0]),
+            suppressed=per_receiver(lambda key: self.debouncers[key].totals()[1]),
+            read_timeouts=per_receiver(lambda key: self.read_timeouts.get(key, 0) + getattr(
+                self.clients.get(key), 'read_timeouts', 0)),
+            recovery_stats=self.recovery)
+
+    def emit(self, event, **fields):
+        if self.verdicts_only and event not in VERDICT_EVENTS:
+            return
+        self.output.write(json.dumps({'event': event, 'time': iso_time(), **fields}, ensure_ascii=False) + "\n")
+        self.output.flush()
+
+    def on_qc(self, kind, lane, **fields):
+        """QCLane callback: checklist progress and verdicts"""
+        if kind == "verdict":
+            record = fields.pop('record')
+            self.verdicts[record.verdict] += 1
+            if self.metrics:
+                latency = (time.monotonic_ns() - self.event_ns) / 1e9 if self.event_ns else None
+                self.metrics.verdict(record.remote, record.verdict, latency)
+            if self.history:
+                self.history.record(record)
+            fields.update(verdict_fields(record))
+        if 'code' in fields:
+            fields['code'] = f"0x{fields['code']:08X}"
+        self.emit(kind, receiver=lane.name, **fields)
+
+    def recorded(self, sessions):
+        """History writer committed [(session id, SessionRecord)]"""
+        for session_id, record in sessions:
+            self.emit("recorded", receiver=record.receiver, session_id=session_id, remote=record.remote,
+                      verdict=record.verdict)
+
+    def stop(self):
+        if self.stopping:
+            self.stopping.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        self.emit("station_start", station=self.station, transport=self.transport.description,
+                  history=self.history.path if self.history else None, idle_timeout_s=self.idle_timeout_s)
+        workers = [asyncio.create_task(self.discover()), asyncio.create_task(self.check_idle())]
+        try:
+            await self.stopping.wait()
+        finally:
+            for task in workers + list(self.tasks.values()):
+                task.cancel()
+            await asyncio.gather(*workers, *self.tasks.values(), return_exceptions=True)
+            self.report_stop()
+
+    def report_stop(self):
+        """station_stop line, once: the end of run(), or main() if run() was cut short"""
+        if self.stop_reported:
+            return
+        self.stop_reported = True
+        unfinished = [{'receiver': lane.name, 'remote': lane.profile.name, 'passed': lane.passed}
+                      for lane in self.lanes.values() if lane.profile is not None]
+        self.emit("station_stop", station=self.station, receivers=len(self.lanes), verdicts=self.verdicts,
+                  unfinished=unfinished, reconnects=self.recovery.summary())
+
+    async def discover(self):
+        """Open every receiver that shows up; lost ones are looked for again at the reattach rate"""
+        loop = asyncio.get_running_loop()
+        registry = DeviceRegistry()
+        while not self.stopping.is_set():
+            try:
+                await loop.run_in_executor(None, registry.scan, self.transport)
+            except Exception as e:
+                self.emit("receiver_error", error=str(e))
+            for key, info in registry.receivers.items():
+                if key not in self.tasks and key not in self.finished:
+                    self.tasks[key] = asyncio.create_task(self.run_receiver(key, info), name=f"VIRC station {key}")
+            if self.finished and not self.tasks and all(key in self.finished for key in registry.receivers):
+                self.stop()  # Every replayed capture ended
+                return
+            try:
+                await asyncio.wait_for(self.stopping.wait(),
+                                       REATTACH_MAX_S if self.lost_at else PRESENCE_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_receiver(self, key, info):
+        client = VIRCClient(self.transport, info, self.registry)
+        if key in self.lost_at:
+            self.recovery.attempts += 1
+        try:
+            try:
+                await client.open()
+            except OSError as e:
+                self.emit("receiver_error", receiver=client.name, error=str(e))
+                return  # Tried again at the next scan
+            lane = self.lanes.get(key)
+            if lane is None:
+                self.debouncers[key] = Debouncer(self.repeat_ms, self.hold_ms)
+                lane = self.lanes[key] = QCLane(client.name, info.get('serial_number') or "", self.station, self.on_qc,
+                                                self.idle_timeout_s)
+            self.clients[key] = client
+            if key in self.lost_at:
+                seconds = time.monotonic() - self.lost_at.pop(key)
+                self.recovery.recovered(key, seconds, 0)
+                if self.metrics:
+                    self.metrics.recovery.observe(seconds)
+                self.emit("receiver_recovered", receiver=client.name, recovery_ms=round(seconds * 1000, 1))
+            await self.announce(client, info)
+
+            try:
+                await self.read_events(client, lane, self.debouncers[key])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.lost_at[key] = time.monotonic()
+                self.recovery.lost()
+                self.emit("receiver_lost", receiver=client.name, error=str(e))
+            else:
+                self.finished.add(key)
+                self.emit("receiver_finished", receiver=client.name, events=client.events_received)
+        finally:
+            if self.clients.get(key) is client:
+                del self.clients[key]
+                self.read_timeouts[key] = self.read_timeouts.get(key, 0) + client.read_timeouts
+            await client.close()
+            if self.tasks.get(key) is asyncio.current_task():
+                del self.tasks[key]
+
+    async def announce(self, client, info):
+        fields = {'receiver': client.name, 'product': info.get('product_string')}
+        if self.transport.answers_queries:
+            api, firmware = await asyncio.gather(client.api_version(INFO_TIMEOUT_S),
+                                                 client.firmware_version(INFO_TIMEOUT_S), return_exceptions=True)
+            fields['api'] = None if isinstance(api, Exception) else "%d.%d" % api
+            fields['firmware'] = None if isinstance(firmware, Exception) else "%d.%d" % firmware
+        self.emit("receiver", **fields)
+
+    async def read_events(self, client, lane, debouncer):
+        lost = client.sequence.lost
+        async for event in client.events():
+            if client.sequence.lost != lost:
+                self.emit("events_lost", receiver=lane.name, count=client.sequence.lost - lost)
+                lost = client.sequence.lost
+            press = debouncer.feed(event.code, event.device_ns if event.device_ns is not None else event.received_ns)
+            if press == HOLD:
+                self.emit("hold", receiver=lane.name, code=f"0x{event.code:08X}", button=event.button)
+            if press != PRESS:
+                continue
+            self.emit("ir", receiver=lane.name, code=f"0x{event.code:08X}", button=event.button,
+                      remote=event.entry.profile.name if event.entry else None)
+            self.event_ns = event.received_ns
+            lane.press(event.code, event.entry)
+            self.event_ns = None
+
+    async def check_idle(self):
+        while True:
+            await asyncio.sleep(IDLE_CHECK_S)
+            now = time.monotonic()
+            for lane in self.lanes.values():
+                lane.check_idle(now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VIRC headless QC station: checklist verdicts as JSON lines")
+    parser.add_argument("--output", metavar="FILE", help="append the JSON lines to this file (default: stdout)")
+    parser.add_argument("--verdicts-only", action="store_true",
+                        help="only station, receiver and verdict events (no presses or checklist progress)")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT_S, metavar="SECONDS",
+                        help=f"finish a remote as FAIL after this long without a press (default: {IDLE_TIMEOUT_S:g})")
+    parser.add_argument("--history", metavar="FILE", default=DEFAULT_DB,
+                        help=f"SQLite database every verdict is recorded to (default: {DEFAULT_DB})")
+    parser.add_argument("--no-history", action="store_true", help="do not record test sessions")
+    parser.add_argument("--station", help="station name stored with every session (default: VIRC_STATION or host name)")
+    parser.add_argument("--collector", metavar="URL",
+                        help="upload every recorded session to a central collector, e.g. http://qc-server:8750")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on http://HOST:PORT/metrics (default: off)")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="address of the metrics endpoint (default: 127.0.0.1, 0.0.0.0 for a remote Prometheus)")
+    parser.add_argument("--repeat-ms", type=float, default=REPEAT_MS,
+                        help=f"reports of the same code closer than this are one press (default: {REPEAT_MS})")
+    parser.add_argument("--hold-ms", type=float, default=HOLD_MS,
+                        help=f"a press repeating for this long is reported as held (default: {HOLD_MS})")
+    add_transport_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        transport = transport_from_args(args)
+    except (RuntimeError, OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    history = None
+    if not args.no_history:
+        try:
+            history = HistoryWriter(args.history).start()
+        except Exception as e:
+            print(f"QC history disabled, cannot open {args.history}: {e}", file=sys.stderr)
+
+    uploader = None
+    if history and args.collector:
+        from virc_upload import ResultUploader
+        try:
+            uploader = ResultUploader(args.history, args.collector)
+        except Exception as e:
+            print(f"Uploads to {args.collector} disabled: {e}", file=sys.stderr)
+    elif args.collector:
+        print("Uploads to the collector need the QC history (--no-history given)", file=sys.stderr)
+
+    metrics = metrics_server = None
+    if args.metrics_port is not None:
+        from virc_metrics import MetricsServer, StationMetrics
+        metrics = StationMetrics(args.station or station_name(), "headless")
+
+    station = HeadlessStation(transport, output, history=history, station=args.station,
+                              idle_timeout_s=args.idle_timeout, verdicts_only=args.verdicts_only,
+                              repeat_ms=args.repeat_ms, hold_ms=args.hold_ms, metrics=metrics)
+    if metrics:
+        try:
+            metrics_server = MetricsServer(metrics.registry, args.metrics_port, args.metrics_host).start()
+            print(f"Metrics on {metrics_server.url}", file=sys.stderr)
+        except OSError as e:
+            print(f"Metrics endpoint disabled, cannot listen on port {args.metrics_port}: {e}", file=sys.stderr)
+    loop = asyncio.new_event_loop()
+
+    def on_loop(callback, *args, **kwargs):
+        """Run a callback of the history / uploader threads on the loop, or right away once it is done"""
+        if loop.is_running():
+            loop.call_soon_threadsafe(functools.partial(callback, *args, **kwargs))
+        elif not loop.is_closed():
+            callback(*args, **kwargs)  # history.close() / uploader.close(), the main thread waits for them
+
+    if history:
+        history.on_error = lambda e: on_loop(station.emit, "history_error", error=str(e))
+
+        def committed(sessions):
+            on_loop(station.recorded, sessions)
+            if uploader:
+                uploader.wake()
+        history.on_commit = committed
+    if uploader:
+        uploader.on_status = lambda online, queued, error: on_loop(
+            station.emit, "upload", collector=uploader.url, online=online, queued=queued, error=error)
+        uploader.start()
+    run = loop.create_task(station.run())
+    try:
+        loop.run_until_complete(run)
+    except KeyboardInterrupt:
+        # Windows: Ctrl+C arrives here, not through a signal handler. Shut down like on SIGINT.
+        station.stop()
+        if station.stopping is None:
+            run.cancel()  # Not started yet
+        try:
+            if not run.done():
+                loop.run_until_complete(run)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+    finally:
+        station.report_stop()  # If run() never got to it
+        if history:
+            history.close()  # Written first, the uploader sends it on its next start
+        if uploader:
+            uploader.close()
+        if metrics_server:
+            metrics_server.close()
+        loop.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
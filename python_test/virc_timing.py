@@ -0,0 +1,230 @@
+"""
+Signal quality of IR presses from raw mark/space timing (report 11).
+
+With raw timing diagnostics on, the receiver sends the durations IRremote
+measured for every decoded frame (see virc_protocol.py). An NEC frame is
+67 durations: header mark + space, 32 bits (mark + short or long space,
+LSB first) and a stop mark. Each one is compared to its NEC nominal value:
+
+    error       |measured - expected| minus half a 50 µs tick (the receiver
+                cannot resolve better), relative to the nominal duration;
+                expected = nominal with marks MARK_EXCESS_US longer and
+                spaces that much shorter, like IRremote expects
+    margin      1 - worst error / TOLERANCE: how far the frame is from a
+                duration IRremote would no longer match (0 = at the edge)
+    jitter      spread (std) of the 33 bit marks, in µs
+    score       0..100, 60 % worst-case margin + 40 % typical (median) error
+
+A healthy remote scores 90+, a weak LED, a drifting oscillator or a dirty
+window shows up as a low score long before presses start failing.
+
+All analysis works on an (N, 67) array of frames at once, without Python
+loops per sample: analyze_frames() for bulk data, frames_from_reports() to
+pull complete frames out of a buffer of raw reports (e.g. a capture).
+
+    python virc_timing.py capture.vcap    # Quality per receiver and code
+"""
+import argparse
+import functools
+from typing import NamedTuple
+
+from virc_protocol import (REPORT_RAW_TIMING, REPORT_SIZE, TIMING_HEADER, TIMING_VALUES, decode_timing_chunk,
+                           load_numpy)
+
+# NEC durations in µs
+NEC_HEADER_MARK = 9000
+NEC_HEADER_SPACE = 4500
+NEC_BIT_MARK = 560
+NEC_ZERO_SPACE = 560
+NEC_ONE_SPACE = 1690
+NEC_BITS = 32
+NEC_DURATIONS = 2 + 2 * NEC_BITS + 1  # Header mark + space, 32 bits, stop mark
+
+# IRremote receiver constants
+TICK_US = 50            # MICROS_PER_TICK
+MARK_EXCESS_US = 20     # MARK_EXCESS_MICROS: demodulators stretch marks, shorten spaces
+TOLERANCE = 0.25        # TOLERANCE_FOR_DECODERS_MARK_OR_SPACE_MATCHING (25 %)
+
+GOOD_SCORE = 80
+WEAK_SCORE = 60
+
+
+@functools.lru_cache(maxsize=None)
+def timing_dtype():
+    """One report 11; values are durations in µs"""
+    return load_numpy("signal quality analysis").dtype([
+        ('report_id', 'u1'), ('index', 'u1'), ('count', 'u1'), ('n', 'u1'), ('seq', '<u2'),
+        ('values', '<u2', (TIMING_VALUES,)), ('pad', 'V%d' % (REPORT_SIZE - TIMING_HEADER.size - 2 * TIMING_VALUES))])
+
+
+def nec_durations(code):
+    """Nominal durations (µs) of the NEC frame of a 32-bit code"""
+    durations = [NEC_HEADER_MARK, NEC_HEADER_SPACE]
+    for bit in range(NEC_BITS):
+        durations += (NEC_BIT_MARK, NEC_ONE_SPACE if code >> bit & 1 else NEC_ZERO_SPACE)
+    durations.append(NEC_BIT_MARK)
+    return durations
+
+
+class SignalQuality(NamedTuple):
+    code: int             # Code decoded from the timing itself
+    score: float          # 0..100
+    margin: float         # 1 - worst relative error / TOLERANCE
+    max_error: float      # Worst relative error
+    median_error: float
+    jitter_us: float
+
+    def __str__(self):
+        return (f"{self.score:.0f}/100 (worst error {self.max_error:.0%}, margin {self.margin:.2f}, "
+                f"jitter {self.jitter_us:.0f} µs)")
+
+
+def grade(score):
+    """'good', 'weak' or 'poor'"""
+    return "good" if score >= GOOD_SCORE else "weak" if score >= WEAK_SCORE else "poor"
+
+
+def analyze_frames(frames, tolerance=TOLERANCE):
+    """Quality of N NEC frames, (N, 67) durations in µs -> dict of (N,) arrays
+
+    Keys: code, score, margin, max_error, median_error, jitter_us.
+    """
+    np = load_numpy("signal quality analysis")
+    frames = np.asarray(frames, dtype=np.float64).reshape(-1, NEC_DURATIONS)
+    bit_spaces = frames[:, 3::2]
+    bits = bit_spaces > (NEC_ZERO_SPACE + NEC_ONE_SPACE) / 2
+
+    nominal = np.empty_like(frames)
+    nominal[:, 0] = NEC_HEADER_MARK
+    nominal[:, 1] = NEC_HEADER_SPACE
+    nominal[:, 2::2] = NEC_BIT_MARK
+    nominal[:, 3::2] = np.where(bits, NEC_ONE_SPACE, NEC_ZERO_SPACE)
+    excess = np.where(np.arange(NEC_DURATIONS) % 2 == 0, MARK_EXCESS_US, -MARK_EXCESS_US)
+
+    error = np.maximum(np.abs(frames - (nominal + excess)) - TICK_US / 2, 0.0) / nominal
+    max_error = error.max(axis=1)
+    median_error = np.median(error, axis=1)
+    margin = 1.0 - max_error / tolerance
+    typical = 1.0 - median_error / tolerance
+    score = 100.0 * np.clip(0.6 * np.clip(margin, 0.0, 1.0) + 0.4 * np.clip(typical, 0.0, 1.0), 0.0, 1.0)
+
+    weights = np.left_shift(np.uint64(1), np.arange(NEC_BITS, dtype=np.uint64))
+    codes = (bits.astype(np.uint64) * weights).sum(axis=1).astype(np.uint32)
+    return {
+        'code': codes,
+        'score': score,
+        'margin': margin,
+        'max_error': max_error,
+        'median_error': median_error,
+        'jitter_us': frames[:, 2::2].std(axis=1),
+    }
+
+
+def signal_quality(durations):
+    """SignalQuality of one frame; None if it is not a full NEC frame"""
+    if len(durations) != NEC_DURATIONS:
+        return None
+    result = analyze_frames(durations)
+    return SignalQuality(int(result['code'][0]), *(float(result[key][0]) for key in SignalQuality._fields[1:]))
+
+
+class TimingAssembler:
+    """Joins the report 11 chunks of one receiver into frames (used by its reader thread only)"""
+
+    def __init__(self):
+        self.frames = 0
+        self.incomplete = 0    # Frames with a chunk missing (replaced by the next frame on the receiver)
+        self._seq = None
+        self._chunks = {}
+
+    def feed(self, report):
+        """(event seq, durations) once the last chunk of a frame arrived, else None"""
+        seq, index, count, values = decode_timing_chunk(report)
+        if seq != self._seq:
+            if self._chunks:
+                self.incomplete += 1
+            self._seq = seq
+            self._chunks = {}
+        self._chunks[index] = values
+        if any(i not in self._chunks for i in range(count)):
+            return None
+        durations = [d for i in range(count) for d in self._chunks[i]]
+        self._chunks = {}
+        self.frames += 1
+        return seq, durations
+
+
+def frames_from_reports(buffer, device_ids=None):
+    """Complete NEC frames in a buffer of concatenated 64-byte reports
+
+    Returns (frames (N, 67) µs, event seqs, index of each frame's first
+    chunk report). Reports of several receivers may be interleaved if
+    device_ids (one per report) is given.
+    """
+    np = load_numpy("signal quality analysis")
+    usable = len(buffer) - len(buffer) % REPORT_SIZE
+    records = np.frombuffer(buffer, dtype=timing_dtype(), count=usable // REPORT_SIZE)
+    positions = np.flatnonzero(records['report_id'] == REPORT_RAW_TIMING)
+    if device_ids is not None:
+        positions = positions[np.argsort(np.asarray(device_ids)[positions], kind='stable')]
+    chunks = records[positions]
+
+    # NEC frames are 3 chunks: 29 + 29 + 9 durations, same seq, in order
+    sizes = [TIMING_VALUES, TIMING_VALUES, NEC_DURATIONS - 2 * TIMING_VALUES]
+    start = np.ones(max(len(chunks) - 2, 0), dtype=bool)
+    for i, size in enumerate(sizes):
+        part = chunks[i:len(chunks) - 2 + i]
+        start &= (part['index'] == i) & (part['count'] == len(sizes)) & (part['n'] == size)
+        start &= part['seq'] == chunks['seq'][:len(chunks) - 2]
+        if device_ids is not None:
+            part_devices = np.asarray(device_ids)[positions[i:len(chunks) - 2 + i]]
+            start &= part_devices == np.asarray(device_ids)[positions[:len(chunks) - 2]]
+    first = np.flatnonzero(start)
+    frames = np.concatenate([chunks['values'][first + i][:, :size] for i, size in enumerate(sizes)], axis=1)
+    return frames, chunks['seq'][first], positions[first]
+
+
+def _print_capture(path):
+    from virc_capture import CaptureReader
+    from virc_profiles import default_registry
+
+    np = load_numpy("signal quality analysis")
+    registry = default_registry()
+    reader = CaptureReader(path)
+    try:
+        device_ids = np.frombuffer(reader.device_ids, dtype=np.uint16)
+        frames, _, first = frames_from_reports(reader.reports_buffer(), device_ids)
+        if not len(frames):
+            print("No raw timing frames in the capture (record with raw timing diagnostics on)")
+            return
+        result = analyze_frames(frames)
+        devices = device_ids[first]
+        print(f"{len(frames)} frames")
+        for device in np.unique(devices):
+            print(f"\n{reader.devices.get(int(device), device)}")
+            mine = devices == device
+            for code in np.unique(result['code'][mine]):
+                rows = mine & (result['code'] == code)
+                scores = result['score'][rows]
+                entry = registry.lookup(int(code))
+                name = entry.button if entry else "Unknown Button"
+                print(f"  0x{int(code):08X} {name:20} {rows.sum():5d} presses  score min {scores.min():3.0f} "
+                      f"median {np.median(scores):3.0f}  worst error {result['max_error'][rows].max():4.0%}  "
+                      f"jitter {result['jitter_us'][rows].mean():3.0f} µs  {grade(scores.min())}")
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signal quality per receiver and code of a VIRC capture")
+    parser.add_argument("capture", help="Capture file (.vcap) recorded with raw timing diagnostics on")
+    args = parser.parse_args()
+    try:
+        load_numpy("signal quality analysis")
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+    _print_capture(args.capture)
+
+
+if __name__ == "__main__":
+    main()
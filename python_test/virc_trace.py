@@ -0,0 +1,236 @@
+"""
+Per-stage latency tracing and a Tk main-loop stall watchdog.
+
+Every IR event is timestamped (time.perf_counter_ns) as it moves through the
+station:
+
+    read      device.read() call that returned the report (includes the wait)
+    decode    report -> code -> profile/button
+    debounce  duplicate check
+    enqueue   put on the UI queue (blocks while the UI is behind)
+    queue     waiting in the UI queue until the Tk thread picks it up
+    apply     log lines + remote display on the Tk thread
+    verdict   test checklist update (test mode only)
+    event     read returned -> event fully applied, end to end
+    frame     one UI frame applying a batch of events
+    stall     Tk main loop not running (watchdog)
+
+The Tracer keeps the last `window` durations per stage for rolling
+p50/p95/p99 and a bounded list of spans that can be written as Chrome
+trace-event JSON (chrome://tracing, https://ui.perfetto.dev).
+
+StartupTimer breaks the station's startup down into consecutive steps up to
+the first interactive frame, then milestones reached in the background
+(receivers found, connected, device info).
+
+StallWatchdog runs a heartbeat on the Tk loop and a thread that samples the
+Tk thread's stack as soon as the heartbeat is late by more than the
+threshold, so the report names the code that blocked the UI.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+STAGES = ("read", "decode", "debounce", "enqueue", "queue", "apply", "verdict", "event", "frame", "stall")
+
+TRACE_WINDOW = 4096        # Durations per stage kept for the rolling percentiles
+TRACE_MAX_SPANS = 200_000  # Spans kept for the Chrome trace (oldest dropped first)
+
+trace_ns = time.perf_counter_ns
+
+
+class Tracer:
+    """Rolling per-stage latency statistics and a Chrome trace of recent spans"""
+
+    def __init__(self, window=TRACE_WINDOW, max_spans=TRACE_MAX_SPANS):
+        self.origin_ns = trace_ns()
+        self.durations = {stage: deque(maxlen=window) for stage in STAGES}
+        self.counts = dict.fromkeys(STAGES, 0)
+        self.max_ns = dict.fromkeys(STAGES, 0)
+        self.spans = deque(maxlen=max_spans)  # (stage, start ns, duration ns, thread id, args)
+        self.thread_names = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage, start_ns, end_ns=None, thread_id=None, **args):
+        """Record one stage of one event (thread-safe); thread_id defaults to the calling thread"""
+        if end_ns is None:
+            end_ns = trace_ns()
+        duration = end_ns - start_ns
+        tid = thread_id or threading.get_ident()
+        with self._lock:
+            self.durations[stage].append(duration)
+            self.counts[stage] += 1
+            if duration > self.max_ns[stage]:
+                self.max_ns[stage] = duration
+            self.spans.append((stage, start_ns, duration, tid, args))
+            if thread_id is None and tid not in self.thread_names:
+                self.thread_names[tid] = threading.current_thread().name
+
+    def percentiles(self, stage):
+        """(p50, p95, p99) in ms over the rolling window, or None before the first span"""
+        with self._lock:
+            values = sorted(self.durations[stage])
+        if not values:
+            return None
+        last = len(values) - 1
+        return tuple(values[min(last, int(q * len(values)))] / 1e6 for q in (0.50, 0.95, 0.99))
+
+    def summary(self):
+        """{stage: {count, p50_ms, p95_ms, p99_ms, max_ms}} of every stage seen so far"""
+        result = {}
+        for stage in STAGES:
+            p = self.percentiles(stage)
+            if p is None:
+                continue
+            result[stage] = {'count': self.counts[stage], 'p50_ms': p[0], 'p95_ms': p[1], 'p99_ms': p[2],
+                             'max_ms': self.max_ns[stage] / 1e6}
+        return result
+
+    def format_summary(self):
+        """One text line per stage, for the log / stderr"""
+        return [f"{stage:<9} n={s['count']:<7} p50 {s['p50_ms']:8.3f} ms  p95 {s['p95_ms']:8.3f} ms  "
+                f"p99 {s['p99_ms']:8.3f} ms  max {s['max_ms']:8.3f} ms"
+                for stage, s in self.summary().items()]
+
+    def chrome_trace(self):
+        """Trace-event JSON object (complete events, µs since the tracer was created)"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            names = dict(self.thread_names)
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in names.items()]
+        for stage, start, duration, tid, args in spans:
+            events.append({
+                'name': stage, 'cat': 'virc', 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start - self.origin_ns) / 1000, 'dur': duration / 1000,
+                'args': {k: str(v) if not isinstance(v, (int, float)) else v for k, v in args.items()},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'summary': self.summary()}}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class StartupTimer:
+    """Startup steps (back to back, up to an interactive window) and later milestones, on perf_counter"""
+
+    def __init__(self, origin=None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.steps = []        # (name, ms) in order
+        self.milestones = {}   # name -> ms since origin
+        self._last = self.origin
+        self._waiting = {}     # milestone -> keys it still waits for
+
+    def step(self, name, at=None):
+        """The step `name` ended now (or at perf_counter value `at`)"""
+        at = time.perf_counter() if at is None else at
+        self.steps.append((name, (at - self._last) * 1000))
+        self._last = at
+
+    @property
+    def interactive_ms(self):
+        return (self._last - self.origin) * 1000
+
+    def mark(self, name):
+        """Milestone reached now (only the first time counts); returns its ms since origin"""
+        return self.milestones.setdefault(name, (time.perf_counter() - self.origin) * 1000)
+
+    def expect(self, name, keys):
+        """Milestone `name` is reached once done(name, key) was called for every key"""
+        if name not in self.milestones:
+            self._waiting.setdefault(name, set()).update(keys)
+
+    def done(self, name, key):
+        """True if this key completed the milestone"""
+        waiting = self._waiting.get(name)
+        if waiting is None or key not in waiting:
+            return False
+        waiting.discard(key)
+        if waiting:
+            return False
+        del self._waiting[name]
+        self.mark(name)
+        return True
+
+    def format_summary(self):
+        steps = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.steps)
+        return f"{steps} -> interactive in {self.interactive_ms:.0f} ms"
+
+
+def format_stack_short(stack_text, frames=3):
+    """Innermost frames of a formatted stack as 'file:line func' joined for a single log line"""
+    entries = []
+    for line in stack_text.splitlines():
+        line = line.strip()
+        if line.startswith('File "'):
+            path, _, rest = line[6:].partition('", line ')
+            lineno, _, func = rest.partition(", in ")
+            entries.append(f"{os.path.basename(path)}:{lineno} {func}")
+    return " <- ".join(reversed(entries[-frames:]))
+
+
+class StallWatchdog:
+    """Flags Tk main-loop stalls longer than threshold_ms, with the Tk thread's stack at the time
+
+    Create and start it on the Tk thread. on_stall(duration_s, stack_text) is
+    called from the watchdog thread once the loop runs again.
+    """
+
+    def __init__(self, root, threshold_ms=250, on_stall=None, tracer=None, beat_ms=50):
+        self.root = root
+        self.threshold_s = threshold_ms / 1000
+        self.beat_s = beat_ms / 1000
+        self.on_stall = on_stall
+        self.tracer = tracer
+        self.ui_thread_id = threading.get_ident()
+        self.last_beat_ns = trace_ns()
+        self.stalls = deque(maxlen=100)  # (start ns, duration s, stack text)
+        self.running = False
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self.last_beat_ns = trace_ns()
+        self.root.after(int(self.beat_s * 1000), self._beat)
+        self._thread = threading.Thread(target=self._watch, name="VIRC UI watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _beat(self):
+        self.last_beat_ns = trace_ns()
+        if self.running:
+            self.root.after(int(self.beat_s * 1000), self._beat)
+
+    def _sample_stack(self):
+        frame = sys._current_frames().get(self.ui_thread_id)
+        return "".join(traceback.format_stack(frame)) if frame is not None else ""
+
+    def _watch(self):
+        stalled_since = None  # Heartbeat time the stall started from
+        stack = ""
+        while self.running:
+            time.sleep(self.threshold_s / 4)
+            last_beat = self.last_beat_ns
+            late_s = (trace_ns() - last_beat) / 1e9 - self.beat_s
+            if stalled_since is None:
+                if late_s > self.threshold_s:
+                    stalled_since = last_beat
+                    stack = self._sample_stack()
+            elif last_beat != stalled_since:
+                # The loop ran again: the stall lasted until this heartbeat
+                duration = (last_beat - stalled_since) / 1e9 - self.beat_s
+                self.stalls.append((stalled_since, duration, stack))
+                if self.tracer:
+                    self.tracer.span("stall", stalled_since, last_beat, thread_id=self.ui_thread_id,
+                                     where=format_stack_short(stack))
+                if self.on_stall:
+                    self.on_stall(duration, stack)
+                stalled_since = None
@@ -0,0 +1,72 @@
+"""
+Device transports for the VIRC host software.
+
+A transport is what the GUI and the CLI use instead of calling the hid
+module directly:
+
+    transport.enumerate(vendor_id=0, product_id=0) -> [device info dict]
+    transport.open(path) -> device with read(size, timeout_ms), write(data), close()
+
+Device info dicts have the same keys as hid.enumerate() ('path',
+'serial_number', 'manufacturer_string', 'product_string', 'vendor_id',
+'product_id'), and opened devices behave like hid.device, so the listener
+code is the same for every transport:
+
+    HidTransport        real receivers through hidapi
+    EmulatorTransport   in-process receivers running the firmware protocol (virc_emulator.py)
+    ReplayTransport     receivers recorded in a capture file (virc_capture.py)
+"""
+try:
+    import hid
+    HID_AVAILABLE = True
+except ImportError:
+    HID_AVAILABLE = False
+
+
+class HidTransport:
+    """Real VIRC receivers through hidapi"""
+
+    description = "HID"
+    answers_queries = True  # Device type / version queries get a reply
+
+    def __init__(self):
+        if not HID_AVAILABLE:
+            raise RuntimeError("hidapi is required to talk to a receiver: pip install -r requirements.txt "
+                               "(or run with --emulate / --replay)")
+
+    def enumerate(self, vendor_id=0, product_id=0):
+        return list(hid.enumerate(vendor_id, product_id))
+
+    def open(self, path):
+        device = hid.device()
+        device.open_path(path)
+        return device
+
+
+def add_transport_arguments(parser):
+    """Command line options selecting the transport (shared by complete_gui.py and main.py)"""
+    group = parser.add_argument_group("device source")
+    group.add_argument("--replay", metavar="FILE", help="replay a capture file instead of opening HID devices")
+    group.add_argument("--speed", default="1", help="replay speed: 1 (recorded), 4x, ... or max (default: 1)")
+    group.add_argument("--emulate", metavar="N", type=int, default=0,
+                       help="use N emulated receivers instead of HID devices")
+    group.add_argument("--script", metavar="FILE",
+                       help="IR schedule the emulated receivers play (default: every bundled remote button)")
+    group.add_argument("--interval", type=float, default=0.5, metavar="SECONDS",
+                       help="seconds between presses of the default emulator schedule (default: 0.5)")
+    group.add_argument("--latency", type=float, default=1.0, metavar="MS",
+                       help="emulated USB latency in ms (default: 1)")
+    group.add_argument("--jitter", type=float, default=0.0, metavar="MS",
+                       help="emulated latency jitter in ms, +/- (default: 0)")
+
+
+def transport_from_args(args):
+    """Transport selected by the add_transport_arguments() options"""
+    if args.replay:
+        from virc_capture import ReplayTransport, parse_speed
+        return ReplayTransport(args.replay, parse_speed(args.speed))
+    if args.emulate:
+        from virc_emulator import emulator_transport
+        return emulator_transport(args.emulate, script=args.script, interval_s=args.interval,
+                                  latency_s=args.latency / 1000, jitter_s=args.jitter / 1000)
+    return HidTransport()
@@ -0,0 +1,235 @@
+"""
+Upload of finished QC sessions to the central collector (virc_collector.py).
+
+The station's history database is the offline queue: every finished
+session is on disk there already, and the uploader keeps, per collector
+URL, the id of the last session the collector acknowledged (upload_state
+table). Nothing is lost while the collector or the network is down, and a
+station pointed at a collector for the first time uploads its whole history.
+
+ResultUploader runs on its own thread with its own connection:
+
+    - after wake() (the history writer committed) or every POLL_S, the
+      sessions after the acknowledged id are sent in batches of up to
+      BATCH_SIZE, one gzip-compressed JSON POST each, until none are left
+    - every session carries a uid, "<database id>-<session id>", unique
+      across stations; the collector stores each uid once, so a batch sent
+      again after a lost reply is harmless
+    - while the collector is unreachable, or answers anything but a reply or
+      a rejection of the batch itself (5xx, but also 404 from a wrong URL or
+      401/403 from a proxy), it retries with a backoff from RETRY_MIN_S
+      doubling to RETRY_MAX_S; only a batch the collector rejects as such
+      (400, 413, 422) is skipped, it stays in the local history
+
+The station never waits on the network: recording a session only queues it
+for the history writer, and all HTTP happens on the uploader thread.
+"""
+import gzip
+import http.client
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+
+from virc_history import ButtonResult, SessionRecord, connect
+
+UPLOAD_PATH = "/api/v1/sessions"
+BATCH_SIZE = 200
+POLL_S = 30.0             # Looks for sessions this often even without wake()
+REJECTED_STATUSES = (400, 413, 422)  # The collector refused this batch's content; other errors are not the batch's fault
+RETRY_MIN_S = 1.0
+RETRY_MAX_S = 60.0
+TIMEOUT_S = 10.0
+MAX_BATCH_BYTES = 64 * 1024 * 1024  # Decompressed, checked by decode_batch()
+
+UPLOAD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS upload_state (
+    collector   TEXT PRIMARY KEY,
+    last_id     INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def database_id(db):
+    """Random id of a history database, created on first use (the caller commits)"""
+    row = db.execute("SELECT value FROM meta WHERE key = 'database_id'").fetchone()
+    if row:
+        return row[0]
+    value = uuid.uuid4().hex
+    db.execute("INSERT INTO meta (key, value) VALUES ('database_id', ?)", (value,))
+    return value
+
+
+def session_payload(uid, record):
+    """JSON object of one session"""
+    return {'uid': uid, **record._asdict(), 'buttons': [list(button) for button in record.buttons]}
+
+
+def record_from_payload(item):
+    """(uid, SessionRecord) of a session_payload(); KeyError / TypeError / ValueError if malformed"""
+    buttons = tuple(ButtonResult(int(code), str(button), str(outcome), press_s, quality)
+                    for code, button, outcome, press_s, quality in item['buttons'])
+    record = SessionRecord(float(item['started']), float(item['finished']), str(item['station']),
+                           str(item['receiver']), str(item['serial']), str(item['remote']), str(item['verdict']),
+                           buttons)
+    return str(item['uid']), record
+
+
+def encode_batch(sessions):
+    """gzip-compressed JSON body of [(uid, SessionRecord)]"""
+    body = json.dumps({'sessions': [session_payload(uid, record) for uid, record in sessions]},
+                      separators=(",", ":")).encode()
+    return gzip.compress(body, compresslevel=6)
+
+
+def decode_batch(body, encoding=None):
+    """[(uid, SessionRecord)] of a request body; ValueError if it is not a valid batch"""
+    if encoding == "gzip":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(body, MAX_BATCH_BYTES)
+        except zlib.error as e:
+            raise ValueError(f"bad gzip data: {e}") from e
+        if inflater.unconsumed_tail:
+            raise ValueError("batch too large")
+    elif encoding not in (None, "identity"):
+        raise ValueError(f"unsupported encoding {encoding}")
+    try:
+        return [record_from_payload(item) for item in json.loads(body)['sessions']]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"malformed batch: {e!r}") from e
+
+
+def pending_sessions(db, after_id, limit=BATCH_SIZE):
+    """[(session id, SessionRecord)] of the sessions after `after_id`, oldest first"""
+    rows = db.execute("SELECT id, started, finished, station, receiver, serial, remote, verdict FROM sessions "
+                      "WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+    if not rows:
+        return []
+    buttons = {}
+    for session_id, *button in db.execute(
+            "SELECT session_id, code, button, outcome, press_s, quality FROM button_results "
+            "WHERE session_id BETWEEN ? AND ? ORDER BY session_id, rowid", (rows[0][0], rows[-1][0])):
+        buttons.setdefault(session_id, []).append(ButtonResult(*button))
+    return [(row[0], SessionRecord(*row[1:], tuple(buttons.get(row[0], ())))) for row in rows]
+
+
+def collector_url(url):
+    """Upload URL of a collector given as http://host:port (or the full URL)"""
+    url = url.rstrip("/")
+    return url if url.endswith(UPLOAD_PATH) else url + UPLOAD_PATH
+
+
+class ResultUploader:
+    """Background uploader of a history database's sessions to one collector"""
+
+    def __init__(self, history_path, url, on_status=None, batch_size=BATCH_SIZE):
+        self.url = collector_url(url)
+        self.batch_size = batch_size
+        # Called on the uploader thread with (online, sessions queued, error text or None) when the
+        # collector becomes reachable / unreachable, and when it rejects a batch
+        self.on_status = on_status
+        self.online = None
+        self.queued = 0         # Sessions not acknowledged yet, as of the last pass
+        self.uploaded = 0       # Sessions the collector stored
+        self.duplicates = 0     # Sessions it already had
+        self.rejected = 0
+        self.batches = 0
+        self.failures = 0       # Attempts that did not reach the collector
+        self._db = connect(history_path)  # Opened here, so a bad path fails at startup
+        self._db.executescript(UPLOAD_SCHEMA)
+        with self._db:
+            self.database_id = database_id(self._db)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="VIRC upload", daemon=True)
+        self._thread.start()
+        return self
+
+    def wake(self):
+        """New sessions were committed (any thread)"""
+        self._wakeup.set()
+
+    def close(self, timeout=1.0):
+        """Stop uploading; what is not acknowledged yet goes with the next start"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self._db.close()
+
+    def _run(self):
+        delay = RETRY_MIN_S
+        try:
+            while not self._stopping.is_set():
+                try:
+                    more = self.upload_once()
+                except (OSError, http.client.HTTPException, ValueError, sqlite3.Error) as e:
+                    self.failures += 1
+                    reason = e if isinstance(e, urllib.error.HTTPError) else getattr(e, 'reason', None) or e
+                    self._set_online(False, str(reason))  # "HTTP Error 404: Not Found", "[Errno 111] ..."
+                    self._stopping.wait(delay)  # Backoff; new sessions do not shorten it
+                    delay = min(delay * 2, RETRY_MAX_S)
+                    continue
+                delay = RETRY_MIN_S
+                if not more:
+                    self._wakeup.wait(POLL_S)
+                    self._wakeup.clear()
+        finally:
+            self._db.close()
+
+    def _last_id(self):
+        row = self._db.execute("SELECT last_id FROM upload_state WHERE collector = ?", (self.url,)).fetchone()
+        return row[0] if row else 0
+
+    def upload_once(self):
+        """Send the next batch; True if more sessions are waiting"""
+        last_id = self._last_id()
+        batch = pending_sessions(self._db, last_id, self.batch_size)
+        self.queued = self._db.execute("SELECT COUNT(*) FROM sessions WHERE id > ?", (last_id,)).fetchone()[0]
+        if not batch:
+            return False
+        body = encode_batch([(f"{self.database_id}-{session_id}", record) for session_id, record in batch])
+        request = urllib.request.Request(self.url, data=body, method="POST", headers={
+            'Content-Type': "application/json", 'Content-Encoding': "gzip"})
+        error = None
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT_S) as response:
+                reply = json.loads(response.read() or b"{}")
+            self.uploaded += reply.get('accepted', 0)
+            self.duplicates += reply.get('duplicates', 0)
+        except urllib.error.HTTPError as e:
+            if e.code not in REJECTED_STATUSES:
+                raise  # Collector (or URL, proxy) trouble, not the batch's: keep it and try again later
+            self.rejected += len(batch)
+            error = f"collector rejected {len(batch)} session(s): HTTP {e.code} {e.reason}"
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO upload_state (collector, last_id) VALUES (?, ?)",
+                             (self.url, batch[-1][0]))
+        self.batches += 1
+        self.queued -= len(batch)
+        self._set_online(True, error)
+        return self.queued > 0
+
+    def _set_online(self, online, error=None):
+        changed = online != self.online
+        self.online = online
+        if self.on_status and (changed or (online and error)):
+            self.on_status(online, self.queued, error)
+
+    def stats(self):
+        return {'online': self.online, 'queued': self.queued, 'uploaded': self.uploaded,
+                'duplicates': self.duplicates, 'rejected': self.rejected, 'batches': self.batches,
+                'failures': self.failures}
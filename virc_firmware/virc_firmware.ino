@@ -10,12 +10,65 @@
 #include "PinDefinitionsAndMore.h" //Define macros for input and output pin etc.
 #include <IRremote.hpp> //https://github.com/Arduino-IRremote/Arduino-IRremote/tree/v3.6.1
 
-#define API_VERSION_MAJOR 1
-#define API_VERSION_MINOR 0
+#define API_VERSION_MAJOR 2
+#define API_VERSION_MINOR 1
 #define FW_VERSION_MAJOR 1
-#define FW_VERSION_MINOR 1
+#define FW_VERSION_MINOR 3
 #define DEVICE_TYPE 1
 
+// Uncomment to print every IR code and HID send result on the serial port (slows down the IR loop)
+// #define VIRC_DEBUG
+
+// Report formats, see python_test/virc_protocol.py
+// 1: one report 7 per IR code (default after power-up, what API 1.x hosts expect)
+// 2: report 8, up to 5 events per report with sequence number, device time and flags.
+//    Selected by the host with command 3 followed by the byte 2.
+#define FORMAT_V1 1
+#define FORMAT_V2 2
+#define REPORT_IR_CODE 7
+#define REPORT_IR_BATCH 8
+#define BATCH_EVENTS 5
+#define EVENT_SIZE 12
+#define FLAG_REPEAT 0x01
+#define FLAG_OVERFLOW 0x02
+#define EVENT_QUEUE_SIZE 32  // Events waiting for the USB endpoint (power of 2)
+
+// Raw timing diagnostics (API 2.1): command 9 [9, 1] on, [9, 2] off, [9] asks.
+// Hosts pad output reports with zeros (hidapi on Windows always sends all 64
+// bytes), so a value byte of 0 has to mean "just ask" too.
+// While on and in format 2, the mark/space durations of every decoded frame
+// follow its event as report 11 chunks: index, count, durations in the chunk,
+// event seq (2), then up to 29 durations in µs (2 bytes each), little-endian.
+#define REPORT_RAW_TIMING_STATE 10
+#define REPORT_RAW_TIMING 11
+#define TIMING_VALUES 29
+#define TIMING_MAX 100  // Durations kept per frame (NEC: 67)
+#define TIMING_QUERY 0
+#define TIMING_ON 1
+#define TIMING_OFF 2
+
+struct IrEvent {
+  uint16_t seq;
+  uint8_t flags;
+  uint32_t time_us;
+  uint32_t code;
+};
+
+volatile uint8_t report_format = FORMAT_V1;
+IrEvent event_queue[EVENT_QUEUE_SIZE];
+uint8_t queue_head = 0;   // Next event to send
+uint8_t queue_count = 0;
+uint16_t event_seq = 0;   // Counts every decoded event, also the ones lost to a full queue
+bool queue_overflowed = false;
+uint32_t last_code = 0;   // Code a NEC repeat frame repeats
+
+volatile bool raw_timing = false;
+uint16_t timing[TIMING_MAX];  // Durations of the last decoded frame, µs
+uint8_t timing_len = 0;
+uint16_t timing_seq = 0;
+uint8_t timing_sent = 0;      // Chunks of it already sent
+uint8_t timing_chunks = 0;    // 0: nothing to send
+
 // HID report descriptor using TinyUSB's template
 // Generic In Out with 64 bytes report (max)
 uint8_t const desc_hid_report[] =
@@ -62,25 +115,139 @@ void setup() {
 void loop() {
   if (IrReceiver.decode()) {
     uint32_t ir_raw = IrReceiver.decodedIRData.decodedRawData;
-    
-    if(ir_raw != 0){
+    bool repeat = IrReceiver.decodedIRData.flags & IRDATA_FLAGS_IS_REPEAT;
+    uint32_t now_us = micros();
+    bool keep_timing = ir_raw != 0 && raw_timing && report_format == FORMAT_V2;
+    if (keep_timing) {
+      copy_timing();  // rawbuf is reused by the next frame
+    }
+    IrReceiver.resume();  // Receive the next frame while this one goes out
+
+    if (ir_raw != 0) {
+      last_code = ir_raw;
+#ifdef VIRC_DEBUG
       Serial.print("IR Code Received: 0x");
       Serial.println(ir_raw, HEX);
-      
-      uint8_t ir_buffer[64] = {0}; 
-      ir_buffer[0] = 7;  // Report ID
-      // Store raw IR code in little-endian format
-      for(int i = 0; i < 4; i++){
-        ir_buffer[2+i] = (uint8_t)((ir_raw >> (8*i)) & 0xFF);
+#endif
+      if (report_format == FORMAT_V1) {
+        send_ir_code(ir_raw);
+      } else {
+        uint16_t seq = queue_event(ir_raw, now_us, 0);
+        if (keep_timing) {
+          // Replaces chunks of an older frame not sent yet
+          timing_seq = seq;
+          timing_sent = 0;
+          timing_chunks = (timing_len + TIMING_VALUES - 1) / TIMING_VALUES;
+        }
       }
-      bool sent = usb_hid.sendReport(0, ir_buffer, 64);  // Send full buffer
-      Serial.print("HID Report sent: ");
-      Serial.println(sent);
+    } else if (repeat && last_code != 0 && report_format == FORMAT_V2) {
+      queue_event(last_code, now_us, FLAG_REPEAT);  // Format 1 has no way to mark a repeat: dropped
     }
-    
-    IrReceiver.resume();
   }
 
+  if (report_format == FORMAT_V2) {
+    send_batch();
+  }
+}
+
+// Durations of the frame just decoded, without the gap before it (rawbuf[0])
+void copy_timing() {
+  uint8_t len = IrReceiver.decodedIRData.rawDataPtr->rawlen;
+  timing_len = 0;
+  for (uint8_t i = 1; i < len && timing_len < TIMING_MAX; i++) {
+    uint32_t us = (uint32_t) IrReceiver.decodedIRData.rawDataPtr->rawbuf[i] * MICROS_PER_TICK;
+    timing[timing_len++] = us > 0xFFFF ? 0xFFFF : us;
+  }
+}
+
+void send_ir_code(uint32_t ir_raw) {
+  uint8_t ir_buffer[64] = {0};
+  ir_buffer[0] = REPORT_IR_CODE;
+  // Store raw IR code in little-endian format
+  for (int i = 0; i < 4; i++) {
+    ir_buffer[2+i] = (uint8_t)((ir_raw >> (8*i)) & 0xFF);
+  }
+  bool sent = usb_hid.sendReport(0, ir_buffer, 64);  // Send full buffer
+#ifdef VIRC_DEBUG
+  Serial.print("HID Report sent: ");
+  Serial.println(sent);
+#else
+  (void) sent;
+#endif
+}
+
+uint16_t queue_event(uint32_t code, uint32_t time_us, uint8_t flags) {
+  uint16_t seq = event_seq++;
+  if (queue_count == EVENT_QUEUE_SIZE) {
+    queue_overflowed = true;  // The host sees the sequence gap; the next queued event is flagged
+    return seq;
+  }
+  if (queue_overflowed) {
+    flags |= FLAG_OVERFLOW;
+    queue_overflowed = false;
+  }
+  IrEvent &event = event_queue[(queue_head + queue_count) & (EVENT_QUEUE_SIZE - 1)];
+  event.seq = seq;
+  event.flags = flags;
+  event.time_us = time_us;
+  event.code = code;
+  queue_count++;
+  return seq;
+}
+
+// Whatever is queued when the endpoint is free goes out in one report,
+// so events batch up exactly while the host is not polling fast enough.
+// Raw timing chunks only go out while no event is waiting.
+void send_batch() {
+  if (!usb_hid.ready()) {
+    return;
+  }
+  if (queue_count == 0) {
+    send_timing_chunk();
+    return;
+  }
+  uint8_t buffer[64] = {0};
+  uint8_t count = queue_count < BATCH_EVENTS ? queue_count : BATCH_EVENTS;
+  buffer[0] = REPORT_IR_BATCH;
+  buffer[1] = count;
+  for (uint8_t i = 0; i < count; i++) {
+    const IrEvent &event = event_queue[(queue_head + i) & (EVENT_QUEUE_SIZE - 1)];
+    uint8_t *out = buffer + 2 + i * EVENT_SIZE;
+    // Little-endian: seq (2), flags (1), pad (1), time_us (4), code (4)
+    out[0] = event.seq & 0xFF;
+    out[1] = event.seq >> 8;
+    out[2] = event.flags;
+    for (int b = 0; b < 4; b++) {
+      out[4+b] = (event.time_us >> (8*b)) & 0xFF;
+      out[8+b] = (event.code >> (8*b)) & 0xFF;
+    }
+  }
+  if (usb_hid.sendReport(0, buffer, 64)) {
+    queue_head = (queue_head + count) & (EVENT_QUEUE_SIZE - 1);
+    queue_count -= count;
+  }
+}
+
+void send_timing_chunk() {
+  if (timing_sent >= timing_chunks) {
+    return;
+  }
+  uint8_t buffer[64] = {0};
+  uint8_t first = timing_sent * TIMING_VALUES;
+  uint8_t count = timing_len - first < TIMING_VALUES ? timing_len - first : TIMING_VALUES;
+  buffer[0] = REPORT_RAW_TIMING;
+  buffer[1] = timing_sent;
+  buffer[2] = timing_chunks;
+  buffer[3] = count;
+  buffer[4] = timing_seq & 0xFF;
+  buffer[5] = timing_seq >> 8;
+  for (uint8_t i = 0; i < count; i++) {
+    buffer[6 + 2*i] = timing[first + i] & 0xFF;
+    buffer[7 + 2*i] = timing[first + i] >> 8;
+  }
+  if (usb_hid.sendReport(0, buffer, 64)) {
+    timing_sent++;
+  }
 }
 
 // Invoked when received GET_REPORT control request
@@ -108,11 +275,16 @@ void set_report_callback(uint8_t report_id, hid_report_type_t report_type, uint8
       out_buffer[2] = DEVICE_TYPE;
       usb_hid.sendReport(0, out_buffer, 3);
       break;
-    case 3: // Host asking for API version
+    case 3: // Host asking for API version; [3, 2] also asks for report format 2
+      // A bare [3] arrives zero-padded: 0 keeps the format (bufsize only guards the read)
+      if (bufsize > 1 && buffer[1] >= FORMAT_V2) {
+        report_format = FORMAT_V2;
+      }
       out_buffer[0] = 4;
       out_buffer[2] = API_VERSION_MAJOR;
       out_buffer[3] = API_VERSION_MINOR;
-      usb_hid.sendReport(0, out_buffer, 4);
+      out_buffer[4] = report_format;
+      usb_hid.sendReport(0, out_buffer, 5);
       break;
     case 5: //Host asking for firmware version
       out_buffer[0] = 6;
@@ -120,6 +292,15 @@ void set_report_callback(uint8_t report_id, hid_report_type_t report_type, uint8
       out_buffer[3] = FW_VERSION_MINOR;
       usb_hid.sendReport(0, out_buffer, 4);
       break;
+    case 9: // Raw timing diagnostics: [9, 1] on, [9, 2] off, [9] (zero-padded: [9, 0]) just asks
+      if (bufsize > 1 && (buffer[1] == TIMING_ON || buffer[1] == TIMING_OFF)) {
+        raw_timing = buffer[1] == TIMING_ON;
+        timing_chunks = 0;
+      }
+      out_buffer[0] = REPORT_RAW_TIMING_STATE;
+      out_buffer[2] = raw_timing;
+      usb_hid.sendReport(0, out_buffer, 3);
+      break;
     default:
       out_buffer[0] = 0;
       out_buffer[2] = 3;